@@ -0,0 +1,257 @@
+"""
+Admission control for CPU-heavy routes.
+
+Each controlled route has a concurrency limit with a bounded wait queue and a
+token bucket per client. A request that finds the queue full, or waits longer
+than the queue timeout, is answered 503 with Retry-After; a client that has
+used up its bucket gets 429. Rejections are cheap, so an overloaded route
+sheds load instead of letting latency grow without bound.
+
+Routes opt in with a dependency:
+
+    @router.post("/", dependencies=[Depends(admit("passport.generate"))])
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+from app.config import get_settings
+from app.metrics import ADMISSION_ACTIVE, ADMISSION_QUEUED, ADMISSION_SHED
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class ConcurrencyLimiter:
+    """
+    At most `limit` holders at a time and at most `queue_size` waiters (FIFO).
+    A released slot is handed straight to the oldest waiter.
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.admitted = 0
+        self.shed = {'queue_full': 0, 'queue_timeout': 0}
+        # Smoothed slot hold time, used for Retry-After estimates
+        self.service_time = None
+        self._waiters = deque()
+        self._active_gauge = ADMISSION_ACTIVE.labels(name)
+        self._queued_gauge = ADMISSION_QUEUED.labels(name)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue has likely drained"""
+        service_time = self.service_time or 1.0
+        return max(1, math.ceil(service_time * (self.waiting + 1) / self.limit))
+
+    def _update_gauges(self):
+        self._active_gauge.set(self.active)
+        self._queued_gauge.set(self.waiting)
+
+    def _reject(self, reason: str):
+        self.shed[reason] += 1
+        ADMISSION_SHED.labels(self.name, reason).inc()
+        raise Overloaded(reason, self.retry_after())
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            self._update_gauges()
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            self._reject('queue_full')
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self._reject('queue_timeout')
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the client went away
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        self.admitted += 1
+
+    def _discard(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._update_gauges()
+
+    def release(self, held_for: Optional[float] = None):
+        if held_for is not None:
+            self.service_time = held_for if self.service_time is None else 0.8 * self.service_time + 0.2 * held_for
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot over; `active` stays the same
+                waiter.set_result(None)
+                self._update_gauges()
+                return
+        self.active -= 1
+        self._update_gauges()
+
+class ClientRateLimiter:
+    """Token bucket per client: `rate` tokens per second, up to `burst` stored"""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.limited = 0
+        # client -> (tokens, last refill); least recently seen first
+        self._buckets = OrderedDict()
+
+    @property
+    def tracked(self) -> int:
+        return len(self._buckets)
+
+    def take(self, client: str) -> float:
+        """Spend a token; returns 0 when allowed, else seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / self.rate
+            self.limited += 1
+
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+class AdmissionController:
+    def __init__(self, name: str, concurrency: int, queue: int, queue_timeout: float, rate: float, burst: int):
+        self.name = name
+        self.limiter = ConcurrencyLimiter(name, concurrency, queue, queue_timeout)
+        self.clients = ClientRateLimiter(rate, burst)
+
+    def stats(self) -> dict:
+        limiter = self.limiter
+        return {
+            'concurrency': limiter.limit,
+            'queueSize': limiter.queue_size,
+            'active': limiter.active,
+            'queued': limiter.waiting,
+            'admitted': limiter.admitted,
+            'shed': {**limiter.shed, 'rate_limited': self.clients.limited},
+            'avgServiceSeconds': limiter.service_time,
+            'trackedClients': self.clients.tracked
+        }
+
+_controllers = {}
+
+def get_controller(name: str) -> AdmissionController:
+    """The controller for a route, configured from ADMISSION_LIMITS on first use"""
+    controller = _controllers.get(name)
+    if controller is None:
+        settings = get_settings()
+        limits = settings.admission_limits.get(name, {})
+        controller = AdmissionController(
+            name,
+            concurrency=limits.get('concurrency', settings.admission_default_concurrency),
+            queue=limits.get('queue', settings.admission_default_queue),
+            queue_timeout=settings.admission_queue_timeout_seconds,
+            rate=limits.get('rate', settings.admission_client_rate),
+            burst=limits.get('burst', settings.admission_client_burst)
+        )
+        _controllers[name] = controller
+    return controller
+
+def admission_stats() -> dict:
+    return {name: controller.stats() for name, controller in _controllers.items()}
+
+def client_key(request: Request) -> str:
+    settings = get_settings()
+    header = settings.admission_client_header
+    if header:
+        # Each trusted proxy appends the address it received the request from;
+        # anything left of those was sent by the client and cannot be trusted
+        entries = [entry.strip() for value in request.headers.getlist(header) for entry in value.split(',')]
+        hops = max(1, settings.admission_trusted_proxies)
+        if len(entries) >= hops and entries[-hops]:
+            return entries[-hops]
+    return request.client.host if request.client else 'unknown'
+
+@asynccontextmanager
+async def admission_slot(name: str, request: Request, background: bool = False):
+    """Rate-limit the client, then hold one of the route's concurrency slots (unless `background`)"""
+    if not get_settings().admission_enabled:
+        yield
+        return
+
+    controller = get_controller(name)
+    wait = controller.clients.take(client_key(request))
+    if wait:
+        ADMISSION_SHED.labels(name, 'rate_limited').inc()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={'Retry-After': str(max(1, math.ceil(wait)))}
+        )
+
+    if background:
+        yield
+        return
+
+    try:
+        await controller.limiter.acquire()
+    except Overloaded as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Server busy ({exc.reason.replace('_', ' ')}); retry later",
+            headers={'Retry-After': str(exc.retry_after)}
+        )
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        controller.limiter.release(time.perf_counter() - started)
+
+def admit(name: str, skip_background: bool = False):
+    """
+    Dependency admitting a request to the `name` route. With `skip_background`,
+    requests passing `background=true` (which only enqueue a job) are rate
+    limited but do not take a concurrency slot.
+    """
+    if skip_background:
+        async def dependency(request: Request, background: bool = False):
+            async with admission_slot(name, request, background):
+                yield
+    else:
+        async def dependency(request: Request):
+            async with admission_slot(name, request):
+                yield
+
+    return dependency
@@ -0,0 +1,163 @@
+import zlib
+
+import brotli
+
+# Already-compressed payloads are passed through untouched
+INCOMPRESSIBLE_TYPES = ('image/', 'application/vnd.apache.parquet', 'application/zip', 'application/gzip')
+
+def choose_encoding(accept_encoding: str):
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+
+    wildcard = accepted.get('*', 0.0)
+    for encoding in ('br', 'gzip'):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+class _Encoder:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            # wbits=31: gzip container
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._brotli = None
+
+    def chunk(self, data: bytes) -> bytes:
+        # Flush per chunk so streamed rows reach the client as they are produced
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b'') -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+class _Headers:
+    """Minimal mutable view over raw ASGI header pairs"""
+
+    def __init__(self, raw):
+        self.raw = list(raw)
+
+    def get(self, name: str):
+        key = name.encode('latin-1')
+        for header, value in self.raw:
+            if header == key:
+                return value.decode('latin-1')
+        return None
+
+    def remove(self, name: str):
+        key = name.encode('latin-1')
+        self.raw = [(header, value) for header, value in self.raw if header != key]
+
+    def set(self, name: str, value: str):
+        self.remove(name)
+        self.raw.append((name.encode('latin-1'), value.encode('latin-1')))
+
+    def add_vary(self, value: str):
+        vary = self.get('vary')
+        self.set('vary', f"{vary}, {value}" if vary else value)
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with brotli or gzip.
+    Buffered responses are compressed when they reach `minimum_size`; streamed
+    responses (exports) are always compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ''
+        for name, value in scope['headers']:
+            if name == b'accept-encoding':
+                accept_encoding = value.decode('latin-1')
+                break
+
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+            if encoder is None:
+                headers = _Headers(start['headers'])
+                if not self._compressible(start['status'], headers) or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                headers.set('content-encoding', encoding)
+                headers.add_vary('Accept-Encoding')
+                headers.remove('content-length')
+                if not more_body:
+                    compressed = encoder.finish(body)
+                    headers.set('content-length', str(len(compressed)))
+                    start['headers'] = headers.raw
+                    await send(start)
+                    await send({'type': 'http.response.body', 'body': compressed})
+                    return
+                start['headers'] = headers.raw
+                await send(start)
+
+            if more_body:
+                data = encoder.chunk(body) if body else b''
+                if data:
+                    await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            else:
+                await send({'type': 'http.response.body', 'body': encoder.finish(body)})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _compressible(status: int, headers: _Headers) -> bool:
+        if status < 200 or status in (204, 304):
+            return False
+        if headers.get('content-encoding'):
+            return False
+        content_type = headers.get('content-type') or ''
+        return not content_type.startswith(INCOMPRESSIBLE_TYPES)
@@ -1,11 +1,118 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     mongodb_url: str = "mongodb://localhost:27017"
     database_name: str = "cycleweave"
     cors_origins: list = ["http://localhost:5173", "http://localhost:3000", "*"]
     
+    # Storage backend: "mongo", "sqlite" (embedded, single node) or "memory" (in-process stand-in)
+    storage_backend: str = "mongo"
+    # Directory holding the SQLite files (one per database name)
+    storage_path: str = "data"
+    # Extended-JSON file ({"collection": [documents]}) loaded into an empty embedded backend
+    storage_seed_path: Optional[str] = None
+    # How long a SQLite write waits for another worker's transaction before
+    # failing with 503; the wait holds up that database's other operations
+    storage_busy_timeout_ms: int = 250
+    
+    # MongoDB connection pool
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_connecting: int = 2
+    mongo_max_idle_time_ms: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    mongo_connect_timeout_ms: int = 20000
+    mongo_server_selection_timeout_ms: int = 30000
+    mongo_socket_timeout_ms: Optional[int] = None
+    mongo_compressors: str = ""  # e.g. "zstd,snappy,zlib"
+    mongo_read_preference: str = "primary"
+    
+    # Readiness probe
+    readiness_timeout_seconds: float = 2.0
+    
+    # Multi-tenancy: each tenant's data lives in its own database
+    # (<database_name>_<tenant>) on the shared client. The tenant comes from
+    # `Authorization: Bearer <token>` when tenant_tokens ({token: tenant}) is
+    # set, else from tenant_header, which is only accepted for the tenants in
+    # tenant_allowlist (unset: the header is rejected). Requests without a
+    # tenant use database_name.
+    tenant_header: str = "X-Tenant-ID"
+    tenant_tokens: dict = {}
+    tenant_allowlist: list = []
+    tenant_required: bool = False
+    
+    # Admin endpoints (/api/admin/*) are disabled unless a token is set
+    admin_token: Optional[str] = None
+    
+    # Per-request profiling: requests sending X-Profile-Request: <admin_token>,
+    # plus a random sample of all requests at profiling_sample_rate
+    profiling_sample_rate: float = 0.0
+    profiling_interval_ms: float = 1.0
+    profiling_retention_hours: int = 72
+    
+    # Background job workers
+    job_workers: int = 2
+    job_lease_seconds: int = 60
+    job_poll_interval: float = 1.0
+    job_max_attempts: int = 3
+    
+    # Cache-Control max-age for passports and doctor analyses, which never
+    # change once written (ETag/Last-Modified revalidation covers the rest)
+    immutable_cache_max_age: int = 31536000
+    
+    # Single-passport lookups (QR scans) are coalesced and cached per worker for
+    # this long; 0 disables caching but keeps concurrent lookups coalesced.
+    # The entry budget is shared by all tenants
+    passport_cache_ttl_seconds: float = 10.0
+    passport_cache_max_entries: int = 1024
+    
+    # LCA version history stores field-level diffs per write plus the full
+    # state every lca_snapshot_interval versions, so reconstructing any
+    # version reads one snapshot and at most interval - 1 diffs
+    lca_snapshot_interval: int = 10
+    
+    # Fleet benchmarks (per metal/furnace t-digests used by the AI Doctor):
+    # new assessments are merged into the stored sketches this often, and a
+    # group needs min_samples assessments before it replaces the static benchmarks
+    fleet_benchmark_flush_seconds: float = 5.0
+    fleet_benchmark_min_samples: int = 30
+    fleet_benchmark_compression: int = 100
+    
+    # Response compression (brotli or gzip, per Accept-Encoding) for bodies of
+    # at least compression_min_size bytes; streamed exports are always compressed
+    compression_enabled: bool = True
+    compression_min_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    
+    # Admission control for CPU-heavy routes: a concurrency limit with a bounded
+    # wait queue per route (503 + Retry-After when full or after the queue
+    # timeout) and a token bucket per client and route (429). admission_limits
+    # overrides concurrency/queue/rate/burst per route, e.g.
+    # ADMISSION_LIMITS='{"passport.generate": {"concurrency": 8, "queue": 32}}'
+    admission_enabled: bool = True
+    admission_default_concurrency: int = 4
+    admission_default_queue: int = 16
+    admission_queue_timeout_seconds: float = 2.0
+    admission_client_rate: float = 10.0
+    admission_client_burst: int = 20
+    admission_limits: dict = {}
+    # Header identifying the client behind a trusted proxy (e.g. X-Forwarded-For);
+    # the socket peer address is used otherwise. The client is the entry
+    # admission_trusted_proxies from the right (the one the outermost trusted
+    # proxy appended); entries further left are client-supplied.
+    admission_client_header: Optional[str] = None
+    admission_trusted_proxies: int = 1
+    
+    # Upper bound on the assessments one /api/lca/compare request may cover
+    compare_max_scenarios: int = 500
+    
+    # Run one QR code / calculation / validation pass during startup so the
+    # first real request does not pay for lazy imports and cold caches
+    warmup_on_startup: bool = False
+    
     class Config:
         env_file = ".env"
 
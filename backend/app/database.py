@@ -1,21 +1,246 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from app.config import get_settings
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
 
-settings = get_settings()
+from pymongo import ASCENDING, DESCENDING, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from app.config import get_settings
+from app.metrics import command_metrics
 
 class Database:
-    client: AsyncIOMotorClient = None
+    client = None
     
 db = Database()
 
+# Tenant of the request (or job) being served; None is the default tenant.
+# Set by app.tenancy.TenantMiddleware and by the job workers.
+current_tenant: ContextVar[Optional[str]] = ContextVar('current_tenant', default=None)
+
+@contextmanager
+def tenant_scope(tenant: Optional[str]):
+    """Route get_database() to `tenant` for the duration of the block"""
+    token = current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Keeps live per-server connection pool statistics from pymongo CMAP events"""
+    
+    def __init__(self):
+        # Events arrive from the driver's background threads
+        self._lock = threading.Lock()
+        self._pools = defaultdict(lambda: {
+            'size': 0,
+            'inUse': 0,
+            'waiting': 0,
+            'created': 0,
+            'closed': 0,
+            'checkOutFailures': 0,
+            'cleared': 0,
+            'ready': False
+        })
+    
+    def _update(self, event, **deltas):
+        key = "%s:%s" % event.address
+        with self._lock:
+            pool = self._pools[key]
+            for field, delta in deltas.items():
+                pool[field] += delta
+    
+    def pool_created(self, event):
+        self._update(event)
+    
+    def pool_ready(self, event):
+        with self._lock:
+            self._pools["%s:%s" % event.address]['ready'] = True
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            pool = self._pools["%s:%s" % event.address]
+            pool['cleared'] += 1
+            pool['ready'] = False
+    
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop("%s:%s" % event.address, None)
+    
+    def connection_created(self, event):
+        self._update(event, size=1, created=1)
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        self._update(event, size=-1, closed=1)
+    
+    def connection_check_out_started(self, event):
+        self._update(event, waiting=1)
+    
+    def connection_check_out_failed(self, event):
+        self._update(event, waiting=-1, checkOutFailures=1)
+    
+    def connection_checked_out(self, event):
+        self._update(event, waiting=-1, inUse=1)
+    
+    def connection_checked_in(self, event):
+        self._update(event, inUse=-1)
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                address: {**pool, 'available': pool['size'] - pool['inUse']}
+                for address, pool in self._pools.items()
+            }
+
+pool_stats = PoolStatsListener()
+
+def _client_options() -> dict:
+    settings = get_settings()
+    options = {
+        'maxPoolSize': settings.mongo_max_pool_size,
+        'minPoolSize': settings.mongo_min_pool_size,
+        'maxConnecting': settings.mongo_max_connecting,
+        'connectTimeoutMS': settings.mongo_connect_timeout_ms,
+        'serverSelectionTimeoutMS': settings.mongo_server_selection_timeout_ms,
+        'readPreference': settings.mongo_read_preference,
+        'event_listeners': [pool_stats, command_metrics]
+    }
+    if settings.mongo_max_idle_time_ms is not None:
+        options['maxIdleTimeMS'] = settings.mongo_max_idle_time_ms
+    if settings.mongo_wait_queue_timeout_ms is not None:
+        options['waitQueueTimeoutMS'] = settings.mongo_wait_queue_timeout_ms
+    if settings.mongo_socket_timeout_ms is not None:
+        options['socketTimeoutMS'] = settings.mongo_socket_timeout_ms
+    if settings.mongo_compressors:
+        options['compressors'] = settings.mongo_compressors
+    return options
+
 async def connect_to_mongo():
-    db.client = AsyncIOMotorClient(settings.mongodb_url)
-    print(f"Connected to MongoDB at {settings.mongodb_url}")
+    settings = get_settings()
+    if settings.storage_backend != "mongo":
+        await connect_embedded_storage()
+        return
+    
+    # Imported here so the embedded backends never load motor
+    from motor.motor_asyncio import AsyncIOMotorClient
+    
+    db.client = AsyncIOMotorClient(settings.mongodb_url, **_client_options())
+    print(f"Connected to MongoDB at {settings.mongodb_url} (maxPoolSize={settings.mongo_max_pool_size})")
+    
+    ok, detail = await ping_database(settings.readiness_timeout_seconds)
+    if not ok:
+        print(f"MongoDB not reachable yet: {detail['error']}")
+
+async def connect_embedded_storage():
+    """Swap an embedded backend in behind get_database()"""
+    settings = get_settings()
+    if settings.storage_backend == "memory":
+        from app.storage.memory import MemoryClient
+        db.client = MemoryClient()
+    elif settings.storage_backend == "sqlite":
+        from app.storage.sqlite import SQLiteClient
+        db.client = SQLiteClient(settings.storage_path, settings.storage_busy_timeout_ms)
+    else:
+        raise ValueError(f"Unknown storage backend '{settings.storage_backend}'")
+    
+    print(f"Using {settings.storage_backend} storage backend")
+    
+    if settings.storage_seed_path:
+        await load_seed(settings.storage_seed_path)
+
+async def load_seed(path: str):
+    """Load an extended-JSON seed file into collections that are still empty"""
+    from bson import json_util
+    
+    with open(path) as f:
+        seed = json_util.loads(f.read())
+    
+    database = get_database()
+    for name, documents in seed.items():
+        collection = database[name]
+        if documents and await collection.count_documents({}) == 0:
+            try:
+                await collection.insert_many(documents, ordered=False)
+            except BulkWriteError:
+                # Another worker seeded the same shared store first
+                continue
+            print(f"Seeded {len(documents)} documents into {name}")
 
 async def close_mongo_connection():
     if db.client:
         db.client.close()
         print("Closed MongoDB connection")
 
+def database_name(tenant: Optional[str] = None) -> str:
+    """A tenant's database; the default tenant uses DATABASE_NAME itself"""
+    name = get_settings().database_name
+    return f"{name}_{tenant}" if tenant else name
+
 def get_database():
-    return db.client[settings.database_name]
+    """The current tenant's database, over the shared client (and its connection pool)"""
+    return db.client[database_name(current_tenant.get())]
+
+def get_shared_database():
+    """The deployment-wide database: job queue, request profiles and the default tenant's data"""
+    return db.client[get_settings().database_name]
+
+async def ping_database(timeout: float) -> tuple:
+    """Ping the server within a deadline; returns (ok, detail)"""
+    if db.client is None:
+        return False, {'error': 'Client not initialised'}
+    
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.client.admin.command('ping'), timeout=timeout)
+    except asyncio.TimeoutError:
+        return False, {'error': f'Ping timed out after {timeout}s'}
+    except Exception as exc:
+        return False, {'error': f'{type(exc).__name__}: {exc}'}
+    
+    return True, {'latencyMs': round((time.perf_counter() - started) * 1000, 2)}
+
+async def ensure_indexes():
+    """Create the indexes the API relies on (idempotent)"""
+    database = get_shared_database()
+    
+    # Job claiming: highest priority first, then oldest runAt
+    await database.jobs.create_index(
+        [("status", ASCENDING), ("priority", DESCENDING), ("runAt", ASCENDING)]
+    )
+    # Lease reaper
+    await database.jobs.create_index([("status", ASCENDING), ("leaseExpiresAt", ASCENDING)])
+    
+    # Stored request profiles expire on their own
+    await database.request_profiles.create_index(
+        "createdAt", expireAfterSeconds=get_settings().profiling_retention_hours * 3600
+    )
+    
+    # The default tenant's data lives in the shared database
+    await ensure_tenant_indexes(database)
+
+async def ensure_tenant_indexes(database):
+    """Indexes of the per-tenant collections (run lazily for each tenant database)"""
+    # Passport lookups by passportId, and a backstop against ID collisions
+    try:
+        await database.passports.create_index("passportId", unique=True)
+    except (DuplicateKeyError, OperationFailure) as exc:
+        # Older random-suffix IDs may already collide; keep serving without the constraint
+        print(f"Could not create unique passportId index: {exc}")
+        await database.passports.create_index("passportId")
+    
+    # Provenance chains: one event per (passport, position); also serves tip lookups and paging
+    await database.provenance_events.create_index(
+        [("passportId", ASCENDING), ("seq", ASCENDING)], unique=True
+    )
+    
+    # LCA version history: one entry per (assessment, version); also serves
+    # nearest-snapshot lookups and paging
+    await database.lca_versions.create_index(
+        [("lcaId", ASCENDING), ("version", ASCENDING)], unique=True
+    )
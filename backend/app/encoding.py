@@ -0,0 +1,103 @@
+"""
+Content negotiation for bulk list endpoints.
+
+The wire format follows the Accept header: JSON by default, MessagePack for
+application/msgpack (or application/x-msgpack). The layout follows the
+`layout` query parameter: `rows` (a list of objects, the default) or
+`columnar`, which sends every field name once:
+
+    {"count": 2, "columns": {"_id": ["...", "..."], "gridMix.coal": [40.0, 12.5], ...}}
+
+Nested objects are flattened into dotted columns; lists are kept as values.
+"""
+from functools import lru_cache
+from typing import List, Literal, Optional
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+MSGPACK_ACCEPT = {MSGPACK_MEDIA_TYPE, 'application/x-msgpack', 'application/vnd.msgpack'}
+
+Layout = Literal['rows', 'columnar']
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+def wants_msgpack(request: Request) -> bool:
+    """True when the client ranks MessagePack at least as high as JSON"""
+    accept = request.headers.get('accept')
+    if not accept:
+        return False
+
+    msgpack_q = json_q = 0.0
+    for part in accept.split(','):
+        media_type, _, params = part.strip().partition(';')
+        media_type = media_type.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if media_type in MSGPACK_ACCEPT:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in ('application/json', 'application/*', '*/*'):
+            json_q = max(json_q, q)
+
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+def _flatten(row: dict, prefix: str, out: dict):
+    for key, value in row.items():
+        if isinstance(value, dict):
+            _flatten(value, f"{prefix}{key}.", out)
+        else:
+            out[f"{prefix}{key}"] = value
+
+def to_columnar(rows: List[dict]) -> dict:
+    """Column-oriented view of `rows`; fields missing from a row are null"""
+    columns = {}
+    for index, row in enumerate(rows):
+        flat = {}
+        _flatten(row, '', flat)
+        for key in flat:
+            if key not in columns:
+                columns[key] = [None] * index
+        for key, values in columns.items():
+            values.append(flat.get(key))
+    return {'count': len(rows), 'columns': columns}
+
+@lru_cache(maxsize=None)
+def _list_adapter(model) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+def serialize_rows(rows: List[dict], model=None) -> list:
+    """JSON-compatible rows, shaped by `model` exactly as the JSON response would be"""
+    if model is None:
+        return jsonable_encoder(rows)
+    adapter = _list_adapter(model)
+    return adapter.dump_python(adapter.validate_python(rows), mode='json', by_alias=True)
+
+def negotiate_list(request: Request, response: Response, rows: List[dict], layout: Layout = 'rows', model=None) -> Optional[Response]:
+    """
+    Encode `rows` as negotiated. Returns None for plain JSON rows so the
+    endpoint's response_model keeps handling the default representation.
+    """
+    response.headers['Vary'] = 'Accept'
+    msgpack_requested = wants_msgpack(request)
+    if layout == 'rows' and not msgpack_requested:
+        return None
+
+    content = serialize_rows(rows, model)
+    if layout == 'columnar':
+        content = to_columnar(content)
+
+    response_class = MsgPackResponse if msgpack_requested else JSONResponse
+    return response_class(content=content, headers={'Vary': 'Accept'})
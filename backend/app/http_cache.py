@@ -0,0 +1,103 @@
+"""
+Conditional GET support (ETag / Last-Modified).
+
+Validators are derived from a document's ID, its modification timestamp
+(updatedAt / createdAt / generatedAt) and, when present, its version, so a
+request carrying If-None-Match or If-Modified-Since can be answered with a
+304 after reading only those fields.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+# Fields a handler needs to read to evaluate a conditional request
+VALIDATOR_FIELDS = {'updatedAt': 1, 'createdAt': 1, 'generatedAt': 1, 'version': 1}
+
+NO_CACHE = "no-cache"
+
+def immutable_cache_control(max_age: int) -> str:
+    return f"public, max-age={max_age}, immutable"
+
+def has_conditions(request: Request) -> bool:
+    """Whether the request carries validators worth a projection-only read"""
+    return 'if-none-match' in request.headers or 'if-modified-since' in request.headers
+
+def modified_at(doc: dict) -> Optional[datetime]:
+    return doc.get('updatedAt') or doc.get('generatedAt') or doc.get('createdAt')
+
+def make_etag(docs: Iterable[dict]) -> str:
+    """Weak ETag over one or more documents' identities and modification stamps"""
+    digest = hashlib.blake2b(digest_size=12)
+    for doc in docs:
+        stamp = modified_at(doc)
+        digest.update(f"{doc['_id']}|{stamp.isoformat() if stamp else ''}|{doc.get('version', '')};".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+def last_modified(docs: Iterable[dict]) -> Optional[datetime]:
+    stamps = [stamp for stamp in (modified_at(doc) for doc in docs) if stamp is not None]
+    return max(stamps) if stamps else None
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        # Stored timestamps are naive UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == '*':
+        return True
+    # Weak comparison: W/"x" matches "x"
+    opaque = etag.removeprefix('W/')
+    return any(candidate.strip().removeprefix('W/') == opaque for candidate in header.split(','))
+
+def is_not_modified(request: Request, etag: str, modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the validators"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is None or modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    stamp = modified.replace(tzinfo=timezone.utc, microsecond=0)
+    return stamp <= since
+
+def validator_headers(etag: str, modified: Optional[datetime], cache_control: str) -> dict:
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if modified is not None:
+        headers['Last-Modified'] = http_date(modified)
+    return headers
+
+def check_not_modified(request: Request, docs: list, cache_control: str) -> Optional[Response]:
+    """A 304 response if the client's copy of `docs` is current, else None"""
+    etag = make_etag(docs)
+    modified = last_modified(docs)
+    if is_not_modified(request, etag, modified):
+        return Response(status_code=304, headers=validator_headers(etag, modified, cache_control))
+    return None
+
+async def revalidate(request: Request, collection, query: dict, cache_control: str) -> Optional[Response]:
+    """
+    For conditional requests, read only the validator fields and answer 304 if
+    nothing changed. Returns None when the full document should be served.
+    """
+    if not has_conditions(request):
+        return None
+    stamps = await collection.find_one(query, VALIDATOR_FIELDS)
+    if stamps is None:
+        return None
+    return check_not_modified(request, [stamps], cache_control)
+
+def set_validators(response: Response, docs: list, cache_control: str):
+    """Attach ETag, Last-Modified and Cache-Control for the documents being served"""
+    response.headers.update(validator_headers(make_etag(docs), last_modified(docs), cache_control))
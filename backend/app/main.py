@@ -1,52 +1,189 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
+from importlib import import_module
 
+from app.compression import CompressionMiddleware
 from app.config import get_settings
-from app.database import connect_to_mongo, close_mongo_connection
-from app.routers import lca, scanner, doctor, passport
-
-settings = get_settings()
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup
-    await connect_to_mongo()
-    yield
-    # Shutdown
-    await close_mongo_connection()
+from app.database import connect_to_mongo, close_mongo_connection, ensure_indexes, ping_database, pool_stats
+from app.metrics import MetricsMiddleware, register_pool_collector, render_metrics
+from app.profiling import ProfilingMiddleware, profiling_enabled
+from app.startup import StartupReport, warmup
+from app.storage.sqlite import StorageBusy
+from app.tenancy import TenantMiddleware
 
-app = FastAPI(
-    title="CycleWeave API",
-    description="Backend API for CycleWeave LCA Command Center",
-    version="1.0.0",
-    lifespan=lifespan
-)
+# Routers are imported inside create_app() (each with its service modules) so
+# importing this module stays cheap and the startup report can time them
+ROUTERS = ["lca", "scanner", "doctor", "passport", "jobs", "admin"]
 
-# CORS Configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def create_app() -> FastAPI:
+    """Build the API; `uvicorn --factory app.main:create_app` calls this directly"""
+    report = StartupReport()
+    
+    with report.phase("settings"):
+        settings = get_settings()
+    
+    with report.phase("routers"):
+        routers = [import_module(f"app.routers.{name}").router for name in ROUTERS]
+        # Imported after the routers: job handlers register themselves on router import
+        from app.services.job_service import JobWorkerPool
+        from app.services.fleet_benchmarks import fleet_benchmarks
+    
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Startup
+        with report.phase("connect"):
+            await connect_to_mongo()
+        with report.phase("indexes"):
+            app.state.indexes_ready = False
+            index_retry = None
+            try:
+                await ensure_indexes()
+                app.state.indexes_ready = True
+            except Exception as exc:
+                # Serve anyway (/ready answers 503 until they exist) rather
+                # than crash-looping while the database is unreachable
+                print(f"Creating indexes failed, retrying in the background: {exc}")
+                index_retry = asyncio.create_task(retry_indexes(app))
+        
+        workers = JobWorkerPool(
+            concurrency=settings.job_workers,
+            lease_seconds=settings.job_lease_seconds,
+            poll_interval=settings.job_poll_interval
+        )
+        with report.phase("workers"):
+            await workers.start()
+            await fleet_benchmarks.start()
+        
+        if settings.warmup_on_startup:
+            with report.phase("warmup"):
+                warmup()
+        
+        report.mark_ready()
+        print(report.summary())
+        yield
+        # Shutdown
+        if index_retry is not None:
+            index_retry.cancel()
+        await fleet_benchmarks.stop()
+        await workers.stop()
+        await close_mongo_connection()
+    
+    with report.phase("app"):
+        app = FastAPI(
+            title="CycleWeave API",
+            description="Backend API for CycleWeave LCA Command Center",
+            version="1.0.0",
+            lifespan=lifespan
+        )
+        app.state.startup = report
+        
+        # Innermost, so CORS preflights and headers also cover tenant rejections
+        app.add_middleware(TenantMiddleware)
+        
+        # CORS Configuration
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=settings.cors_origins,
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+        if settings.compression_enabled:
+            app.add_middleware(
+                CompressionMiddleware,
+                minimum_size=settings.compression_min_size,
+                gzip_level=settings.compression_gzip_level,
+                brotli_quality=settings.compression_brotli_quality
+            )
+        if profiling_enabled():
+            app.add_middleware(ProfilingMiddleware)
+        app.add_middleware(MetricsMiddleware)
+        register_pool_collector(pool_stats)
+        
+        # Include routers
+        for router in routers:
+            app.include_router(router)
+        
+        add_service_routes(app)
+        
+        @app.exception_handler(StorageBusy)
+        async def storage_busy(request, exc: StorageBusy):
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "Storage is busy; retry shortly"},
+                headers={"Retry-After": "1"}
+            )
+    
+    return app
 
-# Include routers
-app.include_router(lca.router)
-app.include_router(scanner.router)
-app.include_router(doctor.router)
-app.include_router(passport.router)
+async def retry_indexes(app: FastAPI, delay: float = 1.0, max_delay: float = 60.0):
+    """Retry ensure_indexes() with backoff until it succeeds"""
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await ensure_indexes()
+        except Exception as exc:
+            print(f"Creating indexes failed: {exc}")
+            delay = min(delay * 2, max_delay)
+            continue
+        app.state.indexes_ready = True
+        print("Indexes created")
+        return
 
-@app.get("/")
-async def root():
-    return {
-        "name": "CycleWeave API",
-        "version": "1.0.0",
-        "status": "running",
-        "docs": "/docs"
-    }
+def add_service_routes(app: FastAPI):
+    """Root, health, readiness and metrics endpoints"""
+    
+    @app.get("/")
+    async def root():
+        return {
+            "name": "CycleWeave API",
+            "version": "1.0.0",
+            "status": "running",
+            "docs": "/docs"
+        }
+    
+    @app.get("/health")
+    async def health_check():
+        """Liveness: the process is up and serving requests"""
+        return {"status": "healthy"}
+    
+    @app.get("/ready")
+    async def readiness_check():
+        """Readiness: the database answers a ping within the configured deadline and has its indexes"""
+        settings = get_settings()
+        ok, detail = await ping_database(settings.readiness_timeout_seconds)
+        indexes_ready = getattr(app.state, "indexes_ready", False)
+        ok = ok and indexes_ready
+        
+        body = {
+            "status": "ready" if ok else "unavailable",
+            "database": detail,
+            "indexes": "ready" if indexes_ready else "pending",
+            "pool": {
+                "maxPoolSize": settings.mongo_max_pool_size,
+                "servers": pool_stats.snapshot()
+            }
+        }
+        
+        if not ok:
+            return JSONResponse(status_code=503, content=body)
+        return body
+    
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus scrape endpoint"""
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
 
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"}
+def __getattr__(name: str):
+    # `uvicorn app.main:app` keeps working: the app is built on first access
+    # instead of as a side effect of importing this module
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,200 @@
+import os
+import time
+from functools import wraps
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client.core import GaugeMetricFamily
+from pymongo import monitoring
+
+# HTTP
+REQUEST_LATENCY = Histogram(
+    'cycleweave_http_request_duration_seconds',
+    'HTTP request latency by route template',
+    ['method', 'route', 'status']
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'cycleweave_http_requests_in_flight',
+    'HTTP requests currently being served',
+    ['method'],
+    multiprocess_mode='livesum'
+)
+
+# Per tenant ("default" for requests without one)
+TENANT_REQUEST_LATENCY = Histogram(
+    'cycleweave_tenant_request_duration_seconds',
+    'HTTP request latency by tenant',
+    ['tenant']
+)
+TENANT_REQUESTS = Counter(
+    'cycleweave_tenant_requests_total',
+    'HTTP requests by tenant and status class',
+    ['tenant', 'status']
+)
+
+# Admission control
+ADMISSION_ACTIVE = Gauge(
+    'cycleweave_admission_active',
+    'Requests holding a concurrency slot of an admission-controlled route',
+    ['route'],
+    multiprocess_mode='livesum'
+)
+ADMISSION_QUEUED = Gauge(
+    'cycleweave_admission_queued',
+    'Requests waiting for a concurrency slot',
+    ['route'],
+    multiprocess_mode='livesum'
+)
+ADMISSION_SHED = Counter(
+    'cycleweave_admission_shed_total',
+    'Requests rejected by admission control',
+    ['route', 'reason']
+)
+
+# Passport lookup cache
+PASSPORT_CACHE_LOOKUPS = Counter(
+    'cycleweave_passport_cache_lookups_total',
+    'Single-passport lookups by tenant and outcome (hit, miss, coalesced)',
+    ['tenant', 'result']
+)
+
+# MongoDB
+MONGO_COMMAND_DURATION = Histogram(
+    'cycleweave_mongo_command_duration_seconds',
+    'MongoDB command round-trip time',
+    ['collection', 'command'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+MONGO_COMMAND_FAILURES = Counter(
+    'cycleweave_mongo_command_failures_total',
+    'MongoDB commands that returned an error',
+    ['collection', 'command']
+)
+
+# Service layer
+SERVICE_CPU_TIME = Histogram(
+    'cycleweave_service_cpu_seconds',
+    'CPU time spent in service-layer functions',
+    ['function'],
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+)
+
+def timed(name: str):
+    """Record the CPU time of each call in SERVICE_CPU_TIME"""
+    histogram = SERVICE_CPU_TIME.labels(name)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.thread_time() - started)
+        return wrapper
+    return decorator
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; label by its
+            # template so IDs in the path do not explode label cardinality
+            route = scope.get('route')
+            REQUEST_LATENCY.labels(
+                method,
+                route.path if route is not None else 'unmatched',
+                str(status_code)
+            ).observe(time.perf_counter() - started)
+            in_flight.dec()
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Times every MongoDB command by collection and operation"""
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        command_name = event.command_name
+        if command_name == 'getMore':
+            collection = event.command.get('collection')
+        else:
+            collection = event.command.get(command_name)
+        if not isinstance(collection, str):
+            # Admin commands such as ping/hello
+            collection = ''
+        self._pending[(event.request_id, event.connection_id)] = (collection, command_name)
+
+    def succeeded(self, event):
+        labels = self._pending.pop((event.request_id, event.connection_id), None)
+        if labels is not None:
+            MONGO_COMMAND_DURATION.labels(*labels).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        labels = self._pending.pop((event.request_id, event.connection_id), None)
+        if labels is not None:
+            MONGO_COMMAND_DURATION.labels(*labels).observe(event.duration_micros / 1e6)
+            MONGO_COMMAND_FAILURES.labels(*labels).inc()
+
+command_metrics = CommandMetricsListener()
+
+class PoolStatsCollector:
+    """Exposes the live pool statistics from database.PoolStatsListener at scrape time"""
+
+    def __init__(self, pool_stats):
+        self.pool_stats = pool_stats
+
+    def collect(self):
+        gauges = {
+            'size': GaugeMetricFamily('cycleweave_mongo_pool_connections', 'Open pool connections', labels=['server']),
+            'inUse': GaugeMetricFamily('cycleweave_mongo_pool_in_use', 'Checked-out pool connections', labels=['server']),
+            'waiting': GaugeMetricFamily('cycleweave_mongo_pool_waiting', 'Operations waiting for a connection', labels=['server'])
+        }
+        for server, pool in self.pool_stats.snapshot().items():
+            for field, gauge in gauges.items():
+                gauge.add_metric([server], pool[field])
+        return list(gauges.values())
+
+_pool_collector = None
+
+def register_pool_collector(pool_stats):
+    """Register once per process, however many apps create_app() builds"""
+    global _pool_collector
+    if _pool_collector is None:
+        _pool_collector = PoolStatsCollector(pool_stats)
+        REGISTRY.register(_pool_collector)
+
+def render_metrics() -> tuple:
+    """Return (body, content type) for the /metrics endpoint"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Several uvicorn workers: aggregate the per-process files
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -6,6 +6,10 @@ class MetricAnalysis(BaseModel):
     value: float
     benchmark: float
     isGap: bool
+    # Present when the benchmark comes from fleet data
+    percentile: Optional[float] = None
+    sampleSize: Optional[int] = None
+    benchmarkScope: Optional[str] = None
 
 class DoctorImprovement(BaseModel):
     id: str
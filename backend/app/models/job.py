@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Literal
+from datetime import datetime
+
+class JobAccepted(BaseModel):
+    jobId: str
+    status: Literal['queued']
+    statusUrl: str
+    resultUrl: str
+
+class JobStatus(BaseModel):
+    id: str = Field(alias="_id")
+    type: str
+    status: Literal['queued', 'running', 'succeeded', 'failed']
+    priority: int
+    attempts: int
+    maxAttempts: int
+    error: Optional[str] = None
+    createdAt: datetime
+    updatedAt: datetime
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
+    resultUrl: str
+    
+    class Config:
+        populate_by_name = True
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 from datetime import datetime
 from bson import ObjectId
 
@@ -48,6 +48,7 @@ class LCADataResponse(LCADataCreate):
     circularityScore: float
     createdAt: datetime
     updatedAt: datetime
+    version: int = 1
     
     class Config:
         populate_by_name = True
@@ -73,3 +74,107 @@ class LCADataUpdate(BaseModel):
     wasteRecovery: Optional[float] = None
     closedLoopRate: Optional[float] = None
     scenarioType: Optional[Literal['Current', 'Optimized', 'Baseline']] = None
+
+class LCACompareFilter(BaseModel):
+    metalType: Optional[Literal['Aluminium', 'Steel', 'Copper', 'Zinc', 'Lead']] = None
+    scenarioType: Optional[Literal['Current', 'Optimized', 'Baseline']] = None
+    furnaceType: Optional[Literal['Electric Arc', 'Blast', 'Induction']] = None
+    createdFrom: Optional[datetime] = None
+    createdTo: Optional[datetime] = None
+
+class LCACompareRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    filter: Optional[LCACompareFilter] = None
+    # Defaults to the first Baseline scenario, else the first assessment
+    baselineId: Optional[str] = None
+
+class LCARecord:
+    """
+    Compact in-memory form of an assessment used by the service layer.
+    Documents are converted once at the database boundary (from_document /
+    to_document); services read attributes at fixed slot offsets instead of
+    doing keyed lookups with defaults, and gridMix is flattened into four
+    fields. Missing fields take the defaults the calculations always used.
+    """
+    __slots__ = (
+        'id', 'metalType', 'oreGrade', 'miningMethod', 'waterUsage', 'totalEnergyConsumption',
+        'coal', 'hydro', 'solar', 'naturalGas',
+        'processHeat', 'furnaceType', 'temperature', 'fluxUsage', 'slagRecovery',
+        'transportMode', 'inboundDistance', 'outboundDistance', 'vehicleEfficiency',
+        'scrapInputRate', 'recyclingEfficiency', 'wasteRecovery', 'closedLoopRate',
+        'scenarioType', 'co2Emission', 'circularityScore', 'createdAt', 'updatedAt'
+    )
+    
+    # Top-level document fields: every slot but id and the flattened gridMix (slots 6-9)
+    DOCUMENT_FIELDS = __slots__[1:6] + __slots__[10:]
+    
+    @classmethod
+    def from_document(cls, doc: dict) -> 'LCARecord':
+        get = doc.get
+        record = cls.__new__(cls)
+        record.id = get('_id')
+        record.metalType = get('metalType')
+        record.oreGrade = get('oreGrade', 0)
+        record.miningMethod = get('miningMethod')
+        record.waterUsage = get('waterUsage', 0)
+        record.totalEnergyConsumption = get('totalEnergyConsumption', 0)
+        record.set_grid_mix(get('gridMix'))
+        record.processHeat = get('processHeat', 0)
+        record.furnaceType = get('furnaceType')
+        record.temperature = get('temperature', 0)
+        record.fluxUsage = get('fluxUsage', 0)
+        record.slagRecovery = get('slagRecovery', 0)
+        record.transportMode = get('transportMode')
+        record.inboundDistance = get('inboundDistance', 0)
+        record.outboundDistance = get('outboundDistance', 0)
+        record.vehicleEfficiency = get('vehicleEfficiency', 0.12)
+        record.scrapInputRate = get('scrapInputRate', 0)
+        record.recyclingEfficiency = get('recyclingEfficiency', 0)
+        record.wasteRecovery = get('wasteRecovery', 0)
+        record.closedLoopRate = get('closedLoopRate', 0)
+        record.scenarioType = get('scenarioType', 'Current')
+        record.co2Emission = get('co2Emission')
+        record.circularityScore = get('circularityScore')
+        record.createdAt = get('createdAt')
+        record.updatedAt = get('updatedAt')
+        return record
+    
+    @classmethod
+    def from_documents(cls, docs: List[dict]) -> List['LCARecord']:
+        return [cls.from_document(doc) for doc in docs]
+    
+    def set_grid_mix(self, grid_mix: Optional[dict]):
+        get = (grid_mix or {}).get
+        self.coal = get('coal', 0)
+        self.hydro = get('hydro', 0)
+        self.solar = get('solar', 0)
+        self.naturalGas = get('naturalGas', 0)
+    
+    def grid_mix(self) -> dict:
+        return {'coal': self.coal, 'hydro': self.hydro, 'solar': self.solar, 'naturalGas': self.naturalGas}
+    
+    def with_changes(self, changes: dict) -> 'LCARecord':
+        """
+        Copy with `changes` (document-shaped, e.g. a simulateAction) applied.
+        A gridMix in `changes` replaces the whole mix, as it would in the document.
+        Raises ValueError for fields an assessment does not have.
+        """
+        unknown = [field for field in changes if field != 'gridMix' and field not in self.DOCUMENT_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown assessment field(s): {', '.join(sorted(unknown))}")
+        
+        record = self.__class__.__new__(self.__class__)
+        for field in self.__slots__:
+            setattr(record, field, getattr(self, field))
+        for field, value in changes.items():
+            if field == 'gridMix':
+                record.set_grid_mix(value)
+            else:
+                setattr(record, field, value)
+        return record
+    
+    def to_document(self) -> dict:
+        """Document form for storage (without _id)"""
+        doc = {field: getattr(self, field) for field in self.DOCUMENT_FIELDS}
+        doc['gridMix'] = self.grid_mix()
+        return doc
@@ -1,13 +1,28 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
+class ProvenanceEventCreate(BaseModel):
+    event: str = Field(min_length=1, max_length=200)
+    location: str = Field(min_length=1, max_length=200)
+    timestamp: Optional[datetime] = None
+    details: Dict[str, Any] = {}
+
 class ProvenanceEvent(BaseModel):
-    timestamp: str
+    seq: int
+    timestamp: datetime
     event: str
     location: str
+    details: Dict[str, Any] = {}
+    prevHash: str
+    hash: str
     verified: bool
 
+class ProvenancePage(BaseModel):
+    events: List[ProvenanceEvent]
+    nextAfter: Optional[int] = None
+    verifiedThrough: int
+
 class PassportCreate(BaseModel):
     lcaId: str
     doctorAnalysisId: Optional[str] = None
@@ -26,7 +41,7 @@ class PassportResponse(BaseModel):
     scenarioType: str
     grade: str
     gradeLabel: str
-    provenance: List[ProvenanceEvent]
+    provenanceUrl: str
     certifications: List[str]
     qrCode: str
     generatedAt: datetime
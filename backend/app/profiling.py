@@ -0,0 +1,232 @@
+import asyncio
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+from app.config import get_settings
+from app.database import get_shared_database
+
+PROFILE_HEADER = "x-profile-request"
+
+class SamplingProfiler:
+    """
+    Samples the call stacks of a thread, and of the worker threads attached
+    to it while they run its threadpool calls, from a background thread. The
+    result is a speedscope file (https://www.speedscope.app) with one
+    "sampled" profile per thread.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self._frames = []
+        self._frame_index = {}
+        # thread id -> (samples, weights), the profiled thread first
+        self._threads = {thread_id: ([], [])}
+        self._attached = {thread_id}
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.ended_at = None
+
+    def start(self):
+        # The sampler needs the GIL to take a sample; shorten the switch
+        # interval while profiling so CPU-bound code is sampled on schedule
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Signal the sampler to stop, without waiting; join() before reading the samples"""
+        self.ended_at = time.perf_counter()
+        self._stop.set()
+        sys.setswitchinterval(self._switch_interval)
+
+    def join(self):
+        # Blocks for up to one interval while the sampler wakes up: not on the event loop
+        self._thread.join()
+
+    @property
+    def sample_count(self) -> int:
+        return sum(len(samples) for samples, _ in self._threads.values())
+
+    def attach(self, thread_id: int):
+        """Sample `thread_id` too until detach()"""
+        self._threads.setdefault(thread_id, ([], []))
+        self._attached.add(thread_id)
+
+    def detach(self, thread_id: int):
+        self._attached.discard(thread_id)
+
+    def _frame_id(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = len(self._frames)
+            self._frame_index[key] = index
+            self._frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return index
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            if self.thread_id not in frames:
+                break
+            # Attached threads come and go from other threads: iterate a copy
+            for thread_id in tuple(self._attached):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                samples, weights = self._threads[thread_id]
+                samples.append(stack)
+                weights.append((now - last) * 1000)
+            last = now
+
+    def speedscope(self, name: str) -> dict:
+        profiles = []
+        for index, (samples, weights) in enumerate(self._threads.values()):
+            profiles.append({
+                'type': 'sampled',
+                'name': name if index == 0 else f"{name} (worker thread {index})",
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights
+            })
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': self._frames},
+            'profiles': profiles,
+            'name': name,
+            'exporter': 'cycleweave'
+        }
+
+# Profiler of the request being profiled, for its run_in_threadpool calls
+_active_profiler: ContextVar[Optional[SamplingProfiler]] = ContextVar('active_profiler', default=None)
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """Starlette's run_in_threadpool; in a profiled request the worker thread is sampled too"""
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return await _run_in_threadpool(func, *args, **kwargs)
+
+    def sampled():
+        thread_id = threading.get_ident()
+        profiler.attach(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.detach(thread_id)
+
+    return await _run_in_threadpool(sampled)
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that carry X-Profile-Request: <admin token>, or a random
+    sample at PROFILING_SAMPLE_RATE. Only one request is profiled at a time;
+    the sampler sees the whole event loop thread, so concurrent requests show
+    up in the profile too (their count is stored with it). Work the request
+    hands to the threadpool through run_in_threadpool() is sampled on its
+    worker threads; other threads are not.
+    """
+
+    def __init__(self, app):
+        settings = get_settings()
+        self.app = app
+        self.interval = settings.profiling_interval_ms / 1000
+        self.sample_rate = settings.profiling_sample_rate
+        self.token = settings.admin_token.encode() if settings.admin_token else None
+        self._active = False
+        self._in_flight = 0
+        self._tasks = set()
+
+    def _trigger(self, scope):
+        if self.token is not None:
+            for name, value in scope['headers']:
+                if name == PROFILE_HEADER.encode():
+                    return 'header' if value == self.token else None
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        self._in_flight += 1
+        try:
+            trigger = self._trigger(scope)
+            if trigger is None or self._active:
+                await self.app(scope, receive, send)
+                return
+            await self._profile(scope, receive, send, trigger)
+        finally:
+            self._in_flight -= 1
+
+    async def _profile(self, scope, receive, send, trigger: str):
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        self._active = True
+        concurrent = self._in_flight - 1
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        token = _active_profiler.set(profiler)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            profiler.stop()
+            _active_profiler.reset(token)
+            self._active = False
+
+            route = scope.get('route')
+            record = {
+                'method': scope['method'],
+                'route': route.path if route is not None else None,
+                'path': scope['path'],
+                'status': status_code,
+                'trigger': trigger,
+                'durationMs': round((profiler.ended_at - profiler.started_at) * 1000, 2),
+                'intervalMs': self.interval * 1000,
+                'concurrentRequests': concurrent,
+                'createdAt': datetime.utcnow()
+            }
+            # Store after the response so profiling does not add a write to its latency
+            task = asyncio.ensure_future(self._store(profiler, record))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _store(self, profiler: SamplingProfiler, record: dict):
+        try:
+            await _run_in_threadpool(profiler.join)
+            record['sampleCount'] = profiler.sample_count
+            record['profile'] = profiler.speedscope(f"{record['method']} {record['path']}")
+            await get_shared_database().request_profiles.insert_one(record)
+        except Exception as exc:
+            print(f"Failed to store request profile: {exc}")
+
+def profiling_enabled() -> bool:
+    settings = get_settings()
+    return bool(settings.admin_token) or settings.profiling_sample_rate > 0
@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from typing import List, Optional
+from bson import ObjectId
+
+from app.admission import admission_stats
+from app.config import get_settings
+from app.database import get_shared_database
+from app.services.fleet_benchmarks import fleet_benchmarks
+from app.services.job_service import register_job_handler, enqueue_job, accepted_response
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints require X-Admin-Token to match ADMIN_TOKEN"""
+    settings = get_settings()
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token != settings.admin_token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/profiles", response_model=List[dict])
+async def list_profiles(route: Optional[str] = None, skip: int = 0, limit: int = 50):
+    """List stored request profiles (metadata only), newest first"""
+    db = get_shared_database()
+    
+    query = {"route": route} if route else {}
+    cursor = db.request_profiles.find(query, {"profile": 0}).skip(skip).limit(limit).sort("createdAt", -1)
+    profiles = await cursor.to_list(length=limit)
+    
+    for profile in profiles:
+        profile['_id'] = str(profile['_id'])
+    
+    return profiles
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Download a request profile in speedscope format"""
+    db = get_shared_database()
+    
+    if not ObjectId.is_valid(profile_id):
+        raise HTTPException(status_code=400, detail="Invalid profile ID format")
+    
+    record = await db.request_profiles.find_one({"_id": ObjectId(profile_id)}, {"profile": 1})
+    
+    if not record:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return JSONResponse(
+        content=record['profile'],
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'}
+    )
+
+@router.delete("/profiles/{profile_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_profile(profile_id: str):
+    """Delete a stored request profile"""
+    db = get_shared_database()
+    
+    if not ObjectId.is_valid(profile_id):
+        raise HTTPException(status_code=400, detail="Invalid profile ID format")
+    
+    result = await db.request_profiles.delete_one({"_id": ObjectId(profile_id)})
+    
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+@router.get("/startup")
+async def startup_report(request: Request):
+    """Per-phase startup timings of this worker process"""
+    return request.app.state.startup.as_dict()
+
+@router.get("/admission")
+async def admission_report():
+    """Concurrency slots, queue depths and shed counts of admission-controlled routes (this worker)"""
+    return admission_stats()
+
+async def run_benchmark_rebuild_job(payload: dict) -> dict:
+    return await fleet_benchmarks.rebuild()
+
+register_job_handler("fleet.rebuild", run_benchmark_rebuild_job)
+
+@router.post("/benchmarks/rebuild", status_code=status.HTTP_202_ACCEPTED)
+async def rebuild_benchmarks():
+    """
+    Recompute the fleet benchmark sketches from every stored assessment
+    (sketches are append-only, so this is how updates and deletes are applied)
+    """
+    job_id = await enqueue_job("fleet.rebuild", {})
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=accepted_response(job_id))
@@ -1,32 +1,44 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 
+from app.admission import admit
+from app.config import get_settings
 from app.database import get_database
+from app.http_cache import immutable_cache_control, revalidate, set_validators
 from app.models.doctor import DoctorAnalysisRequest, DoctorAnalysisResponse
+from app.models.lca import LCARecord
+from app.profiling import run_in_threadpool
 from app.services.doctor_service import analyze_lca
+from app.services.fleet_benchmarks import ANY, fleet_benchmarks
+from app.services.passport_lookup import passport_cache
+from app.services.lca_versions import update_versioned
+from app.services.job_service import (
+    CLIENT_PRIORITY_MAX, CLIENT_PRIORITY_MIN, register_job_handler, enqueue_job, accepted_response
+)
 
 router = APIRouter(prefix="/api/doctor", tags=["AI Doctor"])
 
-@router.post("/analyze", response_model=dict)
-async def run_analysis(request: DoctorAnalysisRequest):
-    """Run AI Doctor analysis on an LCA assessment"""
+async def build_analysis(lca_id: str) -> dict:
+    """Run the AI Doctor on an LCA assessment and store the result"""
     db = get_database()
     
-    if not ObjectId.is_valid(request.lcaId):
-        raise HTTPException(status_code=400, detail="Invalid LCA ID format")
-    
     # Get LCA data
-    lca = await db.lca_assessments.find_one({"_id": ObjectId(request.lcaId)})
+    lca = await db.lca_assessments.find_one({"_id": ObjectId(lca_id)})
     if not lca:
         raise HTTPException(status_code=404, detail="LCA assessment not found")
     
-    # Run analysis
-    analysis = analyze_lca(lca)
+    # Benchmark against comparable assessments when the fleet is large enough
+    record = LCARecord.from_document(lca)
+    fleet = await fleet_benchmarks.lookup(record.metalType, record.furnaceType)
+    
+    # Run analysis (CPU-bound, off the event loop)
+    analysis = await run_in_threadpool(analyze_lca, record, fleet)
     
     # Store analysis result
-    analysis['lcaId'] = request.lcaId
+    analysis['lcaId'] = lca_id
     analysis['createdAt'] = datetime.utcnow()
     
     result = await db.doctor_analyses.insert_one(analysis)
@@ -35,6 +47,31 @@ async def run_analysis(request: DoctorAnalysisRequest):
     
     return analysis
 
+async def run_analysis_job(payload: dict) -> dict:
+    return await build_analysis(payload['lcaId'])
+
+register_job_handler("doctor.analyze", run_analysis_job)
+
+@router.post("/analyze", response_model=dict, dependencies=[Depends(admit("doctor.analyze", skip_background=True))])
+async def run_analysis(
+    request: DoctorAnalysisRequest,
+    background: bool = False,
+    priority: int = Query(0, ge=CLIENT_PRIORITY_MIN, le=CLIENT_PRIORITY_MAX)
+):
+    """
+    Run AI Doctor analysis on an LCA assessment.
+    With `background=true` the analysis runs on a job worker and the
+    endpoint answers 202 Accepted with the job ID.
+    """
+    if not ObjectId.is_valid(request.lcaId):
+        raise HTTPException(status_code=400, detail="Invalid LCA ID format")
+    
+    if background:
+        job_id = await enqueue_job("doctor.analyze", request.model_dump(), priority=priority)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=accepted_response(job_id))
+    
+    return await build_analysis(request.lcaId)
+
 @router.get("/", response_model=List[dict])
 async def list_analyses(skip: int = 0, limit: int = 50):
     """List all doctor analyses"""
@@ -48,19 +85,46 @@ async def list_analyses(skip: int = 0, limit: int = 50):
     
     return analyses
 
+@router.get("/benchmarks", response_model=dict)
+async def get_benchmarks(metalType: Optional[str] = None, furnaceType: Optional[str] = None):
+    """
+    Fleet distribution (p10-p90) of carbon intensity, energy efficiency and
+    circularity for a metal/furnace group. Omit furnaceType for the whole
+    metal and both for the whole fleet.
+    """
+    if metalType is None:
+        furnaceType = None
+    key = f"{metalType or ANY}/{furnaceType or ANY}"
+    
+    benchmark = await fleet_benchmarks.get(key)
+    if benchmark is None:
+        raise HTTPException(status_code=404, detail="No fleet data for this group yet")
+    
+    summary = benchmark.summary()
+    summary['sufficient'] = benchmark.count >= get_settings().fleet_benchmark_min_samples
+    return summary
+
 @router.get("/{analysis_id}", response_model=dict)
-async def get_analysis(analysis_id: str):
-    """Get a specific doctor analysis"""
+async def get_analysis(analysis_id: str, request: Request, response: Response):
+    """Get a specific doctor analysis (immutable once written; cacheable)"""
     db = get_database()
     
     if not ObjectId.is_valid(analysis_id):
         raise HTTPException(status_code=400, detail="Invalid analysis ID format")
     
-    analysis = await db.doctor_analyses.find_one({"_id": ObjectId(analysis_id)})
+    query = {"_id": ObjectId(analysis_id)}
+    cache_control = immutable_cache_control(get_settings().immutable_cache_max_age)
+    
+    not_modified = await revalidate(request, db.doctor_analyses, query, cache_control)
+    if not_modified:
+        return not_modified
+    
+    analysis = await db.doctor_analyses.find_one(query)
     
     if not analysis:
         raise HTTPException(status_code=404, detail="Analysis not found")
     
+    set_validators(response, [analysis], cache_control)
     analysis['_id'] = str(analysis['_id'])
     return analysis
 
@@ -107,17 +171,13 @@ async def apply_improvement(analysis_id: str, improvement_id: str):
     if not ObjectId.is_valid(lca_id):
         raise HTTPException(status_code=400, detail="Invalid LCA ID in analysis")
     
-    lca = await db.lca_assessments.find_one({"_id": ObjectId(lca_id)})
-    if not lca:
-        raise HTTPException(status_code=404, detail="LCA assessment not found")
-    
-    # Apply simulation action
+    # Apply simulation action (recorded as a new version of the LCA)
     updates = {**improvement['simulateAction'], 'updatedAt': datetime.utcnow(), 'scenarioType': 'Optimized'}
     
-    await db.lca_assessments.update_one(
-        {"_id": ObjectId(lca_id)},
-        {"$set": updates}
-    )
+    lca = await update_versioned(lca_id, lambda current: updates)
+    if not lca:
+        raise HTTPException(status_code=404, detail="LCA assessment not found")
+    passport_cache.invalidate_lca(lca_id)
     
     return {
         "message": f"Applied improvement: {improvement['title']}",
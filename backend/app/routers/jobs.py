@@ -0,0 +1,73 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from typing import List, Optional
+from bson import ObjectId
+
+from app.database import current_tenant, get_shared_database
+from app.models.job import JobStatus
+from app.services.job_service import serialize_job, JOB_SUCCEEDED, JOB_FAILED
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+@router.get("/", response_model=List[JobStatus])
+async def list_jobs(
+    job_status: Optional[str] = Query(None, alias="status"),
+    job_type: Optional[str] = Query(None, alias="type"),
+    skip: int = 0,
+    limit: int = 50
+):
+    """List background jobs, newest first"""
+    db = get_shared_database()
+    
+    # The queue is shared; each tenant sees its own jobs
+    query = {'tenant': current_tenant.get()}
+    if job_status:
+        query['status'] = job_status
+    if job_type:
+        query['type'] = job_type
+    
+    cursor = db.jobs.find(query, {"payload": 0, "result": 0}).skip(skip).limit(limit).sort("createdAt", -1)
+    jobs = await cursor.to_list(length=limit)
+    
+    return [serialize_job(job) for job in jobs]
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Get the status of a background job"""
+    db = get_shared_database()
+    
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+    
+    job = await db.jobs.find_one({"_id": ObjectId(job_id), "tenant": current_tenant.get()}, {"payload": 0, "result": 0})
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return serialize_job(job)
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Get the result of a finished job (202 while it is still queued or running)"""
+    db = get_shared_database()
+    
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+    
+    job = await db.jobs.find_one({"_id": ObjectId(job_id), "tenant": current_tenant.get()}, {"payload": 0})
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job['status'] == JOB_FAILED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job failed: {job.get('error')}")
+    
+    if job['status'] != JOB_SUCCEEDED:
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(serialize_job(job)),
+            headers={"Location": f"/api/jobs/{job_id}"}
+        )
+    
+    return job['result']
@@ -1,11 +1,29 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
 
+from app.admission import admit
+from app.config import get_settings
 from app.database import get_database
-from app.models.lca import LCADataCreate, LCADataResponse, LCADataUpdate
-from app.services.calculations import calculate_emissions, calculate_circularity
+from app.encoding import Layout, negotiate_list
+from app.http_cache import NO_CACHE, revalidate, set_validators
+from app.models.lca import LCACompareRequest, LCADataCreate, LCADataResponse, LCADataUpdate, LCARecord
+from app.profiling import run_in_threadpool
+from app.services.calculations import (
+    calculate_emissions, calculate_circularity, calculate_emissions_batch, calculate_circularity_batch
+)
+from app.services.comparison import COMPARE_PROJECTION, baseline_index, compare_assessments
+from app.services.fleet_benchmarks import fleet_benchmarks
+from app.services.lca_versions import delete_versions, get_version, list_versions, update_versioned
+from app.services.passport_lookup import passport_cache
+from app.services.lca_io import (
+    EXPORT_ENCODERS, EXPORT_MEDIA_TYPES, parse_columns, build_projection, build_export_query,
+    detect_import_format, iter_import_rows, validate_import_chunk
+)
 
 router = APIRouter(prefix="/api/lca", tags=["LCA"])
 
@@ -15,23 +33,189 @@ async def create_lca(lca_data: LCADataCreate):
     db = get_database()
     
     data_dict = lca_data.model_dump()
+    record = LCARecord.from_document(data_dict)
     
     # Calculate derived values
-    data_dict['co2Emission'] = calculate_emissions(data_dict)
-    data_dict['circularityScore'] = calculate_circularity(data_dict)
+    data_dict['co2Emission'] = calculate_emissions(record)
+    data_dict['circularityScore'] = calculate_circularity(record)
     data_dict['createdAt'] = datetime.utcnow()
     data_dict['updatedAt'] = datetime.utcnow()
+    data_dict['version'] = 1
     
     result = await db.lca_assessments.insert_one(data_dict)
+    fleet_benchmarks.record([LCARecord.from_document(data_dict)])
     
     created = await db.lca_assessments.find_one({"_id": result.inserted_id})
     created['_id'] = str(created['_id'])
     
     return created
 
+async def _insert_import_chunk(db, valid: list) -> tuple:
+    """Insert validated rows unordered; returns (inserted count, per-row write errors)"""
+    docs = [doc for _, doc in valid]
+    now = datetime.utcnow()
+    
+    # Derived values for the whole chunk at once
+    records = LCARecord.from_documents(docs)
+    emissions = calculate_emissions_batch(records)
+    circularity = calculate_circularity_batch(records)
+    for doc, co2, score in zip(docs, emissions, circularity):
+        doc['co2Emission'] = co2
+        doc['circularityScore'] = score
+        doc['createdAt'] = now
+        doc['updatedAt'] = now
+        doc['version'] = 1
+    
+    try:
+        result = await db.lca_assessments.insert_many(docs, ordered=False)
+        fleet_benchmarks.record(LCARecord.from_documents(docs))
+        return len(result.inserted_ids), []
+    except BulkWriteError as exc:
+        write_errors = exc.details.get('writeErrors', [])
+        failed = {error['index'] for error in write_errors}
+        fleet_benchmarks.record(LCARecord.from_documents([doc for i, doc in enumerate(docs) if i not in failed]))
+        errors = [
+            {'row': valid[error['index']][0], 'errors': [error.get('errmsg', 'Write failed')]}
+            for error in write_errors
+        ]
+        return exc.details.get('nInserted', len(docs) - len(write_errors)), errors
+
+@router.post("/import", response_model=dict)
+async def import_lca(
+    request: Request,
+    format: Optional[Literal['csv', 'ndjson']] = None,
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    max_errors: int = Query(1000, ge=0)
+):
+    """
+    Bulk import LCA assessments from an NDJSON or CSV request body.
+    The body is parsed as it streams in and validated in chunks; invalid rows
+    are reported individually and do not abort the rest of the file.
+    """
+    db = get_database()
+    
+    fmt = format or detect_import_format(request.headers.get('content-type'))
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+    
+    received = 0
+    inserted = 0
+    errors = []
+    failed = 0
+    chunk = []
+    pending_insert = None
+    
+    def record_errors(row_errors):
+        nonlocal failed
+        failed += len(row_errors)
+        errors.extend(row_errors[:max(0, max_errors - len(errors))])
+    
+    async def flush():
+        # Validate/compute this chunk while the previous chunk's insert is in flight
+        nonlocal chunk, pending_insert, inserted
+        valid, row_errors = validate_import_chunk(chunk)
+        chunk = []
+        record_errors(row_errors)
+        
+        if pending_insert is not None:
+            count, write_errors = await pending_insert
+            inserted += count
+            record_errors(write_errors)
+            pending_insert = None
+        
+        if valid:
+            pending_insert = asyncio.ensure_future(_insert_import_chunk(db, valid))
+    
+    async for row_number, doc, parse_error in iter_import_rows(request.stream(), fmt):
+        received += 1
+        if parse_error:
+            record_errors([{'row': row_number, 'errors': [parse_error]}])
+            continue
+        chunk.append((row_number, doc))
+        if len(chunk) >= chunk_size:
+            await flush()
+    
+    await flush()
+    if pending_insert is not None:
+        count, write_errors = await pending_insert
+        inserted += count
+        record_errors(write_errors)
+    
+    errors.sort(key=lambda error: error['row'])
+    
+    return {
+        'received': received,
+        'inserted': inserted,
+        'failed': failed,
+        'errors': errors,
+        'errorsTruncated': failed > len(errors)
+    }
+
+@router.post("/compare", response_model=dict, dependencies=[Depends(admit("lca.compare"))])
+async def compare_lca(comparison: LCACompareRequest):
+    """
+    Compare assessments (by `ids` or `filter`) against a baseline.
+    All scenarios are loaded with one query and evaluated in one batch; the
+    result holds values and deltas for every input, derived metric and
+    emission component, one list per metric in scenario order.
+    """
+    db = get_database()
+    max_scenarios = get_settings().compare_max_scenarios
+    
+    if (comparison.ids is None) == (comparison.filter is None):
+        raise HTTPException(status_code=400, detail="Pass exactly one of 'ids' or 'filter'")
+    
+    baseline_id = comparison.baselineId
+    if baseline_id is not None and not ObjectId.is_valid(baseline_id):
+        raise HTTPException(status_code=400, detail="Invalid baseline ID format")
+    
+    if comparison.ids is not None:
+        ids = list(dict.fromkeys(comparison.ids))
+        if baseline_id is not None and baseline_id not in ids:
+            ids.insert(0, baseline_id)
+        invalid = [i for i in ids if not ObjectId.is_valid(i)]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Invalid LCA ID format: {', '.join(invalid)}")
+        if not ids:
+            raise HTTPException(status_code=400, detail="No assessments to compare")
+        if len(ids) > max_scenarios:
+            raise HTTPException(status_code=400, detail=f"At most {max_scenarios} assessments can be compared")
+        
+        cursor = db.lca_assessments.find({"_id": {"$in": [ObjectId(i) for i in ids]}}, COMPARE_PROJECTION)
+        found = {str(doc['_id']): LCARecord.from_document(doc) for doc in await cursor.to_list(length=len(ids))}
+        missing = [i for i in ids if i not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"LCA assessments not found: {', '.join(missing)}")
+        # Keep the caller's order
+        rows = [found[i] for i in ids]
+    else:
+        f = comparison.filter
+        query = build_export_query(f.metalType, f.scenarioType, f.furnaceType, f.createdFrom, f.createdTo)
+        if baseline_id is not None:
+            query = {"$or": [query, {"_id": ObjectId(baseline_id)}]}
+        cursor = db.lca_assessments.find(query, COMPARE_PROJECTION).sort("createdAt", 1).limit(max_scenarios + 1)
+        rows = LCARecord.from_documents(await cursor.to_list(length=max_scenarios + 1))
+        if len(rows) > max_scenarios:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Filter matches more than {max_scenarios} assessments; narrow it down"
+            )
+        if not rows:
+            raise HTTPException(status_code=404, detail="No LCA assessments match the filter")
+    
+    base = baseline_index(rows, baseline_id)
+    if base is None:
+        raise HTTPException(status_code=404, detail="Baseline LCA assessment not found")
+    
+    return await run_in_threadpool(compare_assessments, rows, base)
+
 @router.get("/", response_model=List[LCADataResponse])
-async def list_lca(skip: int = 0, limit: int = 100):
-    """List all LCA assessments"""
+async def list_lca(request: Request, response: Response, skip: int = 0, limit: int = 100, layout: Layout = 'rows'):
+    """
+    List all LCA assessments.
+    Send `Accept: application/msgpack` for MessagePack and/or `layout=columnar`
+    for one array per field instead of one object per assessment.
+    """
     db = get_database()
     
     cursor = db.lca_assessments.find().skip(skip).limit(limit).sort("createdAt", -1)
@@ -40,21 +224,64 @@ async def list_lca(skip: int = 0, limit: int = 100):
     for assessment in assessments:
         assessment['_id'] = str(assessment['_id'])
     
+    encoded = negotiate_list(request, response, assessments, layout, LCADataResponse)
+    if encoded is not None:
+        return encoded
+    
     return assessments
 
+@router.get("/export")
+async def export_lca(
+    format: Literal['csv', 'parquet', 'ndjson'] = 'csv',
+    columns: Optional[str] = Query(None, description="Comma-separated column selection"),
+    metalType: Optional[str] = None,
+    scenarioType: Optional[str] = None,
+    furnaceType: Optional[str] = None,
+    createdFrom: Optional[datetime] = None,
+    createdTo: Optional[datetime] = None,
+    batch_size: int = Query(1000, ge=100, le=50000)
+):
+    """
+    Export all matching LCA assessments.
+    Rows are streamed from a batched cursor, so memory use does not grow
+    with the size of the export. Parquet output gets one row group per batch.
+    """
+    db = get_database()
+    
+    try:
+        selected = parse_columns(columns)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    query = build_export_query(metalType, scenarioType, furnaceType, createdFrom, createdTo)
+    cursor = db.lca_assessments.find(query, build_projection(selected)).sort("createdAt", 1).batch_size(batch_size)
+    
+    return StreamingResponse(
+        EXPORT_ENCODERS[format](cursor, selected, batch_size),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="lca_export.{format}"'}
+    )
+
 @router.get("/{lca_id}", response_model=LCADataResponse)
-async def get_lca(lca_id: str):
-    """Get a specific LCA assessment"""
+async def get_lca(lca_id: str, request: Request, response: Response):
+    """Get a specific LCA assessment (supports If-None-Match / If-Modified-Since)"""
     db = get_database()
     
     if not ObjectId.is_valid(lca_id):
         raise HTTPException(status_code=400, detail="Invalid LCA ID format")
     
-    assessment = await db.lca_assessments.find_one({"_id": ObjectId(lca_id)})
+    query = {"_id": ObjectId(lca_id)}
+    
+    not_modified = await revalidate(request, db.lca_assessments, query, NO_CACHE)
+    if not_modified:
+        return not_modified
+    
+    assessment = await db.lca_assessments.find_one(query)
     
     if not assessment:
         raise HTTPException(status_code=404, detail="LCA assessment not found")
     
+    set_validators(response, [assessment], NO_CACHE)
     assessment['_id'] = str(assessment['_id'])
     return assessment
 
@@ -66,28 +293,29 @@ async def update_lca(lca_id: str, lca_update: LCADataUpdate):
     if not ObjectId.is_valid(lca_id):
         raise HTTPException(status_code=400, detail="Invalid LCA ID format")
     
-    # Get current data
-    existing = await db.lca_assessments.find_one({"_id": ObjectId(lca_id)})
-    if not existing:
-        raise HTTPException(status_code=404, detail="LCA assessment not found")
-    
     # Merge updates
     update_data = {k: v for k, v in lca_update.model_dump().items() if v is not None}
     
-    if update_data:
+    def merge(existing: dict) -> dict:
         merged_data = {**existing, **update_data}
+        record = LCARecord.from_document(merged_data)
         
         # Recalculate derived values
-        merged_data['co2Emission'] = calculate_emissions(merged_data)
-        merged_data['circularityScore'] = calculate_circularity(merged_data)
+        merged_data['co2Emission'] = calculate_emissions(record)
+        merged_data['circularityScore'] = calculate_circularity(record)
         merged_data['updatedAt'] = datetime.utcnow()
-        
-        await db.lca_assessments.update_one(
-            {"_id": ObjectId(lca_id)},
-            {"$set": merged_data}
-        )
+        return merged_data
+    
+    if update_data:
+        if not await update_versioned(lca_id, merge):
+            raise HTTPException(status_code=404, detail="LCA assessment not found")
+        # Cached passports embedding this LCA (expand=lca, /full) are stale now
+        passport_cache.invalidate_lca(lca_id)
     
     updated = await db.lca_assessments.find_one({"_id": ObjectId(lca_id)})
+    if not updated:
+        raise HTTPException(status_code=404, detail="LCA assessment not found")
+    
     updated['_id'] = str(updated['_id'])
     
     return updated
@@ -104,6 +332,9 @@ async def delete_lca(lca_id: str):
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="LCA assessment not found")
+    
+    passport_cache.invalidate_lca(lca_id)
+    await delete_versions(lca_id)
 
 @router.post("/{lca_id}/simulate", response_model=dict)
 async def simulate_changes(lca_id: str, changes: dict):
@@ -117,8 +348,11 @@ async def simulate_changes(lca_id: str, changes: dict):
     if not existing:
         raise HTTPException(status_code=404, detail="LCA assessment not found")
     
-    # Merge changes for simulation
-    simulated = {**existing, **changes}
+    # Apply changes to the in-memory record only
+    try:
+        simulated = LCARecord.from_document(existing).with_changes(changes)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
     
     # Calculate new values
     new_co2 = calculate_emissions(simulated)
@@ -138,3 +372,41 @@ async def simulate_changes(lca_id: str, changes: dict):
             'circularityScore': new_circularity - existing['circularityScore']
         }
     }
+
+@router.get("/{lca_id}/versions", response_model=dict)
+async def get_lca_versions(lca_id: str, before: Optional[int] = None, limit: int = Query(50, ge=1, le=500)):
+    """
+    Version history of an assessment, newest first. Each write stores only the
+    fields it changed; page with `before=<nextBefore>`.
+    """
+    db = get_database()
+    
+    if not ObjectId.is_valid(lca_id):
+        raise HTTPException(status_code=400, detail="Invalid LCA ID format")
+    
+    existing = await db.lca_assessments.find_one({"_id": ObjectId(lca_id)}, {"version": 1})
+    if not existing:
+        raise HTTPException(status_code=404, detail="LCA assessment not found")
+    
+    history = await list_versions(lca_id, before, limit)
+    history['currentVersion'] = existing.get('version', 1)
+    return history
+
+@router.get("/{lca_id}/versions/{version}", response_model=dict)
+async def get_lca_version(lca_id: str, version: int):
+    """The assessment as it was at `version` (e.g. the lcaVersion a passport was issued from)"""
+    db = get_database()
+    
+    if not ObjectId.is_valid(lca_id):
+        raise HTTPException(status_code=400, detail="Invalid LCA ID format")
+    
+    existing = await db.lca_assessments.find_one({"_id": ObjectId(lca_id)})
+    if not existing:
+        raise HTTPException(status_code=404, detail="LCA assessment not found")
+    
+    assessment = await get_version(existing, version)
+    if assessment is None:
+        raise HTTPException(status_code=404, detail="Version not found")
+    
+    assessment['_id'] = str(assessment['_id'])
+    return assessment
@@ -1,78 +1,204 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
+from app.admission import admit
+from app.config import get_settings
 from app.database import get_database
-from app.models.passport import PassportCreate, PassportResponse
+from app.encoding import Layout, negotiate_list
+from app.http_cache import (
+    NO_CACHE, VALIDATOR_FIELDS, check_not_modified, has_conditions, immutable_cache_control, set_validators
+)
+from app.models.lca import LCARecord
+from app.models.passport import PassportCreate, PassportResponse, ProvenanceEvent, ProvenanceEventCreate, ProvenancePage
+from app.profiling import run_in_threadpool
 from app.services.passport_service import create_passport_data
+from app.services.passport_lookup import (
+    find_passports, parse_expand, embedded_documents, serialize_passport, passport_cache
+)
+from app.services.provenance_service import append_event, list_events, verify_chain, serialize_event
 from app.services.calculations import calculate_emissions, calculate_circularity
+from app.services.job_service import (
+    CLIENT_PRIORITY_MAX, CLIENT_PRIORITY_MIN, register_job_handler, enqueue_job, accepted_response
+)
 
 router = APIRouter(prefix="/api/passport", tags=["Material Passport"])
 
-@router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def generate_passport(request: PassportCreate):
-    """Generate a new Material Passport for an LCA assessment"""
+PASSPORT_ID_ATTEMPTS = 3
+
+async def build_passport(lca_id: str, doctor_analysis_id: Optional[str] = None) -> dict:
+    """Render and store a passport for an LCA assessment"""
     db = get_database()
     
-    if not ObjectId.is_valid(request.lcaId):
-        raise HTTPException(status_code=400, detail="Invalid LCA ID format")
-    
     # Get LCA data
-    lca = await db.lca_assessments.find_one({"_id": ObjectId(request.lcaId)})
+    lca = await db.lca_assessments.find_one({"_id": ObjectId(lca_id)})
     if not lca:
         raise HTTPException(status_code=404, detail="LCA assessment not found")
     
+    record = LCARecord.from_document(lca)
+    
     # Ensure calculated values are current
-    lca['co2Emission'] = calculate_emissions(lca)
-    lca['circularityScore'] = calculate_circularity(lca)
+    record.co2Emission = calculate_emissions(record)
+    record.circularityScore = calculate_circularity(record)
     
-    # Create passport data
-    passport_data = create_passport_data(lca, request.doctorAnalysisId)
-    passport_data['lcaId'] = request.lcaId
-    passport_data['generatedAt'] = datetime.utcnow()
+    # Create and store the passport; on a passportId conflict draw a new ID
+    # (and QR code, which encodes it) and try again
+    for attempt in range(PASSPORT_ID_ATTEMPTS):
+        # QR rendering is CPU-bound; keep it off the event loop
+        passport_data = await run_in_threadpool(create_passport_data, record, doctor_analysis_id)
+        passport_data['lcaId'] = lca_id
+        # GET /api/lca/{lcaId}/versions/{lcaVersion} returns the inputs it was issued from
+        passport_data['lcaVersion'] = lca.get('version', 1)
+        passport_data['generatedAt'] = datetime.utcnow()
+        try:
+            result = await db.passports.insert_one(passport_data)
+            break
+        except DuplicateKeyError:
+            if attempt == PASSPORT_ID_ATTEMPTS - 1:
+                raise
     
-    # Store passport
-    result = await db.passports.insert_one(passport_data)
+    # First link of the passport's provenance chain
+    await append_event(
+        passport_data['passportId'],
+        'Passport Generated',
+        'CycleWeave Platform',
+        details={'lcaId': lca_id, 'doctorAnalysisId': doctor_analysis_id, 'grade': passport_data['grade']},
+        timestamp=passport_data['generatedAt']
+    )
     
     passport_data['_id'] = str(result.inserted_id)
     
     return passport_data
 
+async def run_passport_job(payload: dict) -> dict:
+    return await build_passport(payload['lcaId'], payload.get('doctorAnalysisId'))
+
+register_job_handler("passport.generate", run_passport_job)
+
+def passport_query(passport_id: str) -> dict:
+    """Look passports up by MongoDB ID or by passport ID"""
+    if ObjectId.is_valid(passport_id):
+        return {"_id": ObjectId(passport_id)}
+    return {"passportId": passport_id}
+
+@router.post(
+    "/",
+    response_model=dict,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admit("passport.generate", skip_background=True))]
+)
+async def generate_passport(
+    request: PassportCreate,
+    background: bool = False,
+    priority: int = Query(0, ge=CLIENT_PRIORITY_MIN, le=CLIENT_PRIORITY_MAX)
+):
+    """
+    Generate a new Material Passport for an LCA assessment.
+    With `background=true` the passport is rendered by a job worker and
+    the endpoint answers 202 Accepted with the job ID.
+    """
+    if not ObjectId.is_valid(request.lcaId):
+        raise HTTPException(status_code=400, detail="Invalid LCA ID format")
+    
+    if background:
+        job_id = await enqueue_job("passport.generate", request.model_dump(), priority=priority)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=accepted_response(job_id))
+    
+    return await build_passport(request.lcaId, request.doctorAnalysisId)
+
 @router.get("/", response_model=List[dict])
-async def list_passports(skip: int = 0, limit: int = 50):
-    """List all material passports"""
+async def list_passports(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 50,
+    layout: Layout = 'rows',
+    expand: Optional[str] = Query(None, description="Comma-separated: lca, doctor")
+):
+    """
+    List all material passports (MessagePack / columnar layout on request).
+    `expand=lca,doctor` embeds the linked LCA (`lcaData`) and doctor analysis
+    (`doctorAnalysis`) in each passport.
+    """
     db = get_database()
     
-    cursor = db.passports.find().skip(skip).limit(limit).sort("generatedAt", -1)
-    passports = await cursor.to_list(length=limit)
+    passports = await find_passports(
+        db, {}, parse_expand(expand), sort=[("generatedAt", -1)], skip=skip, limit=limit
+    )
     
     for passport in passports:
-        passport['_id'] = str(passport['_id'])
+        serialize_passport(passport)
+    
+    encoded = negotiate_list(request, response, passports, layout)
+    if encoded is not None:
+        return encoded
     
     return passports
 
-@router.get("/{passport_id}", response_model=dict)
-async def get_passport(passport_id: str):
-    """Get a specific passport by MongoDB ID or passport ID"""
+async def _get_expanded(request: Request, response: Response, passport_id: str, expand: List[str], cache_control: str):
+    """
+    One passport with its expansions, honouring conditional request headers.
+    Hot passports are served from the lookup cache; concurrent misses for the
+    same passport share one read.
+    """
     db = get_database()
     
-    # Try finding by MongoDB ObjectId first
-    if ObjectId.is_valid(passport_id):
-        passport = await db.passports.find_one({"_id": ObjectId(passport_id)})
-    else:
-        # Try finding by passportId
-        passport = await db.passports.find_one({"passportId": passport_id})
+    query = passport_query(passport_id)
+    key = passport_cache.key(passport_id, expand)
     
-    if not passport:
+    passport = passport_cache.get(key)
+    if passport is None:
+        # Conditional request: compare validators read through projections first
+        if has_conditions(request):
+            stamps = await find_passports(db, query, expand, limit=1, projection=VALIDATOR_FIELDS)
+            if stamps:
+                not_modified = check_not_modified(request, embedded_documents(stamps[0], expand), cache_control)
+                if not_modified:
+                    return not_modified
+        
+        async def load():
+            passports = await find_passports(db, query, expand, limit=1)
+            return passports[0] if passports else None
+        
+        passport = await passport_cache.load(key, load)
+    elif has_conditions(request):
+        not_modified = check_not_modified(request, embedded_documents(passport, expand), cache_control)
+        if not_modified:
+            return not_modified
+    
+    if passport is None:
         raise HTTPException(status_code=404, detail="Passport not found")
     
-    passport['_id'] = str(passport['_id'])
-    return passport
+    set_validators(response, embedded_documents(passport, expand), cache_control)
+    
+    return serialize_passport(passport)
+
+@router.get("/{passport_id}", response_model=dict)
+async def get_passport(
+    passport_id: str,
+    request: Request,
+    response: Response,
+    expand: Optional[str] = Query(None, description="Comma-separated: lca, doctor")
+):
+    """
+    Get a specific passport by MongoDB ID or passport ID.
+    Passports are immutable and cacheable; with `expand=lca` the response
+    embeds the current LCA and clients revalidate instead.
+    """
+    requested = parse_expand(expand)
+    if 'lca' in requested:
+        cache_control = NO_CACHE
+    else:
+        cache_control = immutable_cache_control(get_settings().immutable_cache_max_age)
+    
+    return await _get_expanded(request, response, passport_id, requested, cache_control)
 
 @router.get("/lca/{lca_id}", response_model=List[dict])
-async def get_passports_for_lca(lca_id: str):
-    """Get all passports for a specific LCA assessment"""
+async def get_passports_for_lca(lca_id: str, request: Request, response: Response, layout: Layout = 'rows'):
+    """Get all passports for a specific LCA assessment (MessagePack / columnar layout on request)"""
     db = get_database()
     
     if not ObjectId.is_valid(lca_id):
@@ -84,49 +210,77 @@ async def get_passports_for_lca(lca_id: str):
     for passport in passports:
         passport['_id'] = str(passport['_id'])
     
+    encoded = negotiate_list(request, response, passports, layout)
+    if encoded is not None:
+        return encoded
+    
     return passports
 
 @router.get("/{passport_id}/full", response_model=dict)
-async def get_full_passport(passport_id: str):
-    """Get passport with full LCA and doctor analysis data"""
+async def get_full_passport(passport_id: str, request: Request, response: Response):
+    """
+    Get passport with full LCA and doctor analysis data (same as `expand=lca,doctor`).
+    The ETag covers all three documents; the LCA can change, so clients revalidate.
+    """
+    return await _get_expanded(request, response, passport_id, ['lca', 'doctor'], NO_CACHE)
+
+async def _resolve_passport_id(passport_id: str) -> str:
+    """Map a MongoDB ID or passport ID onto the passport ID provenance is keyed by"""
     db = get_database()
     
-    # Find passport
-    if ObjectId.is_valid(passport_id):
-        passport = await db.passports.find_one({"_id": ObjectId(passport_id)})
-    else:
-        passport = await db.passports.find_one({"passportId": passport_id})
-    
+    passport = await db.passports.find_one(passport_query(passport_id), {"passportId": 1})
     if not passport:
         raise HTTPException(status_code=404, detail="Passport not found")
     
-    passport['_id'] = str(passport['_id'])
-    
-    # Get associated LCA data
-    if passport.get('lcaId') and ObjectId.is_valid(passport['lcaId']):
-        lca = await db.lca_assessments.find_one({"_id": ObjectId(passport['lcaId'])})
-        if lca:
-            lca['_id'] = str(lca['_id'])
-            passport['lcaData'] = lca
-    
-    # Get associated doctor analysis
-    if passport.get('doctorAnalysisId') and ObjectId.is_valid(passport['doctorAnalysisId']):
-        analysis = await db.doctor_analyses.find_one({"_id": ObjectId(passport['doctorAnalysisId'])})
-        if analysis:
-            analysis['_id'] = str(analysis['_id'])
-            passport['doctorAnalysis'] = analysis
-    
-    return passport
+    return passport['passportId']
+
+@router.get("/{passport_id}/provenance", response_model=ProvenancePage)
+async def get_provenance(passport_id: str, after: int = Query(-1, ge=-1), limit: int = Query(50, ge=1, le=500)):
+    """
+    Page through a passport's provenance events in order.
+    Pass the returned `nextAfter` as `after` to fetch the next page.
+    """
+    return await list_events(await _resolve_passport_id(passport_id), after, limit)
+
+@router.post("/{passport_id}/provenance", response_model=ProvenanceEvent, status_code=status.HTTP_201_CREATED)
+async def add_provenance_event(passport_id: str, event: ProvenanceEventCreate):
+    """Append an event to a passport's hash-chained provenance history"""
+    stored = await append_event(
+        await _resolve_passport_id(passport_id),
+        event.event,
+        event.location,
+        details=event.details,
+        timestamp=event.timestamp
+    )
+    return serialize_event(stored, verified_seq=-1)
+
+@router.get("/{passport_id}/provenance/verify", response_model=dict)
+async def verify_provenance(passport_id: str, full: bool = False):
+    """
+    Verify the provenance hash chain from the last verified checkpoint
+    (or from the first event with `full=true`) and advance the checkpoint.
+    """
+    resolved = await _resolve_passport_id(passport_id)
+    return {'passportId': resolved, **await verify_chain(resolved, full)}
 
 @router.delete("/{passport_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_passport(passport_id: str):
-    """Delete a material passport"""
+    """
+    Delete a material passport. Its provenance chain is append-only and kept
+    for audit, ending with a `Passport Deleted` event.
+    """
     db = get_database()
     
-    if ObjectId.is_valid(passport_id):
-        result = await db.passports.delete_one({"_id": ObjectId(passport_id)})
-    else:
-        result = await db.passports.delete_one({"passportId": passport_id})
+    deleted = await db.passports.find_one_and_delete(passport_query(passport_id), {"_id": 1, "passportId": 1, "lcaId": 1})
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Passport not found")
+    
+    passport_cache.invalidate(deleted)
+    
+    await append_event(
+        deleted['passportId'],
+        'Passport Deleted',
+        'CycleWeave Platform',
+        details={'lcaId': deleted.get('lcaId')}
+    )
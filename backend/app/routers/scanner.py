@@ -1,15 +1,18 @@
-from fastapi import APIRouter, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
 
+from app.admission import admit
 from app.database import get_database
 from app.models.scanner import ScanRequest, ScanResult, ScanResultCreate
+from app.profiling import run_in_threadpool
+from app.services.lca_versions import update_versioned
 from app.services.scanner_service import analyze_scrap
 
 router = APIRouter(prefix="/api/scanner", tags=["Scanner"])
 
-@router.post("/analyze", response_model=dict)
+@router.post("/analyze", response_model=dict, dependencies=[Depends(admit("scanner.analyze"))])
 async def analyze_image(scan_request: Optional[ScanRequest] = None):
     """
     Analyze scrap material from image.
@@ -19,7 +22,7 @@ async def analyze_image(scan_request: Optional[ScanRequest] = None):
     
     # Get analysis result (mock AI)
     image_data = scan_request.imageBase64 if scan_request else None
-    analysis = analyze_scrap(image_data)
+    analysis = await run_in_threadpool(analyze_scrap, image_data)
     
     # Store result
     analysis['createdAt'] = datetime.utcnow()
@@ -31,7 +34,7 @@ async def analyze_image(scan_request: Optional[ScanRequest] = None):
     
     return analysis
 
-@router.post("/upload", response_model=dict)
+@router.post("/upload", response_model=dict, dependencies=[Depends(admit("scanner.analyze"))])
 async def upload_and_analyze(file: UploadFile = File(...)):
     """
     Upload image file and analyze scrap material.
@@ -42,7 +45,7 @@ async def upload_and_analyze(file: UploadFile = File(...)):
     contents = await file.read()
     
     # Get analysis result (mock AI)
-    analysis = analyze_scrap(None)
+    analysis = await run_in_threadpool(analyze_scrap, None)
     
     # Store result
     analysis['createdAt'] = datetime.utcnow()
@@ -96,23 +99,21 @@ async def apply_scan_to_lca(scan_id: str, lca_id: str):
     if not scan:
         raise HTTPException(status_code=404, detail="Scan result not found")
     
-    lca = await db.lca_assessments.find_one({"_id": ObjectId(lca_id)})
+    # Apply scan results to LCA (recorded as a new version of it)
+    updates = {}
+    def scan_updates(lca: dict) -> dict:
+        updates.update({
+            'scrapInputRate': round(scan['purity']),
+            'recyclingEfficiency': min(95, round(scan['purity'] * 0.95)),
+            'furnaceType': 'Electric Arc' if 'Electric' in scan['recommendedProcess'] else lca.get('furnaceType', 'Electric Arc'),
+            'updatedAt': datetime.utcnow()
+        })
+        return updates
+    
+    lca = await update_versioned(lca_id, scan_updates)
     if not lca:
         raise HTTPException(status_code=404, detail="LCA assessment not found")
     
-    # Apply scan results to LCA
-    updates = {
-        'scrapInputRate': round(scan['purity']),
-        'recyclingEfficiency': min(95, round(scan['purity'] * 0.95)),
-        'furnaceType': 'Electric Arc' if 'Electric' in scan['recommendedProcess'] else lca.get('furnaceType', 'Electric Arc'),
-        'updatedAt': datetime.utcnow()
-    }
-    
-    await db.lca_assessments.update_one(
-        {"_id": ObjectId(lca_id)},
-        {"$set": updates}
-    )
-    
     # Link scan to LCA
     await db.scan_results.update_one(
         {"_id": ObjectId(scan_id)},
@@ -0,0 +1,79 @@
+from typing import List, Optional
+
+from app.models.lca import LCARecord
+from app.services.calculations import calculate_circularity_batch, calculate_emission_components_batch
+from app.services.lca_io import DATETIME_COLUMNS, EXPORT_COLUMNS, STRING_COLUMNS
+
+DERIVED_METRICS = ['co2Emission', 'circularityScore']
+EMISSION_COMPONENTS = ['energy', 'transport', 'process', 'recycledCredit']
+
+# Numeric inputs are diffed; categorical ones only report whether they changed
+COMPARE_INPUTS = [
+    column for column in EXPORT_COLUMNS
+    if column not in STRING_COLUMNS and column not in DATETIME_COLUMNS and column not in DERIVED_METRICS
+]
+COMPARE_ATTRIBUTES = [column for column in EXPORT_COLUMNS if column in STRING_COLUMNS and column != '_id']
+
+# Only what the comparison reads (gridMix.* columns collapse to gridMix)
+COMPARE_PROJECTION = {column.split('.')[0]: 1 for column in COMPARE_INPUTS + COMPARE_ATTRIBUTES}
+
+def _column(rows: List[LCARecord], name: str) -> list:
+    # gridMix.coal -> record.coal
+    field = name[8:] if name.startswith('gridMix.') else name
+    return [getattr(row, field) for row in rows]
+
+def _diff(values: list, base: int) -> dict:
+    """Values, absolute deltas and percentage deltas against the baseline column entry"""
+    reference = values[base]
+    if reference is None:
+        return {'values': values, 'deltas': [None] * len(values), 'percentDeltas': [None] * len(values)}
+    deltas = [None if value is None else value - reference for value in values]
+    percent = [None if delta is None or not reference else delta / reference * 100 for delta in deltas]
+    return {'values': values, 'deltas': deltas, 'percentDeltas': percent}
+
+def baseline_index(rows: List[LCARecord], baseline_id: Optional[str] = None) -> Optional[int]:
+    """Position of the baseline: `baseline_id`, else the first Baseline scenario, else the first row"""
+    if baseline_id is not None:
+        return next((i for i, row in enumerate(rows) if str(row.id) == baseline_id), None)
+    return next((i for i, row in enumerate(rows) if row.scenarioType == 'Baseline'), 0)
+
+def compare_assessments(rows: List[LCARecord], base: int) -> dict:
+    """
+    Scenario x metric matrix for `rows`. Every section is column-oriented
+    (one list per metric, in scenario order) and derived values are
+    recomputed for the whole set in one batch.
+    """
+    components = calculate_emission_components_batch(rows)
+    derived = {
+        'co2Emission': components.pop('total'),
+        'circularityScore': calculate_circularity_batch(rows)
+    }
+
+    attributes = {}
+    for name in COMPARE_ATTRIBUTES:
+        values = _column(rows, name)
+        reference = values[base]
+        attributes[name] = {'values': values, 'changed': [value != reference for value in values]}
+
+    # Share of each scenario's CO2 change explained by each component (against
+    # the unrounded total, so the shares add up to 100)
+    net = [sum(parts) for parts in zip(*(components[name] for name in EMISSION_COMPONENTS))]
+    total_deltas = _diff(net, base)['deltas']
+    emission_components = {}
+    for name in EMISSION_COMPONENTS:
+        diff = _diff(components[name], base)
+        diff['shareOfChange'] = [
+            delta / total * 100 if total else None
+            for delta, total in zip(diff['deltas'], total_deltas)
+        ]
+        emission_components[name] = diff
+
+    return {
+        'count': len(rows),
+        'baseline': {'_id': str(rows[base].id), 'index': base},
+        'scenarios': [str(row.id) for row in rows],
+        'attributes': attributes,
+        'inputs': {name: _diff(_column(rows, name), base) for name in COMPARE_INPUTS},
+        'derived': {name: _diff(values, base) for name, values in derived.items()},
+        'emissionComponents': emission_components
+    }
@@ -1,33 +1,53 @@
-from typing import Dict, Any, List
-from app.services.calculations import calculate_emissions, calculate_circularity
+from typing import Dict, Any, List, Optional
+from app.models.lca import LCARecord
+from app.services.calculations import calculate_emissions, calculate_circularity, estimate_energy_efficiency
+from app.metrics import timed
 
-def analyze_lca(lca_data: dict) -> dict:
+@timed("analyze_lca")
+def analyze_lca(record: LCARecord, fleet: Optional[Any] = None) -> dict:
     """
     Perform AI Doctor analysis on LCA data.
-    Returns optimization recommendations and risk factors.
+    Returns optimization recommendations and risk factors. With `fleet` (a
+    FleetBenchmark) the benchmarks are the fleet medians and each metric gets
+    its percentile rank within the fleet.
     """
-    co2_emission = calculate_emissions(lca_data)
-    circularity_score = calculate_circularity(lca_data)
+    co2_emission = calculate_emissions(record)
+    circularity_score = calculate_circularity(record)
     
     # Industry benchmarks
     carbon_benchmark = 1.8  # t CO2 per ton
     efficiency_benchmark = 85  # %
     
     carbon_intensity = co2_emission / 1000  # Convert to tons
+    efficiency_estimate = estimate_energy_efficiency(record)
+    
+    carbon_analysis = {}
+    efficiency_analysis = {}
+    circularity_analysis = {}
+    if fleet is not None:
+        # Data-driven benchmarks from assessments with the same metal and furnace
+        carbon_benchmark = round(fleet.median('carbonIntensity'), 2)
+        efficiency_benchmark = round(fleet.median('energyEfficiency'))
+        fleet_info = {'sampleSize': int(fleet.count), 'benchmarkScope': fleet.scope}
+        carbon_analysis = {'percentile': fleet.percentile('carbonIntensity', carbon_intensity), **fleet_info}
+        efficiency_analysis = {'percentile': fleet.percentile('energyEfficiency', efficiency_estimate), **fleet_info}
+        circularity_analysis = {
+            'circularityPercentile': fleet.percentile('circularityScore', circularity_score),
+            'circularityBenchmark': round(fleet.median('circularityScore'), 1)
+        }
     
     # Calculate overall score
     carbon_score = max(0, 100 - (carbon_intensity / carbon_benchmark * 30))
     circularity_weight = circularity_score * 0.4
-    efficiency_estimate = min(95, 85 + (lca_data.get('slagRecovery', 0) * 0.1))
     efficiency_score = (efficiency_estimate / 100) * 30
     
     overall_score = round(carbon_score + circularity_weight + efficiency_score)
     
     # Generate improvements based on current data
-    improvements = generate_improvements(lca_data)
+    improvements = generate_improvements(record)
     
     # Identify risk factors
-    risk_factors = identify_risks(lca_data)
+    risk_factors = identify_risks(record)
     
     # Determine circularity rating
     if circularity_score >= 70:
@@ -42,26 +62,28 @@ def analyze_lca(lca_data: dict) -> dict:
         'carbonIntensity': {
             'value': round(carbon_intensity, 2),
             'benchmark': carbon_benchmark,
-            'isGap': carbon_intensity > carbon_benchmark
+            'isGap': carbon_intensity > carbon_benchmark,
+            **carbon_analysis
         },
         'energyEfficiency': {
             'value': round(efficiency_estimate),
             'benchmark': efficiency_benchmark,
-            'isGap': efficiency_estimate < efficiency_benchmark
+            'isGap': efficiency_estimate < efficiency_benchmark,
+            **efficiency_analysis
         },
         'circularityRating': circularity_rating,
+        **circularity_analysis,
         'improvements': improvements,
         'riskFactors': risk_factors
     }
 
-def generate_improvements(data: dict) -> List[dict]:
+def generate_improvements(record: LCARecord) -> List[dict]:
     """Generate contextual improvement recommendations"""
     improvements = []
-    grid_mix = data.get('gridMix', {})
     
     # 1. Energy source optimization
-    coal_pct = grid_mix.get('coal', 0)
-    solar_pct = grid_mix.get('solar', 0)
+    coal_pct = record.coal
+    solar_pct = record.solar
     if coal_pct > 20:
         shift_amount = min(15, coal_pct - 20)
         improvements.append({
@@ -72,15 +94,16 @@ def generate_improvements(data: dict) -> List[dict]:
             'category': 'energy',
             'simulateAction': {
                 'gridMix': {
-                    **grid_mix,
                     'coal': coal_pct - shift_amount,
-                    'solar': solar_pct + shift_amount
+                    'hydro': record.hydro,
+                    'solar': solar_pct + shift_amount,
+                    'naturalGas': record.naturalGas
                 }
             }
         })
     
     # 2. Transport optimization
-    if data.get('transportMode') == 'Road':
+    if record.transportMode == 'Road':
         improvements.append({
             'id': '2',
             'title': 'Switch to Rail Transport',
@@ -94,7 +117,7 @@ def generate_improvements(data: dict) -> List[dict]:
         })
     
     # 3. Temperature optimization
-    temp = data.get('temperature', 1200)
+    temp = record.temperature
     if temp > 1100:
         improvements.append({
             'id': '3',
@@ -108,7 +131,7 @@ def generate_improvements(data: dict) -> List[dict]:
         })
     
     # 4. Scrap input optimization
-    scrap_rate = data.get('scrapInputRate', 0)
+    scrap_rate = record.scrapInputRate
     if scrap_rate < 60:
         target_rate = min(65, scrap_rate + 20)
         improvements.append({
@@ -123,7 +146,7 @@ def generate_improvements(data: dict) -> List[dict]:
         })
     
     # 5. Closed loop optimization
-    closed_loop = data.get('closedLoopRate', 0)
+    closed_loop = record.closedLoopRate
     if closed_loop < 70:
         improvements.append({
             'id': '5',
@@ -138,26 +161,25 @@ def generate_improvements(data: dict) -> List[dict]:
     
     return improvements[:5]  # Return top 5 improvements
 
-def identify_risks(data: dict) -> List[str]:
+def identify_risks(record: LCARecord) -> List[str]:
     """Identify risk factors in current LCA configuration"""
     risks = []
-    grid_mix = data.get('gridMix', {})
     
-    if grid_mix.get('coal', 0) > 30:
+    if record.coal > 30:
         risks.append('High coal dependency in energy mix')
     
-    if data.get('transportMode') == 'Road':
-        total_dist = data.get('inboundDistance', 0) + data.get('outboundDistance', 0)
+    if record.transportMode == 'Road':
+        total_dist = record.inboundDistance + record.outboundDistance
         if total_dist > 300:
             risks.append(f'Road transport over {total_dist}km contributes significantly to emissions')
     
-    if data.get('scrapInputRate', 0) < 40:
+    if record.scrapInputRate < 40:
         risks.append('Below industry benchmark for recycled content')
     
-    if data.get('waterUsage', 0) > 25:
+    if record.waterUsage > 25:
         risks.append('High water consumption may face regulatory scrutiny')
     
-    if data.get('temperature', 0) > 1500:
+    if record.temperature > 1500:
         risks.append('High furnace temperature increases energy costs')
     
     return risks[:5]
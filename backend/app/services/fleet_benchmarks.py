@@ -0,0 +1,331 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from app.config import get_settings
+from app.database import current_tenant, get_database, tenant_scope
+from app.models.lca import LCARecord
+from app.services.calculations import calculate_circularity, calculate_emissions, estimate_energy_efficiency
+from app.services.tdigest import TDigest
+
+# Sketched per group; carbon intensity in t CO2 per ton, efficiency in %
+METRICS = ('carbonIntensity', 'energyEfficiency', 'circularityScore')
+
+ANY = '*'
+
+FLUSH_ATTEMPTS = 5
+
+# Control document (in fleet_benchmarks) of the last or running rebuild
+REBUILD_ID = '_rebuild'
+# A rebuild that has not finished after this long is taken to have died
+REBUILD_LEASE = timedelta(minutes=15)
+
+# (time the assessment was written, metric values)
+Sample = Tuple[datetime, Dict[str, float]]
+
+def group_keys(metal_type: Optional[str], furnace_type: Optional[str]) -> List[str]:
+    """Most to least specific: metal/furnace, metal, whole fleet"""
+    return [f"{metal_type}/{furnace_type}", f"{metal_type}/{ANY}", f"{ANY}/{ANY}"]
+
+def metric_values(record: LCARecord) -> Dict[str, float]:
+    # Recomputed from the inputs: improvements and scans applied to an
+    # assessment do not refresh its stored co2Emission/circularityScore
+    return {
+        'carbonIntensity': calculate_emissions(record) / 1000,
+        'energyEfficiency': estimate_energy_efficiency(record),
+        'circularityScore': calculate_circularity(record)
+    }
+
+def _written_at(record: LCARecord) -> datetime:
+    # Millisecond precision, as stored, so it compares with a rebuild's scan
+    written = record.updatedAt or record.createdAt or datetime.utcnow()
+    return written.replace(microsecond=written.microsecond // 1000 * 1000)
+
+def _rebuilding(control: dict) -> bool:
+    return bool(control.get('running')) and control['startedAt'] > datetime.utcnow() - REBUILD_LEASE
+
+def _sketch(samples: Iterable[Sample], compression: int) -> Dict[str, TDigest]:
+    digests = _empty_digests(compression)
+    for _, values in samples:
+        for metric, value in values.items():
+            digests[metric].add(value)
+    return digests
+
+class FleetBenchmark:
+    """The sketches of one group, as used by the doctor"""
+
+    def __init__(self, scope: str, count: float, digests: Dict[str, TDigest]):
+        self.scope = scope
+        self.count = count
+        self.digests = digests
+
+    def median(self, metric: str) -> Optional[float]:
+        return self.digests[metric].quantile(0.5)
+
+    def percentile(self, metric: str, value: float) -> Optional[float]:
+        """Percentage of the group below `value`"""
+        rank = self.digests[metric].cdf(value)
+        return None if rank is None else round(rank * 100, 1)
+
+    def summary(self, quantiles=(0.1, 0.25, 0.5, 0.75, 0.9)) -> dict:
+        return {
+            'scope': self.scope,
+            'count': int(self.count),
+            'metrics': {
+                metric: {f"p{round(q * 100)}": round(digest.quantile(q), 4) for q in quantiles}
+                for metric, digest in self.digests.items()
+            }
+        }
+
+def _empty_digests(compression: int) -> Dict[str, TDigest]:
+    return {metric: TDigest(compression) for metric in METRICS}
+
+class FleetBenchmarks:
+    """
+    Per metalType/furnaceType t-digests of the assessment metrics, persisted in
+    `fleet_benchmarks` (one document per group). Created and updated
+    assessments are buffered in memory and merged into the stored digests
+    every flush interval; digests are mergeable, so workers flush
+    independently (optimistic `version` check). Pending samples and the
+    lookup cache are kept per tenant and flushed into each tenant's own
+    database.
+
+    A t-digest cannot remove a value: an update adds the new values but the
+    old ones stay, and deleted assessments stay counted, until rebuild()
+    recomputes the groups. A rebuild scans the assessments written up to its
+    start and swaps fresh sketches in (a new `generation`); while it runs,
+    flushes hold back later samples and drop earlier ones (the scan has
+    them), so nothing is counted twice.
+    """
+
+    def __init__(self):
+        # tenant -> group key -> samples
+        self._pending: Dict[Optional[str], Dict[str, List[Sample]]] = {}
+        # (tenant, group key) -> (loaded at, FleetBenchmark or None)
+        self._cache: Dict[tuple, tuple] = {}
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    def record(self, records: List[LCARecord]):
+        """Buffer created or updated assessments (flushed in the background)"""
+        pending = self._pending.setdefault(current_tenant.get(), {})
+        for record in records:
+            sample = (_written_at(record), metric_values(record))
+            for key in group_keys(record.metalType, record.furnaceType):
+                pending.setdefault(key, []).append(sample)
+
+    def _retain(self, tenant: Optional[str], key: str, samples: List[Sample]):
+        if samples:
+            self._pending.setdefault(tenant, {}).setdefault(key, []).extend(samples)
+
+    async def flush(self) -> int:
+        """Merge pending samples into the stored sketches; returns the groups written"""
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            written = 0
+            try:
+                for tenant, groups in pending.items():
+                    with tenant_scope(tenant):
+                        control = await self._control()
+                        for key in list(groups):
+                            if await self._merge_group(key, groups[key], control):
+                                written += 1
+                            # Merged, or held back by _merge_group itself
+                            del groups[key]
+                            self._cache.pop((tenant, key), None)
+            finally:
+                # A failed read or write (database unreachable) keeps the
+                # samples not merged yet for the next flush
+                for tenant, groups in pending.items():
+                    for key, samples in groups.items():
+                        self._retain(tenant, key, samples)
+            return written
+
+    async def _control(self) -> dict:
+        return await get_database().fleet_benchmarks.find_one({"_id": REBUILD_ID}) or {}
+
+    async def _merge_group(self, key: str, samples: List[Sample], control: dict) -> bool:
+        """Merge samples into a group's stored sketches; those that cannot be merged yet are kept pending"""
+        db = get_database()
+        tenant = current_tenant.get()
+        compression = get_settings().fleet_benchmark_compression
+        metal_type, furnace_type = key.split('/', 1)
+
+        for _ in range(FLUSH_ATTEMPTS):
+            if _rebuilding(control):
+                # The rebuild's scan covers everything written before it started
+                self._retain(tenant, key, [sample for sample in samples if sample[0] > control['startedAt']])
+                return False
+            generation = control.get('rebuiltAt')
+            if generation is not None:
+                samples = [sample for sample in samples if sample[0] > generation]
+            if not samples:
+                return False
+            digests = _sketch(samples, compression)
+
+            stored = await db.fleet_benchmarks.find_one({"_id": key})
+            now = datetime.utcnow()
+
+            if stored is None:
+                doc = {
+                    '_id': key,
+                    'metalType': metal_type,
+                    'furnaceType': furnace_type,
+                    'count': digests[METRICS[0]].count,
+                    'metrics': {metric: digest.to_dict() for metric, digest in digests.items()},
+                    'generation': generation,
+                    'version': 1,
+                    'updatedAt': now
+                }
+                try:
+                    await db.fleet_benchmarks.insert_one(doc)
+                    return True
+                except DuplicateKeyError:
+                    continue
+
+            if stored.get('generation') != generation:
+                # A rebuild started or finished since `control` was read, or
+                # this group was written by a flush that raced an earlier one
+                latest = await self._control()
+                if not _rebuilding(latest) and latest.get('rebuiltAt') == generation:
+                    await db.fleet_benchmarks.delete_one({"_id": key, "version": stored['version']})
+                control = latest
+                continue
+
+            merged = {}
+            for metric in METRICS:
+                digest = TDigest.from_dict(stored['metrics'][metric]) if metric in stored.get('metrics', {}) else TDigest()
+                digest.merge(digests[metric])
+                merged[metric] = digest.to_dict()
+
+            result = await db.fleet_benchmarks.update_one(
+                {"_id": key, "version": stored['version']},
+                {
+                    "$set": {'metrics': merged, 'count': merged[METRICS[0]]['count'], 'updatedAt': now},
+                    "$inc": {'version': 1}
+                }
+            )
+            if result.modified_count:
+                return True
+
+        # Keep the samples for the next flush rather than dropping them
+        print(f"Fleet benchmark flush for {key} lost {FLUSH_ATTEMPTS} races; retrying later")
+        self._retain(tenant, key, samples)
+        return False
+
+    async def _load(self, key: str) -> Optional[FleetBenchmark]:
+        ttl = get_settings().fleet_benchmark_flush_seconds
+        cache_key = (current_tenant.get(), key)
+        cached = self._cache.get(cache_key)
+        if cached is not None and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+
+        stored = await get_database().fleet_benchmarks.find_one({"_id": key})
+        benchmark = None
+        if stored is not None:
+            digests = {metric: TDigest.from_dict(data) for metric, data in stored['metrics'].items()}
+            benchmark = FleetBenchmark(key, stored['count'], digests)
+        self._cache[cache_key] = (time.monotonic(), benchmark)
+        return benchmark
+
+    async def lookup(self, metal_type: Optional[str], furnace_type: Optional[str]) -> Optional[FleetBenchmark]:
+        """The most specific group with enough samples, or None"""
+        min_samples = get_settings().fleet_benchmark_min_samples
+        for key in group_keys(metal_type, furnace_type):
+            benchmark = await self._load(key)
+            if benchmark is not None and benchmark.count >= min_samples:
+                return benchmark
+        return None
+
+    async def get(self, key: str) -> Optional[FleetBenchmark]:
+        return await self._load(key)
+
+    async def rebuild(self, batch_size: int = 1000) -> dict:
+        """Recompute every group from the stored assessments and swap the fresh sketches in"""
+        db = get_database()
+        tenant = current_tenant.get()
+        compression = get_settings().fleet_benchmark_compression
+        projection = {field: 1 for field in LCARecord.DOCUMENT_FIELDS}
+        started = datetime.utcnow()
+        started = started.replace(microsecond=started.microsecond // 1000 * 1000)
+
+        # Holds back flushes in every worker until the new generation is in place
+        await db.fleet_benchmarks.update_one(
+            {"_id": REBUILD_ID}, {"$set": {'running': True, 'startedAt': started}}, upsert=True
+        )
+        try:
+            groups: Dict[str, Dict[str, TDigest]] = {}
+            scanned = 0
+
+            cursor = db.lca_assessments.find({}, projection).batch_size(batch_size)
+            async for doc in cursor:
+                record = LCARecord.from_document(doc)
+                if _written_at(record) > started:
+                    # Written during the scan: its flush adds it to the new generation
+                    continue
+                values = metric_values(record)
+                for key in group_keys(record.metalType, record.furnaceType):
+                    digests = groups.get(key)
+                    if digests is None:
+                        digests = groups[key] = _empty_digests(compression)
+                    for metric, value in values.items():
+                        digests[metric].add(value)
+                scanned += 1
+
+            now = datetime.utcnow()
+            for key, digests in groups.items():
+                metal_type, furnace_type = key.split('/', 1)
+                await db.fleet_benchmarks.update_one(
+                    {"_id": key},
+                    {
+                        "$set": {
+                            'metalType': metal_type,
+                            'furnaceType': furnace_type,
+                            'count': digests[METRICS[0]].count,
+                            'metrics': {metric: digest.to_dict() for metric, digest in digests.items()},
+                            'generation': started,
+                            'updatedAt': now
+                        },
+                        "$inc": {'version': 1}
+                    },
+                    upsert=True
+                )
+            removed = await db.fleet_benchmarks.delete_many({"_id": {"$nin": [*groups, REBUILD_ID]}})
+        except BaseException:
+            # Flushes resume against the previous generation; run the rebuild again
+            await db.fleet_benchmarks.update_one({"_id": REBUILD_ID}, {"$set": {'running': False}})
+            raise
+
+        await db.fleet_benchmarks.update_one(
+            {"_id": REBUILD_ID},
+            {"$set": {'running': False, 'rebuiltAt': started, 'finishedAt': datetime.utcnow()}}
+        )
+        self._cache = {cache_key: entry for cache_key, entry in self._cache.items() if cache_key[0] != tenant}
+
+        return {'assessments': scanned, 'groups': len(groups), 'removedGroups': removed.deleted_count}
+
+    async def start(self):
+        self._task = asyncio.create_task(self._flusher())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as exc:
+            print(f"Final fleet benchmark flush failed: {exc}")
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(get_settings().fleet_benchmark_flush_seconds)
+            try:
+                await self.flush()
+            except Exception as exc:
+                print(f"Fleet benchmark flush failed: {exc}")
+
+fleet_benchmarks = FleetBenchmarks()
@@ -0,0 +1,277 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from app.config import get_settings
+from app.database import current_tenant, get_shared_database, tenant_scope
+from app.tenancy import prepare_tenant
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+# Retry backoff (seconds): 2, 4, 8, ... capped
+RETRY_BASE_DELAY = 2
+RETRY_MAX_DELAY = 300
+
+# Range of the `priority` a client may ask for on a background request
+CLIENT_PRIORITY_MIN = -10
+CLIENT_PRIORITY_MAX = 10
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+# Set on enqueue so idle workers in this process pick the job up immediately
+_wakeup = asyncio.Event()
+
+def register_job_handler(job_type: str, handler: JobHandler):
+    """Register the coroutine that executes jobs of the given type"""
+    _handlers[job_type] = handler
+
+async def enqueue_job(job_type: str, payload: dict, priority: int = 0, max_attempts: Optional[int] = None) -> str:
+    """Persist a new job and return its ID"""
+    if job_type not in _handlers:
+        raise ValueError(f"No handler registered for job type '{job_type}'")
+
+    db = get_shared_database()
+    now = datetime.utcnow()
+
+    job = {
+        'type': job_type,
+        # The queue lives in the shared database; the job runs against this tenant's
+        'tenant': current_tenant.get(),
+        'payload': payload,
+        'priority': priority,
+        'status': JOB_QUEUED,
+        'attempts': 0,
+        'maxAttempts': max_attempts or get_settings().job_max_attempts,
+        'runAt': now,
+        'workerId': None,
+        'leaseExpiresAt': None,
+        'result': None,
+        'error': None,
+        'createdAt': now,
+        'updatedAt': now,
+        'startedAt': None,
+        'finishedAt': None
+    }
+
+    result = await db.jobs.insert_one(job)
+    _wakeup.set()
+
+    return str(result.inserted_id)
+
+async def claim_job(worker_id: str, lease_seconds: int) -> Optional[dict]:
+    """Atomically lease the next runnable job, highest priority first"""
+    db = get_shared_database()
+    now = datetime.utcnow()
+
+    return await db.jobs.find_one_and_update(
+        {"status": JOB_QUEUED, "runAt": {"$lte": now}},
+        {
+            "$set": {
+                "status": JOB_RUNNING,
+                "workerId": worker_id,
+                "leaseExpiresAt": now + timedelta(seconds=lease_seconds),
+                "startedAt": now,
+                "updatedAt": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("priority", -1), ("runAt", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def requeue_expired_leases() -> int:
+    """Return jobs whose worker stopped heartbeating to the queue"""
+    db = get_shared_database()
+    now = datetime.utcnow()
+
+    result = await db.jobs.update_many(
+        {"status": JOB_RUNNING, "leaseExpiresAt": {"$lt": now}},
+        {"$set": {"status": JOB_QUEUED, "workerId": None, "leaseExpiresAt": None, "updatedAt": now}}
+    )
+    return result.modified_count
+
+def _is_retryable(exc: Exception) -> bool:
+    # Client errors (missing LCA, bad IDs) will fail the same way every time
+    if isinstance(exc, HTTPException):
+        return exc.status_code >= 500
+    return True
+
+class JobWorkerPool:
+    """Pool of asyncio workers that lease and execute jobs from the `jobs` collection"""
+
+    def __init__(self, concurrency: int, lease_seconds: int, poll_interval: float):
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        # Each worker leases as <pool id>-<index>, so siblings in this process
+        # cannot heartbeat or finish a job another of them reclaimed
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._tasks = []
+        self._stopping = False
+
+    async def start(self):
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker(f"{self.worker_id}-{index}")) for index in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+        print(f"Started {self.concurrency} job workers ({self.worker_id})")
+
+    async def stop(self):
+        self._stopping = True
+        _wakeup.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        print("Stopped job workers")
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+    async def _worker(self, worker_id: str):
+        while not self._stopping:
+            try:
+                job = await claim_job(worker_id, self.lease_seconds)
+            except Exception as exc:
+                print(f"Job claim failed: {exc}")
+                job = None
+
+            if job is None:
+                await self._wait_for_work()
+                continue
+
+            await self._run(job, worker_id)
+
+    async def _reaper(self):
+        while not self._stopping:
+            try:
+                requeued = await requeue_expired_leases()
+                if requeued:
+                    print(f"Requeued {requeued} jobs with expired leases")
+            except Exception as exc:
+                print(f"Lease reaper failed: {exc}")
+            await asyncio.sleep(self.lease_seconds)
+
+    async def _heartbeat(self, job_id, worker_id: str, work: asyncio.Future) -> bool:
+        """Extend the lease while `work` runs; cancels it and returns True if the lease was lost"""
+        db = get_shared_database()
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                result = await db.jobs.update_one(
+                    {"_id": job_id, "workerId": worker_id, "status": JOB_RUNNING},
+                    {"$set": {"leaseExpiresAt": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as exc:
+                # The lease is still good until it expires; try again next beat
+                print(f"Heartbeat for job {job_id} failed: {exc}")
+                continue
+            if not result.matched_count:
+                # Reaped and handed to another worker: stop working on it here
+                print(f"Lost the lease on job {job_id}; abandoning it")
+                work.cancel()
+                return True
+
+    async def _run(self, job: dict, worker_id: str):
+        db = get_shared_database()
+        owned = {"_id": job['_id'], "workerId": worker_id, "status": JOB_RUNNING}
+
+        handler = _handlers.get(job['type'])
+        if handler is None:
+            await self._finish(owned, JOB_FAILED, error=f"No handler registered for job type '{job['type']}'")
+            return
+
+        # A job that keeps losing its lease (worker crashes mid-run) counts those as attempts
+        if job['attempts'] > job['maxAttempts']:
+            await self._finish(owned, JOB_FAILED, error="Exceeded maximum attempts")
+            return
+
+        heartbeat = None
+        try:
+            tenant = job.get('tenant')
+            await prepare_tenant(tenant)
+            with tenant_scope(tenant):
+                work = asyncio.ensure_future(handler(job['payload']))
+            heartbeat = asyncio.create_task(self._heartbeat(job['_id'], worker_id, work))
+            result = await work
+        except asyncio.CancelledError:
+            if heartbeat is not None and heartbeat.done() and not heartbeat.cancelled() and heartbeat.result():
+                # The lease was lost; whoever holds it now owns the job
+                return
+            # Shutting down: leave the job leased, the reaper will hand it to another worker
+            raise
+        except Exception as exc:
+            error = exc.detail if isinstance(exc, HTTPException) else f"{type(exc).__name__}: {exc}"
+
+            if _is_retryable(exc) and job['attempts'] < job['maxAttempts']:
+                delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY ** job['attempts'])
+                now = datetime.utcnow()
+                await db.jobs.update_one(owned, {"$set": {
+                    "status": JOB_QUEUED,
+                    "workerId": None,
+                    "leaseExpiresAt": None,
+                    "runAt": now + timedelta(seconds=delay),
+                    "error": error,
+                    "updatedAt": now
+                }})
+            else:
+                await self._finish(owned, JOB_FAILED, error=error)
+        else:
+            await self._finish(owned, JOB_SUCCEEDED, result=result)
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+
+    async def _finish(self, owned: dict, status: str, result: Any = None, error: Optional[str] = None):
+        db = get_shared_database()
+        now = datetime.utcnow()
+
+        await db.jobs.update_one(owned, {"$set": {
+            "status": status,
+            "result": result,
+            "error": error,
+            "leaseExpiresAt": None,
+            "finishedAt": now,
+            "updatedAt": now
+        }})
+
+def serialize_job(job: dict) -> dict:
+    """Public view of a job document (without payload/result bodies)"""
+    job_id = str(job['_id'])
+    return {
+        '_id': job_id,
+        'type': job['type'],
+        'status': job['status'],
+        'priority': job['priority'],
+        'attempts': job['attempts'],
+        'maxAttempts': job['maxAttempts'],
+        'error': job.get('error'),
+        'createdAt': job['createdAt'],
+        'updatedAt': job['updatedAt'],
+        'startedAt': job.get('startedAt'),
+        'finishedAt': job.get('finishedAt'),
+        'resultUrl': f"/api/jobs/{job_id}/result"
+    }
+
+def accepted_response(job_id: str) -> dict:
+    """Body returned by endpoints that answer 202 Accepted with a job"""
+    return {
+        'jobId': job_id,
+        'status': JOB_QUEUED,
+        'statusUrl': f"/api/jobs/{job_id}",
+        'resultUrl': f"/api/jobs/{job_id}/result"
+    }
@@ -0,0 +1,368 @@
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.models.lca import LCADataCreate
+
+GRID_MIX_FIELDS = ['coal', 'hydro', 'solar', 'naturalGas']
+
+# Flat column layout shared by CSV, NDJSON and Parquet exports.
+# The nested gridMix document is exposed as dotted columns.
+EXPORT_COLUMNS = [
+    '_id',
+    'metalType',
+    'scenarioType',
+    'oreGrade',
+    'miningMethod',
+    'waterUsage',
+    'totalEnergyConsumption',
+    *[f'gridMix.{field}' for field in GRID_MIX_FIELDS],
+    'processHeat',
+    'furnaceType',
+    'temperature',
+    'fluxUsage',
+    'slagRecovery',
+    'transportMode',
+    'inboundDistance',
+    'outboundDistance',
+    'vehicleEfficiency',
+    'scrapInputRate',
+    'recyclingEfficiency',
+    'wasteRecovery',
+    'closedLoopRate',
+    'co2Emission',
+    'circularityScore',
+    'createdAt',
+    'updatedAt'
+]
+
+STRING_COLUMNS = {'_id', 'metalType', 'scenarioType', 'miningMethod', 'furnaceType', 'transportMode'}
+DATETIME_COLUMNS = {'createdAt', 'updatedAt'}
+
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+def parse_columns(columns: Optional[str]) -> List[str]:
+    """Parse a comma-separated column selection, keeping export order"""
+    if not columns:
+        return list(EXPORT_COLUMNS)
+
+    requested = [c.strip() for c in columns.split(',') if c.strip()]
+    unknown = [c for c in requested if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+
+    return requested
+
+def build_projection(columns: List[str]) -> dict:
+    """Mongo projection that only reads the selected columns"""
+    projection = {column: 1 for column in columns}
+    if '_id' not in projection:
+        projection['_id'] = 0
+    return projection
+
+def build_export_query(
+    metal_type: Optional[str] = None,
+    scenario_type: Optional[str] = None,
+    furnace_type: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> dict:
+    """Build the Mongo filter for an export request"""
+    query = {}
+    if metal_type:
+        query['metalType'] = metal_type
+    if scenario_type:
+        query['scenarioType'] = scenario_type
+    if furnace_type:
+        query['furnaceType'] = furnace_type
+
+    created = {}
+    if created_from:
+        created['$gte'] = created_from
+    if created_to:
+        created['$lt'] = created_to
+    if created:
+        query['createdAt'] = created
+
+    return query
+
+def flatten_assessment(doc: dict, columns: List[str]) -> list:
+    """Project an assessment document onto the flat export columns"""
+    grid_mix = doc.get('gridMix') or {}
+    row = []
+    for column in columns:
+        if column.startswith('gridMix.'):
+            row.append(grid_mix.get(column[8:]))
+        elif column == '_id':
+            row.append(str(doc['_id']))
+        else:
+            row.append(doc.get(column))
+    return row
+
+def _text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+async def _batches(cursor, columns: List[str], batch_size: int) -> AsyncIterator[List[list]]:
+    batch = []
+    async for doc in cursor:
+        batch.append(flatten_assessment(doc, columns))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def stream_csv(cursor, columns: List[str], batch_size: int) -> AsyncIterator[bytes]:
+    """Encode cursor rows as CSV, one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    async for batch in _batches(cursor, columns, batch_size):
+        for row in batch:
+            writer.writerow([_text(value) for value in row])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+async def stream_ndjson(cursor, columns: List[str], batch_size: int) -> AsyncIterator[bytes]:
+    """Encode cursor rows as newline-delimited JSON objects"""
+    async for batch in _batches(cursor, columns, batch_size):
+        lines = [
+            json.dumps({column: _text(value) for column, value in zip(columns, row)})
+            for row in batch
+        ]
+        yield ('\n'.join(lines) + '\n').encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back in chunks"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _parquet_schema(columns: List[str]):
+    import pyarrow as pa
+
+    fields = []
+    for column in columns:
+        if column in STRING_COLUMNS:
+            fields.append(pa.field(column, pa.string()))
+        elif column in DATETIME_COLUMNS:
+            fields.append(pa.field(column, pa.timestamp('ms')))
+        else:
+            fields.append(pa.field(column, pa.float64()))
+    return pa.schema(fields)
+
+async def stream_parquet(cursor, columns: List[str], batch_size: int) -> AsyncIterator[bytes]:
+    """Encode cursor rows as Parquet, writing one row group per batch"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+
+    try:
+        async for batch in _batches(cursor, columns, batch_size):
+            arrays = [
+                pa.array([row[index] for row in batch], type=schema.field(index).type)
+                for index in range(len(columns))
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema), row_group_size=len(batch))
+            yield sink.drain()
+    finally:
+        writer.close()
+
+    # Footer
+    yield sink.drain()
+
+EXPORT_ENCODERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+    'parquet': stream_parquet
+}
+
+# Columns computed by the server; ignored when present in an import file
+DERIVED_COLUMNS = {'_id', 'co2Emission', 'circularityScore', 'createdAt', 'updatedAt'}
+
+IMPORT_FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/json': 'ndjson'
+}
+
+def detect_import_format(content_type: Optional[str]) -> Optional[str]:
+    """Map a request Content-Type onto an import format"""
+    if not content_type:
+        return None
+    return IMPORT_FORMATS.get(content_type.split(';')[0].strip().lower())
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    """Split a byte stream into complete lines, one list per received chunk"""
+    pending = b''
+    async for chunk in stream:
+        pending += chunk
+        lines = pending.split(b'\n')
+        pending = lines.pop()
+        if lines:
+            yield [line.decode('utf-8-sig', errors='replace').rstrip('\r') for line in lines]
+    if pending.strip():
+        yield [pending.decode('utf-8-sig', errors='replace').rstrip('\r')]
+
+class _NeedMoreInput(Exception):
+    """The data received so far ends inside a CSV record"""
+
+class _LineFeed:
+    """Lines for csv.reader; counts how many it has handed out"""
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.consumed = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if self.consumed == len(self.lines):
+            raise _NeedMoreInput
+        line = self.lines[self.consumed]
+        self.consumed += 1
+        return line
+
+async def _csv_records(stream: AsyncIterator[bytes]) -> AsyncIterator[List[List[str]]]:
+    """
+    Parse a CSV byte stream into records, one list per received chunk.
+    Quoted fields may contain newlines: a record the data received so far
+    ends inside is carried over to the next chunk.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    pending = ''
+    async for chunk in stream:
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        if not lines:
+            continue
+        feed = _LineFeed([line + '\n' for line in lines])
+        records = []
+        complete = 0
+        try:
+            for values in csv.reader(feed):
+                records.append(values)
+                complete = feed.consumed
+        except _NeedMoreInput:
+            pass
+        pending = ''.join(feed.lines[complete:]) + pending
+        if records:
+            yield records
+    pending += decoder.decode(b'', final=True)
+    if pending.strip():
+        yield list(csv.reader(io.StringIO(pending, newline='')))
+
+def unflatten_row(row: dict) -> dict:
+    """Turn a flat (CSV-style) row back into an assessment document"""
+    doc = {}
+    grid_mix = {}
+    for key, value in row.items():
+        if value is None or value == '' or key in DERIVED_COLUMNS:
+            continue
+        if key.startswith('gridMix.'):
+            grid_mix[key[8:]] = value
+        else:
+            doc[key] = value
+    if grid_mix:
+        doc['gridMix'] = grid_mix
+    return doc
+
+async def iter_import_rows(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Parse an NDJSON or CSV upload incrementally.
+    Yields (row number, document, parse error) with 1-based data row numbers.
+    CSV files must have a header row using the export column names.
+    """
+    row_number = 0
+    header = None
+
+    if fmt == 'csv':
+        try:
+            async for records in _csv_records(stream):
+                for values in records:
+                    if not values:
+                        continue
+                    if header is None:
+                        header = [value.strip() for value in values]
+                        continue
+                    row_number += 1
+                    if len(values) != len(header):
+                        yield row_number, None, f"Expected {len(header)} columns, got {len(values)}"
+                        continue
+                    yield row_number, unflatten_row(dict(zip(header, values))), None
+        except csv.Error as exc:
+            # e.g. an unterminated quote swallowing the rest of the file; rows
+            # after it cannot be told apart
+            yield row_number + 1, None, f"Malformed CSV, import stopped here: {exc}"
+        return
+
+    async for lines in _lines(stream):
+        for line in lines:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                parsed = json.loads(line)
+            except ValueError as exc:
+                yield row_number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(parsed, dict):
+                yield row_number, None, "Expected a JSON object"
+                continue
+            yield row_number, unflatten_row(parsed), None
+
+def validate_import_chunk(chunk: List[Tuple[int, dict]]) -> Tuple[List[Tuple[int, dict]], List[dict]]:
+    """Validate parsed rows against LCADataCreate, splitting valid rows from errors"""
+    valid = []
+    errors = []
+    for row_number, doc in chunk:
+        try:
+            valid.append((row_number, LCADataCreate.model_validate(doc).model_dump()))
+        except ValidationError as exc:
+            errors.append({
+                'row': row_number,
+                'errors': [
+                    f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                    for error in exc.errors(include_url=False)
+                ]
+            })
+    return valid, errors
@@ -0,0 +1,153 @@
+from datetime import datetime
+from typing import Callable, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from app.config import get_settings
+from app.database import get_database
+from app.models.lca import LCARecord
+from app.services.fleet_benchmarks import fleet_benchmarks
+
+# Bookkeeping fields that are not part of an assessment's history
+UNVERSIONED = ('_id', 'version')
+
+# Concurrent writes to the same assessment race on its `version`; the loser
+# re-reads and re-applies its change
+UPDATE_ATTEMPTS = 5
+
+_MISSING = object()
+
+def _state(doc: dict) -> dict:
+    return {key: value for key, value in doc.items() if key not in UNVERSIONED}
+
+def is_snapshot_version(version: int) -> bool:
+    """Version 1 and every lca_snapshot_interval-th version after it store the full state"""
+    return (version - 1) % get_settings().lca_snapshot_interval == 0
+
+async def _insert_version(lca_id: str, version: int, changes: dict, state: Optional[dict]):
+    doc = {
+        'lcaId': lca_id,
+        'version': version,
+        'kind': 'snapshot' if state is not None else 'delta',
+        'changes': changes,
+        'createdAt': datetime.utcnow()
+    }
+    if state is not None:
+        doc['snapshot'] = state
+    try:
+        await get_database().lca_versions.insert_one(doc)
+    except DuplicateKeyError:
+        # Another writer recorded the same base snapshot
+        pass
+
+async def update_versioned(lca_id: str, make_changes: Callable[[dict], dict]) -> Optional[dict]:
+    """
+    Apply `make_changes(current)` (the fields to set) to an assessment and
+    record the fields that actually changed as its next version. Writes are
+    conditional on the version read, so concurrent updates cannot interleave.
+    The new values are also added to the fleet benchmarks. Returns the updated document, or None if the assessment does not exist.
+    """
+    db = get_database()
+    oid = ObjectId(lca_id)
+
+    for _ in range(UPDATE_ATTEMPTS):
+        current = await db.lca_assessments.find_one({"_id": oid})
+        if current is None:
+            return None
+
+        changes = {
+            key: value for key, value in make_changes(current).items()
+            if key not in UNVERSIONED and current.get(key, _MISSING) != value
+        }
+        if not changes or list(changes) == ['updatedAt']:
+            return current
+
+        version = current.get('version', 1)
+        if version == 1:
+            # First change: keep the state it started from (assessments are
+            # not snapshotted on create, most are never updated)
+            await _insert_version(lca_id, 1, {}, _state(current))
+
+        query = {"_id": oid, "version": version} if 'version' in current else {"_id": oid, "version": {"$exists": False}}
+        result = await db.lca_assessments.update_one(query, {"$set": {**changes, 'version': version + 1}})
+        if not result.modified_count:
+            continue
+
+        updated = {**current, **changes, 'version': version + 1}
+        snapshot = _state(updated) if is_snapshot_version(version + 1) else None
+        await _insert_version(lca_id, version + 1, changes, snapshot)
+        fleet_benchmarks.record([LCARecord.from_document(updated)])
+        return updated
+
+    raise HTTPException(status_code=409, detail="Assessment is being modified concurrently; retry")
+
+async def list_versions(lca_id: str, before: Optional[int] = None, limit: int = 50) -> dict:
+    """Newest-first page of an assessment's versions (keyset pagination on version)"""
+    db = get_database()
+
+    query = {"lcaId": lca_id}
+    if before is not None:
+        query["version"] = {"$lt": before}
+    cursor = db.lca_versions.find(
+        query, {"version": 1, "kind": 1, "changes": 1, "createdAt": 1}
+    ).sort("version", DESCENDING).limit(limit + 1)
+    versions = await cursor.to_list(length=limit + 1)
+
+    has_more = len(versions) > limit
+    versions = versions[:limit]
+    return {
+        'versions': [
+            {
+                'version': entry['version'],
+                'kind': entry['kind'],
+                'changedFields': sorted(entry['changes']),
+                'createdAt': entry['createdAt']
+            }
+            for entry in versions
+        ],
+        'nextBefore': versions[-1]['version'] if has_more else None
+    }
+
+async def get_version(current: dict, version: int) -> Optional[dict]:
+    """
+    State of an assessment at `version`: the nearest snapshot at or before it
+    plus at most lca_snapshot_interval - 1 deltas. None if there is no such
+    version.
+    """
+    current_version = current.get('version', 1)
+    if version == current_version:
+        return current
+    if version < 1 or version > current_version:
+        return None
+
+    db = get_database()
+    lca_id = str(current['_id'])
+
+    base = await db.lca_versions.find_one(
+        {"lcaId": lca_id, "version": {"$lte": version}, "kind": "snapshot"},
+        sort=[("version", DESCENDING)]
+    )
+    if base is None:
+        raise RuntimeError(f"No snapshot at or before version {version} of LCA {lca_id}")
+
+    state = dict(base['snapshot'])
+    expected = base['version'] + 1
+    cursor = db.lca_versions.find(
+        {"lcaId": lca_id, "version": {"$gt": base['version'], "$lte": version}},
+        {"version": 1, "changes": 1}
+    ).sort("version", ASCENDING)
+    async for delta in cursor:
+        if delta['version'] != expected:
+            raise RuntimeError(f"Version {expected} of LCA {lca_id} is missing from its history")
+        state.update(delta['changes'])
+        expected += 1
+    if expected != version + 1:
+        raise RuntimeError(f"Version {expected} of LCA {lca_id} is missing from its history")
+
+    return {'_id': current['_id'], **state, 'version': version}
+
+async def delete_versions(lca_id: str):
+    await get_database().lca_versions.delete_many({"lcaId": lca_id})
@@ -0,0 +1,290 @@
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.config import get_settings
+from app.database import current_tenant
+from app.metrics import PASSPORT_CACHE_LOOKUPS
+from app.tenancy import DEFAULT_TENANT_LABEL, tenant_label
+
+# expand name -> (collection, reference field on the passport, field the document is embedded as)
+EXPANSIONS = {
+    'lca': ('lca_assessments', 'lcaId', 'lcaData'),
+    'doctor': ('doctor_analyses', 'doctorAnalysisId', 'doctorAnalysis')
+}
+
+def parse_expand(expand: Optional[str]) -> List[str]:
+    """Parse `expand=lca,doctor`, rejecting unknown names with a 400"""
+    if not expand:
+        return []
+
+    requested = []
+    for name in expand.split(','):
+        name = name.strip()
+        if not name or name in requested:
+            continue
+        if name not in EXPANSIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown expansion '{name}' (expected one of: {', '.join(EXPANSIONS)})"
+            )
+        requested.append(name)
+    return requested
+
+def expansion_pipeline(
+    query: dict,
+    expand: List[str],
+    sort: Optional[list] = None,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    projection: Optional[dict] = None
+) -> list:
+    """Aggregation that pages the passports first, then joins each expansion with $lookup"""
+    pipeline = [{"$match": query}]
+    if sort:
+        pipeline.append({"$sort": dict(sort)})
+    if skip:
+        pipeline.append({"$skip": skip})
+    if limit:
+        pipeline.append({"$limit": limit})
+
+    # References are stored as hex strings; convert them so the joins can use
+    # the _id index (malformed references convert to null and join nothing)
+    refs = {
+        f"_{name}Ref": {"$convert": {"input": f"${EXPANSIONS[name][1]}", "to": "objectId", "onError": None, "onNull": None}}
+        for name in expand
+    }
+    pipeline.append({"$addFields": refs})
+
+    for name in expand:
+        collection, _, target = EXPANSIONS[name]
+        pipeline += [
+            {"$lookup": {"from": collection, "localField": f"_{name}Ref", "foreignField": "_id", "as": target}},
+            {"$unwind": {"path": f"${target}", "preserveNullAndEmptyArrays": True}}
+        ]
+
+    if projection:
+        fields = dict(projection)
+        for name in expand:
+            target = EXPANSIONS[name][2]
+            fields[f"{target}._id"] = 1
+            fields.update({f"{target}.{field}": 1 for field in projection})
+        pipeline.append({"$project": fields})
+    else:
+        pipeline.append({"$project": {ref: 0 for ref in refs}})
+    return pipeline
+
+async def _attach_batched(db, passports: List[dict], expand: List[str], projection: Optional[dict]):
+    """Fallback join: one $in query per expansion, all issued concurrently"""
+
+    async def fetch(name: str):
+        collection, field, target = EXPANSIONS[name]
+        ids = {p[field] for p in passports if isinstance(p.get(field), str) and ObjectId.is_valid(p[field])}
+        if not ids:
+            return target, field, {}
+        cursor = db[collection].find({"_id": {"$in": [ObjectId(i) for i in ids]}}, projection)
+        docs = await cursor.to_list(length=len(ids))
+        return target, field, {str(doc['_id']): doc for doc in docs}
+
+    for target, field, by_id in await asyncio.gather(*(fetch(name) for name in expand)):
+        for passport in passports:
+            doc = by_id.get(passport.get(field))
+            if doc is not None:
+                passport[target] = doc
+
+async def find_passports(
+    db,
+    query: dict,
+    expand: List[str],
+    sort: Optional[list] = None,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    projection: Optional[dict] = None
+) -> List[dict]:
+    """
+    Passports matching `query` with the requested expansions embedded.
+    On MongoDB this is a single aggregation; backends without aggregation
+    (sqlite, memory) read the page and then fetch each expansion with $in.
+    """
+    if expand and hasattr(db.passports, 'aggregate'):
+        cursor = db.passports.aggregate(expansion_pipeline(query, expand, sort, skip, limit, projection))
+        return await cursor.to_list(length=limit)
+
+    passport_projection = projection
+    if projection and expand:
+        # Keep the reference fields the join needs
+        passport_projection = {**projection, **{EXPANSIONS[name][1]: 1 for name in expand}}
+    cursor = db.passports.find(query, passport_projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if skip:
+        cursor = cursor.skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+    passports = await cursor.to_list(length=limit)
+
+    if expand and passports:
+        await _attach_batched(db, passports, expand, projection)
+    return passports
+
+def embedded_documents(passport: dict, expand: List[str]) -> List[dict]:
+    """The passport followed by the expanded documents it carries (for ETags)"""
+    docs = [passport]
+    for name in expand:
+        doc = passport.get(EXPANSIONS[name][2])
+        if doc is not None:
+            docs.append(doc)
+    return docs
+
+def serialize_passport(passport: dict) -> dict:
+    passport['_id'] = str(passport['_id'])
+    for _, _, target in EXPANSIONS.values():
+        if isinstance(passport.get(target), dict):
+            passport[target]['_id'] = str(passport[target]['_id'])
+    return passport
+
+class _CacheNamespace:
+    """One tenant's entries, in-flight loads and counters"""
+
+    def __init__(self, tenant: Optional[str]):
+        self.tenant = tenant
+        label = tenant_label(tenant)
+        # (lookup id, expansions) -> (expires at, passport)
+        self.entries = OrderedDict()
+        self.inflight = {}
+        # Bumped on invalidation so loads started earlier are not cached
+        self.generation = 0
+        self.hits = self.misses = self.coalesced = 0
+        self.hit_counter = PASSPORT_CACHE_LOOKUPS.labels(label, 'hit')
+        self.miss_counter = PASSPORT_CACHE_LOOKUPS.labels(label, 'miss')
+        self.coalesced_counter = PASSPORT_CACHE_LOOKUPS.labels(label, 'coalesced')
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self.entries),
+            'inflight': len(self.inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced
+        }
+
+class PassportCache:
+    """
+    Hot-key cache for single-passport lookups (QR scans), with single-flight
+    loading: concurrent misses for the same key share one database read.
+    Entries expire after `ttl` seconds; deletes and LCA changes invalidate
+    them in this process (other workers catch up within the TTL). Each tenant
+    has its own namespace; the entry budget is shared, and when it is full
+    the tenant holding the most entries gives up its least recently used one,
+    so a tenant scanning many passports evicts its own entries first.
+    """
+
+    def __init__(self):
+        self._namespaces: Dict[Optional[str], _CacheNamespace] = {}
+        # Entries across all namespaces (at most passport_cache_max_entries)
+        self._size = 0
+
+    def _namespace(self) -> _CacheNamespace:
+        tenant = current_tenant.get()
+        namespace = self._namespaces.get(tenant)
+        if namespace is None:
+            namespace = self._namespaces[tenant] = _CacheNamespace(tenant)
+        return namespace
+
+    @staticmethod
+    def key(passport_id: str, expand: List[str]) -> tuple:
+        return passport_id, tuple(sorted(expand))
+
+    def get(self, key: tuple) -> Optional[dict]:
+        """A private copy of the cached passport, or None"""
+        namespace = self._namespace()
+        entry = namespace.entries.get(key)
+        if entry is None:
+            return None
+        expires, passport = entry
+        if expires <= time.monotonic():
+            del namespace.entries[key]
+            self._size -= 1
+            return None
+        namespace.entries.move_to_end(key)
+        namespace.hits += 1
+        namespace.hit_counter.inc()
+        return copy.deepcopy(passport)
+
+    async def load(self, key: tuple, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        """Run `loader` once for all concurrent callers of `key`; returns a private copy"""
+        namespace = self._namespace()
+        task = namespace.inflight.get(key)
+        if task is None:
+            namespace.misses += 1
+            namespace.miss_counter.inc()
+            task = asyncio.ensure_future(self._fill(namespace, key, loader, namespace.generation))
+            namespace.inflight[key] = task
+
+            def finished(done):
+                if namespace.inflight.get(key) is done:
+                    del namespace.inflight[key]
+
+            task.add_done_callback(finished)
+        else:
+            namespace.coalesced += 1
+            namespace.coalesced_counter.inc()
+        # A caller going away must not cancel the read the others are waiting on
+        passport = await asyncio.shield(task)
+        return copy.deepcopy(passport)
+
+    async def _fill(self, namespace: _CacheNamespace, key: tuple, loader, generation: int) -> Optional[dict]:
+        passport = await loader()
+        settings = get_settings()
+        if (passport is not None and settings.passport_cache_ttl_seconds > 0 and generation == namespace.generation
+                and self._namespaces.get(namespace.tenant) is namespace):
+            if key not in namespace.entries:
+                self._size += 1
+            namespace.entries[key] = (time.monotonic() + settings.passport_cache_ttl_seconds, passport)
+            namespace.entries.move_to_end(key)
+            while self._size > settings.passport_cache_max_entries:
+                self._evict()
+        return passport
+
+    def _evict(self):
+        largest = max(self._namespaces.values(), key=lambda namespace: len(namespace.entries))
+        largest.entries.popitem(last=False)
+        self._size -= 1
+        if not largest.entries and not largest.inflight:
+            del self._namespaces[largest.tenant]
+
+    def _drop(self, matches: Callable[[dict], bool]):
+        namespace = self._namespace()
+        namespace.generation += 1
+        # Later lookups start a fresh read instead of joining one that began before the change
+        namespace.inflight.clear()
+        entries = namespace.entries
+        for key in [key for key, (_, passport) in entries.items() if matches(passport)]:
+            del entries[key]
+            self._size -= 1
+
+    def invalidate(self, passport: dict):
+        """Forget a passport under every ID it may have been looked up by"""
+        object_id = str(passport['_id'])
+        self._drop(lambda cached: str(cached['_id']) == object_id)
+
+    def invalidate_lca(self, lca_id: str):
+        """Forget passports embedding (or linked to) an LCA that changed"""
+        self._drop(lambda cached: cached.get('lcaId') == lca_id)
+
+    def clear(self):
+        """Empty the current tenant's namespace"""
+        self._drop(lambda cached: True)
+
+    def stats(self) -> dict:
+        """Totals across tenants, plus each tenant's own figures"""
+        tenants = {tenant or DEFAULT_TENANT_LABEL: namespace.stats() for tenant, namespace in self._namespaces.items()}
+        totals = {field: sum(stats[field] for stats in tenants.values()) for field in ('entries', 'inflight', 'hits', 'misses', 'coalesced')}
+        return {**totals, 'tenants': tenants}
+
+passport_cache = PassportCache()
@@ -1,20 +1,75 @@
-import qrcode
 import base64
+import os
+import threading
+import time
 from io import BytesIO
-from datetime import datetime
-import random
-import string
 from typing import Optional
+from app.models.lca import LCARecord
 from app.services.calculations import get_circularity_grade
+from app.metrics import timed
+
+# Crockford base32: no I, L, O, U; ASCII order matches numeric order, so IDs sort by time
+CROCKFORD_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+RANDOM_LIMIT = 1 << RANDOM_BITS
+# Encode 10 bits (two characters) per step
+_CHAR_PAIRS = [a + b for a in CROCKFORD_ALPHABET for b in CROCKFORD_ALPHABET]
+
+class PassportIdAllocator:
+    """
+    ULID-style IDs: 48-bit millisecond timestamp + 80-bit random component,
+    as 26 Crockford base32 characters. Within one millisecond the random
+    component is incremented instead of redrawn, so IDs from one process are
+    strictly increasing and never repeat; separate processes start each
+    millisecond from independent random points.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._random = 0
+
+    def reset(self):
+        # A forked child must not continue the parent's sequence
+        with self._lock:
+            self._last_ms = -1
+
+    def next_value(self) -> int:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                # Leave headroom so increments within the millisecond cannot overflow
+                self._random = int.from_bytes(os.urandom(10), 'big') >> 1
+            else:
+                # Same millisecond (or the clock stepped back): keep the last timestamp
+                self._random += 1
+                if self._random >= RANDOM_LIMIT:
+                    self._last_ms += 1
+                    self._random = int.from_bytes(os.urandom(10), 'big') >> 1
+            return (self._last_ms << RANDOM_BITS) | self._random
+
+    def next_id(self) -> str:
+        value = self.next_value()
+        pairs = []
+        for _ in range(13):
+            pairs.append(_CHAR_PAIRS[value & 1023])
+            value >>= 10
+        return 'CW-' + ''.join(reversed(pairs))
+
+passport_ids = PassportIdAllocator()
+os.register_at_fork(after_in_child=passport_ids.reset)
 
 def generate_passport_id() -> str:
-    """Generate unique passport ID"""
-    timestamp = hex(int(datetime.now().timestamp()))[2:].upper()
-    random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-    return f"CW-{timestamp}-{random_suffix}"
+    """Generate a unique, time-sortable passport ID (CW- + 26-char ULID)"""
+    return passport_ids.next_id()
 
+@timed("generate_qr_code")
 def generate_qr_code(passport_id: str, base_url: str = "https://cycleweave.app") -> str:
     """Generate QR code as base64 string"""
+    # qrcode pulls in Pillow; load it on first use rather than at startup
+    import qrcode
+    
     url = f"{base_url}/passport/{passport_id}"
     
     qr = qrcode.QRCode(
@@ -34,69 +89,30 @@ def generate_qr_code(passport_id: str, base_url: str = "https://cycleweave.app")
     
     return base64.b64encode(buffer.getvalue()).decode()
 
-def generate_provenance_events(metal_type: str) -> list:
-    """Generate mock provenance timeline"""
-    base_date = datetime.now()
-    
-    events = [
-        {
-            'timestamp': (base_date.replace(day=max(1, base_date.day - 20))).strftime('%Y-%m-%d %H:%M'),
-            'event': 'Raw Material Sourced',
-            'location': f'Mining Site A, {"Chile" if metal_type == "Copper" else "Australia"}',
-            'verified': True
-        },
-        {
-            'timestamp': (base_date.replace(day=max(1, base_date.day - 17))).strftime('%Y-%m-%d %H:%M'),
-            'event': 'Transport to Smelter',
-            'location': 'Port of Valparaiso',
-            'verified': True
-        },
-        {
-            'timestamp': (base_date.replace(day=max(1, base_date.day - 10))).strftime('%Y-%m-%d %H:%M'),
-            'event': 'Smelting Process',
-            'location': 'Smelter Facility B',
-            'verified': True
-        },
-        {
-            'timestamp': (base_date.replace(day=max(1, base_date.day - 4))).strftime('%Y-%m-%d %H:%M'),
-            'event': 'Quality Certification',
-            'location': 'Testing Lab C',
-            'verified': True
-        },
-        {
-            'timestamp': base_date.strftime('%Y-%m-%d %H:%M'),
-            'event': 'Passport Generated',
-            'location': 'CycleWeave Platform',
-            'verified': True
-        }
-    ]
-    
-    return events
-
-def create_passport_data(lca_data: dict, doctor_analysis_id: Optional[str] = None) -> dict:
+@timed("create_passport_data")
+def create_passport_data(record: LCARecord, doctor_analysis_id: Optional[str] = None) -> dict:
     """Create complete passport data from LCA data"""
     passport_id = generate_passport_id()
     qr_code = generate_qr_code(passport_id)
     
-    circularity_score = lca_data.get('circularityScore', 0)
+    circularity_score = record.circularityScore or 0
     grade, grade_label = get_circularity_grade(circularity_score)
     
-    provenance = generate_provenance_events(lca_data.get('metalType', 'Aluminium'))
-    
     certifications = ['ISO 14001', 'ISO 14064', 'GHG Protocol', 'Circular Economy Standard']
     
     return {
         'passportId': passport_id,
-        'metalType': lca_data.get('metalType'),
-        'co2Emission': lca_data.get('co2Emission'),
+        'metalType': record.metalType,
+        'co2Emission': record.co2Emission,
         'circularityScore': circularity_score,
-        'scrapInputRate': lca_data.get('scrapInputRate'),
-        'totalDistance': lca_data.get('inboundDistance', 0) + lca_data.get('outboundDistance', 0),
-        'transportMode': lca_data.get('transportMode'),
-        'scenarioType': lca_data.get('scenarioType', 'Current'),
+        'scrapInputRate': record.scrapInputRate,
+        'totalDistance': record.inboundDistance + record.outboundDistance,
+        'transportMode': record.transportMode,
+        'scenarioType': record.scenarioType,
         'grade': grade,
         'gradeLabel': grade_label,
-        'provenance': provenance,
+        # Events live in provenance_events and are paged from this URL
+        'provenanceUrl': f"/api/passport/{passport_id}/provenance",
         'certifications': certifications,
         'qrCode': qr_code,
         'doctorAnalysisId': doctor_analysis_id
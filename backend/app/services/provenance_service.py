@@ -0,0 +1,196 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from app.database import get_database
+
+# prevHash of the first event in every chain
+GENESIS_HASH = '0' * 64
+
+# Concurrent appends to the same passport race on the unique (passportId, seq)
+# index; the loser re-reads the tip and tries again
+APPEND_ATTEMPTS = 5
+
+def event_hash(passport_id: str, seq: int, timestamp: datetime, event: str, location: str, details: dict, prev_hash: str) -> str:
+    """SHA-256 over the canonical JSON form of an event and its predecessor's hash"""
+    canonical = json.dumps(
+        {
+            'passportId': passport_id,
+            'seq': seq,
+            'timestamp': timestamp.isoformat(timespec='milliseconds'),
+            'event': event,
+            'location': location,
+            'details': details,
+            'prevHash': prev_hash
+        },
+        sort_keys=True,
+        separators=(',', ':'),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _normalize_timestamp(value: datetime) -> datetime:
+    # MongoDB stores naive UTC with millisecond precision; hash what will be read back
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+async def append_event(
+    passport_id: str,
+    event: str,
+    location: str,
+    details: Optional[dict] = None,
+    timestamp: Optional[datetime] = None
+) -> dict:
+    """
+    Append an event to a passport's chain. Only the current tip is read, so
+    the cost does not depend on the length of the history.
+    """
+    db = get_database()
+    details = details or {}
+    timestamp = _normalize_timestamp(timestamp or datetime.utcnow())
+
+    for _ in range(APPEND_ATTEMPTS):
+        tip = await db.provenance_events.find_one(
+            {"passportId": passport_id},
+            {"seq": 1, "hash": 1},
+            sort=[("seq", DESCENDING)]
+        )
+        seq = tip['seq'] + 1 if tip else 0
+        prev_hash = tip['hash'] if tip else GENESIS_HASH
+
+        doc = {
+            'passportId': passport_id,
+            'seq': seq,
+            'timestamp': timestamp,
+            'event': event,
+            'location': location,
+            'details': details,
+            'prevHash': prev_hash,
+            'hash': event_hash(passport_id, seq, timestamp, event, location, details, prev_hash),
+            'recordedAt': _normalize_timestamp(datetime.utcnow())
+        }
+        try:
+            result = await db.provenance_events.insert_one(doc)
+        except DuplicateKeyError:
+            continue
+        doc['_id'] = result.inserted_id
+        return doc
+
+    raise RuntimeError(f"Could not append provenance event for {passport_id}: too much contention")
+
+async def get_checkpoint(passport_id: str) -> dict:
+    """Last verified position of a chain (seq -1 before the first verification)"""
+    db = get_database()
+    head = await db.provenance_heads.find_one({"_id": passport_id})
+    if head is None:
+        return {'verifiedSeq': -1, 'verifiedHash': GENESIS_HASH, 'verifiedAt': None}
+    return head
+
+async def _save_checkpoint(passport_id: str, seq: int, hash_: str, rewind: bool = False):
+    db = get_database()
+    now = datetime.utcnow()
+    if rewind:
+        # A full verification found a break: events past it are no longer vouched for
+        await db.provenance_heads.update_one(
+            {"_id": passport_id},
+            {"$set": {"verifiedSeq": seq, "verifiedHash": hash_, "verifiedAt": now}},
+            upsert=True
+        )
+        return
+    try:
+        # Never move a checkpoint backwards if a concurrent verification got further
+        await db.provenance_heads.update_one(
+            {"_id": passport_id, "$or": [{"verifiedSeq": {"$lt": seq}}, {"verifiedSeq": {"$exists": False}}]},
+            {"$set": {"verifiedSeq": seq, "verifiedHash": hash_, "verifiedAt": now}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        pass
+
+async def verify_chain(passport_id: str, full: bool = False) -> dict:
+    """
+    Check the chain from the last verified checkpoint to the tip and advance
+    the checkpoint. Each event is re-hashed once in steady state; `full`
+    re-verifies from the genesis event (audits).
+    """
+    db = get_database()
+
+    if full:
+        seq, running_hash = -1, GENESIS_HASH
+    else:
+        checkpoint = await get_checkpoint(passport_id)
+        seq, running_hash = checkpoint['verifiedSeq'], checkpoint['verifiedHash']
+    start_seq = seq
+
+    checked = 0
+    cursor = db.provenance_events.find({"passportId": passport_id, "seq": {"$gt": seq}}).sort("seq", ASCENDING)
+    async for event in cursor:
+        broken_at, problem = event['seq'], None
+        if event['seq'] != seq + 1:
+            broken_at, problem = seq + 1, "Event missing from the chain"
+        elif event['prevHash'] != running_hash:
+            problem = "prevHash does not match the previous event"
+        elif event['hash'] != event_hash(
+            passport_id, event['seq'], event['timestamp'], event['event'],
+            event['location'], event.get('details') or {}, event['prevHash']
+        ):
+            problem = "Event content does not match its hash"
+
+        if problem:
+            # Keep the progress made up to the break
+            if full:
+                await _save_checkpoint(passport_id, seq, running_hash, rewind=True)
+            elif seq > start_seq:
+                await _save_checkpoint(passport_id, seq, running_hash)
+            return {
+                'valid': False,
+                'verifiedThrough': seq,
+                'eventsChecked': checked,
+                'brokenAt': broken_at,
+                'reason': problem
+            }
+
+        seq, running_hash = event['seq'], event['hash']
+        checked += 1
+
+    if seq > start_seq:
+        await _save_checkpoint(passport_id, seq, running_hash)
+
+    return {'valid': True, 'verifiedThrough': seq, 'eventsChecked': checked, 'headHash': running_hash}
+
+async def list_events(passport_id: str, after: int = -1, limit: int = 50) -> dict:
+    """One page of a chain in order (keyset pagination on seq)"""
+    db = get_database()
+
+    cursor = db.provenance_events.find(
+        {"passportId": passport_id, "seq": {"$gt": after}}
+    ).sort("seq", ASCENDING).limit(limit + 1)
+    events = await cursor.to_list(length=limit + 1)
+
+    has_more = len(events) > limit
+    events = events[:limit]
+    checkpoint = await get_checkpoint(passport_id)
+
+    return {
+        'events': [serialize_event(event, checkpoint['verifiedSeq']) for event in events],
+        'nextAfter': events[-1]['seq'] if has_more else None,
+        'verifiedThrough': checkpoint['verifiedSeq']
+    }
+
+def serialize_event(event: dict, verified_seq: int) -> dict:
+    return {
+        'seq': event['seq'],
+        'timestamp': event['timestamp'],
+        'event': event['event'],
+        'location': event['location'],
+        'details': event.get('details') or {},
+        'prevHash': event['prevHash'],
+        'hash': event['hash'],
+        # Covered by a successful verification of the chain
+        'verified': event['seq'] <= verified_seq
+    }
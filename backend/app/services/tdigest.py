@@ -0,0 +1,149 @@
+import math
+from bisect import bisect_right
+from typing import List, Optional
+
+class TDigest:
+    """
+    Merging t-digest (Dunning & Ertl): a mergeable streaming sketch of a
+    distribution whose size is bounded by `compression`, accurate at the tails.
+    Values are buffered and folded into sorted centroids using the k1 scale
+    function; quantile() and cdf() interpolate between centroid centres
+    (a binary search over at most ~compression centroids).
+    """
+
+    def __init__(self, compression: int = 100):
+        self.compression = compression
+        self.means: List[float] = []
+        self.weights: List[float] = []
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []
+        self._cumulative = None
+
+    def add(self, value: float, weight: float = 1.0):
+        self._buffer.append((value, weight))
+        self.count += weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self._buffer) >= self.compression * 5:
+            self._compress()
+
+    def merge(self, other: 'TDigest'):
+        """Fold another digest into this one"""
+        other._compress()
+        if not other.count:
+            return
+        self._buffer.extend(zip(other.means, other.weights))
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q(self, k: float) -> float:
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+
+        total = self.count
+        means, weights = [], []
+        mean, weight = items[0]
+        weight_so_far = 0.0
+        limit = total * self._q(self._k(0) + 1)
+
+        for value, w in items[1:]:
+            if weight_so_far + weight + w <= limit:
+                weight += w
+                mean += (value - mean) * w / weight
+            else:
+                weight_so_far += weight
+                means.append(mean)
+                weights.append(weight)
+                limit = total * self._q(self._k(weight_so_far / total) + 1)
+                mean, weight = value, w
+        means.append(mean)
+        weights.append(weight)
+
+        self.means, self.weights = means, weights
+        self._cumulative = None
+
+    def _centers(self) -> List[float]:
+        """Cumulative weight at each centroid's centre"""
+        self._compress()
+        if self._cumulative is None:
+            cumulative, running = [], 0.0
+            for weight in self.weights:
+                cumulative.append(running + weight / 2)
+                running += weight
+            self._cumulative = cumulative
+        return self._cumulative
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile q (0..1)"""
+        centers = self._centers()
+        if not centers:
+            return None
+        means = self.means
+        target = q * self.count
+
+        if target <= centers[0]:
+            return self.min + (means[0] - self.min) * (target / centers[0] if centers[0] else 0)
+        if target >= centers[-1]:
+            tail = self.count - centers[-1]
+            return means[-1] + (self.max - means[-1]) * ((target - centers[-1]) / tail if tail else 0)
+
+        i = bisect_right(centers, target) - 1
+        return means[i] + (means[i + 1] - means[i]) * (target - centers[i]) / (centers[i + 1] - centers[i])
+
+    def cdf(self, value: float) -> Optional[float]:
+        """Estimated fraction of the distribution below `value` (0..1)"""
+        centers = self._centers()
+        if not centers:
+            return None
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        means = self.means
+
+        if value < means[0]:
+            below = centers[0] * (value - self.min) / (means[0] - self.min)
+        elif value >= means[-1]:
+            below = centers[-1] + (self.count - centers[-1]) * (value - means[-1]) / (self.max - means[-1])
+        else:
+            i = bisect_right(means, value) - 1
+            below = centers[i] + (centers[i + 1] - centers[i]) * (value - means[i]) / (means[i + 1] - means[i])
+        return below / self.count
+
+    def to_dict(self) -> dict:
+        self._compress()
+        return {
+            'compression': self.compression,
+            'means': self.means,
+            'weights': self.weights,
+            'count': self.count,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TDigest':
+        digest = cls(data.get('compression', 100))
+        digest.means = list(data.get('means', []))
+        digest.weights = list(data.get('weights', []))
+        digest.count = data.get('count', 0.0)
+        if digest.count:
+            digest.min = data['min']
+            digest.max = data['max']
+        return digest
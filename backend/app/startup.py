@@ -0,0 +1,151 @@
+"""
+Startup timing.
+
+The app factory records how long each startup phase takes (router imports,
+app construction, storage connection, warmup...) in a StartupReport, which is
+printed once the app is ready and served at GET /api/admin/startup.
+
+For a per-module import-time breakdown run:
+
+    python -m app.startup [--top 25] [--group-by module|package]
+"""
+import argparse
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import List, Optional
+
+class StartupReport:
+    """Wall-clock duration and newly imported module count for each startup phase"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = []
+        self.ready_ms = None
+
+    @contextmanager
+    def phase(self, name: str):
+        modules = len(sys.modules)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({
+                'phase': name,
+                'durationMs': round((time.perf_counter() - started) * 1000, 2),
+                'modulesImported': len(sys.modules) - modules
+            })
+
+    def mark_ready(self):
+        self.ready_ms = round((time.perf_counter() - self.started_at) * 1000, 2)
+
+    def summary(self) -> str:
+        phases = ', '.join(f"{p['phase']} {p['durationMs']:.0f} ms" for p in self.phases)
+        return f"Startup complete in {self.ready_ms:.0f} ms ({phases})"
+
+    def as_dict(self) -> dict:
+        return {
+            'readyMs': self.ready_ms,
+            'modulesLoaded': len(sys.modules),
+            'phases': self.phases
+        }
+
+def warmup():
+    """Exercise the lazily imported, first-call-expensive code paths once"""
+    from app.models.lca import LCADataCreate, LCARecord
+    from app.services.calculations import calculate_circularity, calculate_emissions
+    from app.services.doctor_service import analyze_lca
+    from app.services.passport_service import create_passport_data, generate_qr_code
+
+    sample = LCARecord.from_document(LCADataCreate(
+        metalType="Aluminium",
+        oreGrade=45.0,
+        miningMethod="Open Pit",
+        waterUsage=12.0,
+        totalEnergyConsumption=15000,
+        gridMix={"coal": 40, "hydro": 30, "solar": 20, "naturalGas": 10},
+        processHeat=8000,
+        furnaceType="Electric Arc",
+        temperature=1200,
+        fluxUsage=40,
+        slagRecovery=60,
+        transportMode="Rail",
+        inboundDistance=300,
+        outboundDistance=300,
+        vehicleEfficiency=0.5,
+        scrapInputRate=30,
+        recyclingEfficiency=75,
+        wasteRecovery=50,
+        closedLoopRate=20
+    ).model_dump())
+
+    sample.co2Emission = calculate_emissions(sample)
+    sample.circularityScore = calculate_circularity(sample)
+    analyze_lca(sample)
+    generate_qr_code("CW-WARMUP")
+    create_passport_data(sample, "warmup")
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """Parse `python -X importtime` output into {module, self_us, cumulative_us} rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            # Header line
+            continue
+        rows.append({
+            'module': parts[2].strip(),
+            'self_us': int(parts[0]),
+            'cumulative_us': int(parts[1])
+        })
+    return rows
+
+def measure_imports(target: str = "app.main", factory: bool = True) -> List[dict]:
+    """Import the target (and build the app) in a fresh interpreter with -X importtime"""
+    code = f"import {target}"
+    if factory:
+        code += f"; {target}.create_app()"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return parse_importtime(result.stderr)
+
+def group_by_package(rows: List[dict]) -> List[dict]:
+    """Total self time per top-level package"""
+    totals = defaultdict(int)
+    for row in rows:
+        totals[row['module'].split('.')[0]] += row['self_us']
+    return [{'module': name, 'self_us': us, 'cumulative_us': us} for name, us in totals.items()]
+
+def format_imports(rows: List[dict], top: int, by_package: bool) -> str:
+    key = 'self_us' if by_package else 'cumulative_us'
+    total = sum(row['self_us'] for row in rows)
+    lines = [f"{'module':<48} {'self ms':>9} {'cumul. ms':>10}"]
+    for row in sorted(rows, key=lambda r: r[key], reverse=True)[:top]:
+        lines.append(f"{row['module']:<48} {row['self_us'] / 1000:>9.1f} {row['cumulative_us'] / 1000:>10.1f}")
+    lines.append(f"{'total':<48} {total / 1000:>9.1f}")
+    return '\n'.join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.startup", description="Import-time breakdown of the API")
+    parser.add_argument("--top", type=int, default=25, help="Rows to show")
+    parser.add_argument("--group-by", choices=["module", "package"], default="module")
+    parser.add_argument("--target", default="app.main", help="Module to import")
+    parser.add_argument("--no-factory", action="store_true", help="Only import the module, do not build the app")
+    args = parser.parse_args(argv)
+
+    rows = measure_imports(args.target, factory=not args.no_factory)
+    by_package = args.group_by == "package"
+    if by_package:
+        rows = group_by_package(rows)
+    print(format_imports(rows, args.top, by_package))
+
+if __name__ == "__main__":
+    main()
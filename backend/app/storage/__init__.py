@@ -0,0 +1 @@
+# Storage backends that can stand in for MongoDB behind get_database()
@@ -0,0 +1,91 @@
+import asyncio
+from itertools import islice
+from typing import List, Optional
+
+from app.storage.query import normalize_sort, project
+
+DEFAULT_BATCH_SIZE = 1000
+
+class StorageCursor:
+    """
+    Motor-style cursor over documents produced by a collection fetch function.
+    Documents are pulled `batch_size` at a time (through `run`, the backend's
+    executor, when given), so a long scan holds one batch in memory and never
+    blocks the event loop for more than one batch.
+    """
+    
+    def __init__(self, fetch, query: Optional[dict], projection: Optional[dict], run=None):
+        # fetch(query, sort, skip, limit) -> iterator of copied documents
+        self._fetch = fetch
+        self._run = run
+        self._query = query or {}
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = DEFAULT_BATCH_SIZE
+        self._docs = None
+    
+    def sort(self, key_or_list, direction=None):
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+    
+    def skip(self, count: int):
+        self._skip = count
+        return self
+    
+    def limit(self, count: int):
+        self._limit = count
+        return self
+    
+    def batch_size(self, count: int):
+        # 0 means the server default, as in pymongo
+        self._batch_size = count or DEFAULT_BATCH_SIZE
+        return self
+    
+    def _pull(self, count: int) -> List[dict]:
+        if self._docs is None:
+            self._docs = iter(self._fetch(self._query, self._sort, self._skip, self._limit))
+        return [project(doc, self._projection) for doc in islice(self._docs, count)]
+    
+    async def _next_batch(self, count: int) -> List[dict]:
+        if self._run is None:
+            return self._pull(count)
+        return await self._run(self._pull, count)
+    
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        results = []
+        while not length or len(results) < length:
+            batch = await self._next_batch(min(self._batch_size, length - len(results)) if length else self._batch_size)
+            if not batch:
+                break
+            results.extend(batch)
+        return results
+    
+    async def close(self):
+        """Release the backend resources of a cursor that was not exhausted"""
+        close = getattr(self._docs, 'close', None)
+        if close is None:
+            return
+        if self._run is None:
+            close()
+        else:
+            # After any pull still running on the executor
+            await self._run(close)
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        try:
+            while True:
+                batch = await self._next_batch(self._batch_size)
+                if not batch:
+                    return
+                for doc in batch:
+                    yield doc
+                if self._run is None:
+                    # Let other requests run during long scans
+                    await asyncio.sleep(0)
+        finally:
+            await self.close()
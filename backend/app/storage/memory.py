@@ -0,0 +1,290 @@
+"""
+In-process storage backend implementing the subset of the Motor API used by
+the routers. Intended for load tests, local development and demos: data lives
+in the worker process and is lost on restart.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from app.storage.cursor import StorageCursor
+from app.storage.query import (
+    TTL_MONITOR_SECONDS, apply_update, copy_document, get_path, matches, normalize_sort, project, sort_documents,
+    upsert_seed
+)
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[object, dict] = {}
+        # index name -> (fields, unique, {key tuple: set of _ids})
+        self._indexes: Dict[str, tuple] = {}
+        # (field, seconds) of a TTL index, and when expired documents were last removed
+        self._ttl = None
+        self._ttl_checked = 0.0
+    
+    # Indexes
+    
+    def _index_key(self, fields, doc):
+        return tuple(_hashable(get_path(doc, field, None)) for field in fields)
+    
+    def _check_unique(self, doc: dict, ignore_id=None):
+        for name, (fields, unique, entries) in self._indexes.items():
+            if not unique:
+                continue
+            holders = entries.get(self._index_key(fields, doc), ())
+            if any(holder != ignore_id for holder in holders):
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {name}",
+                    11000
+                )
+    
+    def _index_add(self, doc: dict):
+        for fields, _, entries in self._indexes.values():
+            entries.setdefault(self._index_key(fields, doc), set()).add(doc['_id'])
+    
+    def _index_remove(self, doc: dict):
+        for fields, _, entries in self._indexes.values():
+            holders = entries.get(self._index_key(fields, doc))
+            if holders:
+                holders.discard(doc['_id'])
+                if not holders:
+                    del entries[self._index_key(fields, doc)]
+    
+    async def create_index(self, keys, unique: bool = False, name: Optional[str] = None, **kwargs) -> str:
+        fields = [key for key, _ in normalize_sort(keys)]
+        name = name or '_'.join(f"{key}_{direction}" for key, direction in normalize_sort(keys))
+        if kwargs.get('expireAfterSeconds') is not None:
+            self._ttl = (fields[0], kwargs['expireAfterSeconds'])
+        if name not in self._indexes:
+            entries = {}
+            index = (fields, unique, entries)
+            self._indexes[name] = index
+            for doc in self._docs.values():
+                key = self._index_key(fields, doc)
+                if unique and entries.get(key):
+                    del self._indexes[name]
+                    raise DuplicateKeyError(f"E11000 duplicate key error building index {name}", 11000)
+                entries.setdefault(key, set()).add(doc['_id'])
+        return name
+    
+    def _candidates(self, query: dict):
+        """Narrow a scan using an index whose fields are all equality-matched"""
+        if '_id' in query and not isinstance(query['_id'], dict):
+            doc = self._docs.get(query['_id'])
+            return [doc] if doc is not None else []
+        
+        for fields, _, entries in self._indexes.values():
+            if all(field in query and not isinstance(query[field], (dict, list)) for field in fields):
+                key = tuple(_hashable(query[field]) for field in fields)
+                return [self._docs[_id] for _id in entries.get(key, ())]
+        return self._docs.values()
+    
+    def _expire(self):
+        """Remove documents past their TTL, at most once per TTL_MONITOR_SECONDS (like MongoDB's TTL monitor)"""
+        if self._ttl is None or time.monotonic() - self._ttl_checked < TTL_MONITOR_SECONDS:
+            return
+        self._ttl_checked = time.monotonic()
+        field, seconds = self._ttl
+        cutoff = datetime.utcnow() - timedelta(seconds=seconds)
+        for doc in [doc for doc in self._docs.values() if isinstance(doc.get(field), datetime) and doc[field] < cutoff]:
+            self._index_remove(doc)
+            del self._docs[doc['_id']]
+    
+    def _matching(self, query: dict, sort=None) -> list:
+        docs = [doc for doc in self._candidates(query) if matches(doc, query)]
+        if sort:
+            docs = sort_documents(docs, sort)
+        return docs
+    
+    def _fetch(self, query: dict, sort, skip: int, limit: int) -> Iterator[dict]:
+        # Matches are taken now (writes during the scan do not shift it);
+        # documents are copied as the cursor pulls them
+        docs = self._matching(query, sort)
+        if skip:
+            docs = docs[skip:]
+        if limit:
+            docs = docs[:limit]
+        return (copy_document(doc) for doc in docs)
+    
+    def _first(self, query: Optional[dict], sort=None) -> Optional[dict]:
+        query = query or {}
+        if sort:
+            docs = self._matching(query, normalize_sort(sort))
+            return docs[0] if docs else None
+        for doc in self._candidates(query):
+            if matches(doc, query):
+                return doc
+        return None
+    
+    # Reads
+    
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> StorageCursor:
+        cursor = StorageCursor(self._fetch, filter, projection)
+        if kwargs.get('sort'):
+            cursor.sort(kwargs['sort'])
+        return cursor
+    
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None, sort=None, **kwargs) -> Optional[dict]:
+        doc = self._first(filter, sort)
+        return project(copy_document(doc), projection) if doc is not None else None
+    
+    async def count_documents(self, filter: Optional[dict] = None, **kwargs) -> int:
+        query = filter or {}
+        return sum(1 for doc in self._candidates(query) if matches(doc, query))
+    
+    # Writes
+    
+    def _insert(self, document: dict):
+        if '_id' not in document:
+            # Like pymongo, the caller's document receives the generated _id
+            document['_id'] = ObjectId()
+        doc = copy_document(document)
+        if doc['_id'] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_", 11000)
+        self._check_unique(doc)
+        self._docs[doc['_id']] = doc
+        self._index_add(doc)
+        return doc['_id']
+    
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        self._expire()
+        return InsertOneResult(self._insert(document), True)
+    
+    async def insert_many(self, documents, ordered: bool = True, **kwargs) -> InsertManyResult:
+        self._expire()
+        inserted = []
+        errors = []
+        for index, document in enumerate(documents):
+            try:
+                inserted.append(self._insert(document))
+            except DuplicateKeyError as exc:
+                errors.append({'index': index, 'code': 11000, 'errmsg': str(exc)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': len(inserted)})
+        return InsertManyResult(inserted, True)
+    
+    def _replace_stored(self, doc: dict, updated: dict):
+        self._check_unique(updated, ignore_id=doc['_id'])
+        self._index_remove(doc)
+        self._docs[doc['_id']] = updated
+        self._index_add(updated)
+    
+    def _update(self, query: dict, update: dict, upsert: bool, many: bool):
+        query = query or {}
+        targets = [doc for doc in self._candidates(query) if matches(doc, query)]
+        if not many:
+            targets = targets[:1]
+        
+        modified = 0
+        for doc in targets:
+            updated = apply_update(copy_document(doc), update)
+            if updated != doc:
+                self._replace_stored(doc, updated)
+                modified += 1
+        
+        upserted_id = None
+        if not targets and upsert:
+            doc = apply_update(upsert_seed(query), update, inserting=True)
+            upserted_id = self._insert(doc)
+        
+        return len(targets), modified, upserted_id
+    
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        matched, modified, upserted_id = self._update(filter, update, upsert, many=False)
+        return UpdateResult({'n': matched or int(upserted_id is not None), 'nModified': modified, 'upserted': upserted_id}, True)
+    
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        matched, modified, upserted_id = self._update(filter, update, upsert, many=True)
+        return UpdateResult({'n': matched or int(upserted_id is not None), 'nModified': modified, 'upserted': upserted_id}, True)
+    
+    async def find_one_and_update(self, filter: dict, update: dict, projection: Optional[dict] = None, sort=None,
+                                  upsert: bool = False, return_document=ReturnDocument.BEFORE, **kwargs) -> Optional[dict]:
+        doc = self._first(filter, sort)
+        if doc is None:
+            if not upsert:
+                return None
+            created = apply_update(upsert_seed(filter or {}), update, inserting=True)
+            self._insert(created)
+            if return_document == ReturnDocument.BEFORE:
+                return None
+            return project(copy_document(self._docs[created['_id']]), projection)
+        
+        before = copy_document(doc)
+        updated = apply_update(copy_document(doc), update)
+        self._replace_stored(doc, updated)
+        result = before if return_document == ReturnDocument.BEFORE else copy_document(updated)
+        return project(result, projection)
+    
+    async def find_one_and_delete(self, filter: dict, projection: Optional[dict] = None, sort=None, **kwargs) -> Optional[dict]:
+        doc = self._first(filter, sort)
+        if doc is None:
+            return None
+        self._index_remove(doc)
+        del self._docs[doc['_id']]
+        return project(doc, projection)
+    
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        doc = self._first(filter)
+        if doc is None:
+            return DeleteResult({'n': 0}, True)
+        self._index_remove(doc)
+        del self._docs[doc['_id']]
+        return DeleteResult({'n': 1}, True)
+    
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        query = filter or {}
+        targets = [doc for doc in self._candidates(query) if matches(doc, query)]
+        for doc in targets:
+            self._index_remove(doc)
+            del self._docs[doc['_id']]
+        return DeleteResult({'n': len(targets)}, True)
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+    
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+    
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+    
+    async def command(self, command, **kwargs) -> dict:
+        if command == 'ping':
+            return {'ok': 1.0}
+        raise NotImplementedError(f"Command {command} is not supported by this storage backend")
+
+class MemoryClient:
+    """Stands in for AsyncIOMotorClient: client[database_name][collection]"""
+    
+    def __init__(self):
+        self._databases: Dict[str, MemoryDatabase] = {}
+        self.admin = MemoryDatabase('admin')
+    
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name)
+        return self._databases[name]
+    
+    def close(self):
+        pass
@@ -0,0 +1,241 @@
+"""
+Evaluation of the MongoDB query/update subset used by the API, for the
+embedded storage backends.
+"""
+import re
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from bson import ObjectId
+
+_MISSING = object()
+
+# How often the backends remove documents past a TTL index's expireAfterSeconds
+TTL_MONITOR_SECONDS = 60
+
+def copy_document(value):
+    """Copy a BSON-like document (dicts/lists are copied, scalars shared)"""
+    if isinstance(value, dict):
+        return {k: copy_document(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_document(v) for v in value]
+    return value
+
+def get_path(doc: dict, path: str, default=_MISSING):
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return default
+    return value
+
+def set_path(doc: dict, path: str, value):
+    parts = path.split('.')
+    target = doc
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    target[parts[-1]] = value
+
+def unset_path(doc: dict, path: str):
+    parts = path.split('.')
+    target = doc
+    for part in parts[:-1]:
+        target = target.get(part)
+        if not isinstance(target, dict):
+            return
+    target.pop(parts[-1], None)
+
+# BSON comparison order for values of different types
+def _type_rank(value) -> int:
+    if value is _MISSING or value is None:
+        return 0
+    if isinstance(value, bool):
+        return 6
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, ObjectId):
+        return 5
+    if isinstance(value, datetime):
+        return 7
+    return 8
+
+def sort_key(value) -> Tuple[int, Any]:
+    rank = _type_rank(value)
+    if rank == 0:
+        return (0, 0)
+    if rank in (3, 4, 8):
+        return (rank, str(value))
+    return (rank, value)
+
+def _compare(value, operand, op) -> bool:
+    if value is _MISSING or value is None or _type_rank(value) != _type_rank(operand):
+        return False
+    if op == '$gt':
+        return value > operand
+    if op == '$gte':
+        return value >= operand
+    if op == '$lt':
+        return value < operand
+    return value <= operand
+
+def _equals(value, operand) -> bool:
+    if value is _MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+def _match_operators(value, spec: dict) -> bool:
+    for op, operand in spec.items():
+        if op == '$eq':
+            ok = _equals(value, operand)
+        elif op == '$ne':
+            ok = not _equals(value, operand)
+        elif op in ('$gt', '$gte', '$lt', '$lte'):
+            ok = _compare(value, operand, op)
+        elif op == '$in':
+            ok = any(_equals(value, candidate) for candidate in operand)
+        elif op == '$nin':
+            ok = not any(_equals(value, candidate) for candidate in operand)
+        elif op == '$exists':
+            ok = (value is not _MISSING) == bool(operand)
+        elif op == '$regex':
+            ok = isinstance(value, str) and re.search(operand, value, re.I if 'i' in spec.get('$options', '') else 0) is not None
+        elif op == '$options':
+            ok = True
+        elif op == '$not':
+            ok = not _match_operators(value, operand)
+        else:
+            raise NotImplementedError(f"Query operator {op} is not supported by this storage backend")
+        if not ok:
+            return False
+    return True
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    """True if the document satisfies the query"""
+    if not query:
+        return True
+    for key, condition in query.items():
+        if key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$nor':
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        elif key.startswith('$'):
+            raise NotImplementedError(f"Query operator {key} is not supported by this storage backend")
+        else:
+            value = get_path(doc, key)
+            if isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+                if not _match_operators(value, condition):
+                    return False
+            elif not _equals(value, condition):
+                return False
+    return True
+
+def apply_update(doc: dict, update: dict, inserting: bool = False) -> dict:
+    """Apply an update document in place and return the document"""
+    if not any(key.startswith('$') for key in update):
+        # Replacement document
+        preserved = doc.get('_id')
+        doc.clear()
+        doc.update(copy_document(update))
+        if preserved is not None:
+            doc['_id'] = preserved
+        return doc
+
+    for op, fields in update.items():
+        if op == '$set':
+            for path, value in fields.items():
+                set_path(doc, path, copy_document(value))
+        elif op == '$setOnInsert':
+            if inserting:
+                for path, value in fields.items():
+                    set_path(doc, path, copy_document(value))
+        elif op == '$unset':
+            for path in fields:
+                unset_path(doc, path)
+        elif op == '$inc':
+            for path, amount in fields.items():
+                current = get_path(doc, path, 0)
+                set_path(doc, path, current + amount)
+        elif op in ('$max', '$min'):
+            for path, value in fields.items():
+                current = get_path(doc, path)
+                if current is _MISSING or (value > current if op == '$max' else value < current):
+                    set_path(doc, path, value)
+        elif op == '$push':
+            for path, value in fields.items():
+                items = get_path(doc, path, _MISSING)
+                if items is _MISSING:
+                    items = []
+                    set_path(doc, path, items)
+                if isinstance(value, dict) and '$each' in value:
+                    items.extend(copy_document(value['$each']))
+                else:
+                    items.append(copy_document(value))
+        else:
+            raise NotImplementedError(f"Update operator {op} is not supported by this storage backend")
+    return doc
+
+def upsert_seed(query: dict) -> dict:
+    """Document an upsert starts from: the query's equality fields"""
+    doc = {}
+    for key, condition in query.items():
+        if key.startswith('$'):
+            continue
+        if isinstance(condition, dict) and any(k.startswith('$') for k in condition):
+            if '$eq' in condition:
+                set_path(doc, key, copy_document(condition['$eq']))
+            continue
+        set_path(doc, key, copy_document(condition))
+    return doc
+
+def normalize_sort(key_or_list, direction: Optional[int] = None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    return [(key, int(order)) for key, order in key_or_list]
+
+def sort_documents(docs: list, sort: List[Tuple[str, int]]) -> list:
+    # Stable sorts applied from the least to the most significant key
+    for key, direction in reversed(sort):
+        docs.sort(key=lambda doc: sort_key(get_path(doc, key)), reverse=direction < 0)
+    return docs
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    """Apply an inclusion or exclusion projection to a (copied) document"""
+    if not projection:
+        return doc
+
+    include_id = bool(projection.get('_id', 1))
+    fields = {k: v for k, v in projection.items() if k != '_id'}
+
+    if not fields or all(not v for v in fields.values()):
+        for path in fields:
+            unset_path(doc, path)
+        if not include_id:
+            doc.pop('_id', None)
+        return doc
+
+    result = {}
+    if include_id and '_id' in doc:
+        result['_id'] = doc['_id']
+    for path in fields:
+        value = get_path(doc, path)
+        if value is not _MISSING:
+            set_path(result, path, value)
+    return result
@@ -0,0 +1,557 @@
+"""
+Embedded single-node storage backend on SQLite, for deployments without a
+MongoDB server. Documents are stored as BSON; fields that are indexed
+(lcaId, passportId and createdAt by default, plus anything passed to
+create_index) are promoted to their own columns with SQLite indexes, so
+lookups and createdAt-ordered listings are served from the index.
+
+Queries are prefiltered in SQL on promoted columns and always re-checked with
+the shared query matcher, so unsupported shapes fall back to a scan instead of
+returning wrong results.
+
+Each database runs its sqlite3 calls on a thread of its own, so the event loop
+never waits on disk or on another process's write lock, and the database's
+operations (and transactions) run one at a time as they would on the loop.
+Cursors read through pooled connections of their own (WAL readers do not
+block the writer) and pull rows a batch at a time.
+"""
+import asyncio
+import functools
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+import bson
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from app.storage.cursor import StorageCursor
+from app.storage.query import (
+    TTL_MONITOR_SECONDS, apply_update, get_path, matches, normalize_sort, project, upsert_seed
+)
+
+DEFAULT_INDEXED_FIELDS = ['lcaId', 'passportId', 'createdAt']
+
+# Idle cursor connections kept open per database
+MAX_IDLE_READERS = 4
+
+_RANGE_OPERATORS = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+_MISSING = object()
+
+class StorageBusy(PyMongoError):
+    """Another worker process held the write lock for longer than the busy timeout"""
+
+def _column(field: str) -> str:
+    return 'f_' + re.sub(r'[^A-Za-z0-9_]', '_', field)
+
+def _sql_value(value):
+    """Encode a field value for a promoted column (comparable within a type)"""
+    if value is None or value is _MISSING:
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%S.%f')
+    if isinstance(value, ObjectId):
+        return str(value)
+    return _MISSING
+
+def _encode_id(value) -> str:
+    if isinstance(value, ObjectId):
+        return 'o:' + str(value)
+    if isinstance(value, str):
+        return 's:' + value
+    return 'r:' + repr(value)
+
+def _threaded(method):
+    """Expose a blocking collection method as a coroutine run on the database's thread"""
+    @functools.wraps(method)
+    async def run(self, *args, **kwargs):
+        return await self._call(functools.partial(method, self, *args, **kwargs))
+    return run
+
+class SQLiteCollection:
+    def __init__(self, database: 'SQLiteDatabase', name: str):
+        self.database = database
+        self.name = name
+        self._table = '"c_' + re.sub(r'[^A-Za-z0-9_]', '_', name) + '"'
+        self._fields: List[str] = []
+        self._ready = False
+        # (field, seconds) of a TTL index, and when expired rows were last deleted
+        self._ttl = None
+        self._ttl_checked = 0.0
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self.database.connection
+
+    async def _call(self, func, *args):
+        return await self.database.run(self._prepared, func, *args)
+
+    def _prepared(self, func, *args):
+        # The table is created by the first operation, on the database's thread
+        if not self._ready:
+            self._ensure_table()
+            self._ready = True
+        return func(*args)
+
+    def _ensure_table(self):
+        with self.database.transaction():
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {self._table} (id TEXT PRIMARY KEY, doc BLOB NOT NULL)")
+            self._load_fields()
+            for field in DEFAULT_INDEXED_FIELDS:
+                self._promote(field, unique=False)
+
+    def _load_fields(self):
+        existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({self._table})")}
+        self._fields = [self.database.field_for_column(column) for column in existing if column.startswith('f_')]
+
+    def _promote(self, field: str, unique: bool, index_name: Optional[str] = None):
+        column = _column(field)
+        # Other worker processes promote columns too: decide under the write
+        # lock, on the schema as it is now, so two of them never both ALTER
+        with self.database.transaction():
+            if field not in self._fields:
+                self._load_fields()
+            if field not in self._fields:
+                self._conn.execute(f"ALTER TABLE {self._table} ADD COLUMN {column}")
+                self.database.register_column(column, field)
+                self._fields.append(field)
+                # Backfill the new column from stored documents
+                rows = self._conn.execute(f"SELECT id, doc FROM {self._table}").fetchall()
+                for row_id, blob in rows:
+                    value = _sql_value(get_path(bson.decode(blob), field, None))
+                    self._conn.execute(f"UPDATE {self._table} SET {column} = ? WHERE id = ?",
+                                       (None if value is _MISSING else value, row_id))
+            name = index_name or f"{self._table[1:-1]}_{column}"
+            self._conn.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS \"{name}\" ON {self._table} ({column})"
+            )
+
+    @_threaded
+    def create_index(self, keys, unique: bool = False, name: Optional[str] = None, **kwargs) -> str:
+        spec = normalize_sort(keys)
+        name = name or '_'.join(f"{key}_{direction}" for key, direction in spec)
+        if kwargs.get('expireAfterSeconds') is not None:
+            self._ttl = (spec[0][0], kwargs['expireAfterSeconds'])
+        for field, _ in spec:
+            if field not in self._fields:
+                self._promote(field, unique=False)
+        columns = ', '.join(f"{_column(field)} {'DESC' if direction < 0 else 'ASC'}" for field, direction in spec)
+        try:
+            with self.database.transaction():
+                self._conn.execute(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS \"{self._table[1:-1]}_{name}\" "
+                    f"ON {self._table} ({columns})"
+                )
+        except sqlite3.IntegrityError:
+            raise DuplicateKeyError(f"E11000 duplicate key error building index {name}", 11000)
+        return name
+
+    def _expire(self):
+        """Delete rows past their TTL, at most once per TTL_MONITOR_SECONDS (like MongoDB's TTL monitor)"""
+        if self._ttl is None or time.monotonic() - self._ttl_checked < TTL_MONITOR_SECONDS:
+            return
+        self._ttl_checked = time.monotonic()
+        field, seconds = self._ttl
+        column = _column(field)
+        cutoff = _sql_value(datetime.utcnow() - timedelta(seconds=seconds))
+        with self.database.transaction():
+            # Dates are stored as text; rows with other values never expire, as in MongoDB
+            self._conn.execute(f"DELETE FROM {self._table} WHERE typeof({column}) = 'text' AND {column} < ?", (cutoff,))
+
+    # Query planning
+
+    def _where(self, query: dict):
+        """SQL prefilter from conditions on _id and promoted fields"""
+        clauses = []
+        params = []
+        for key, condition in query.items():
+            if key == '_id':
+                if isinstance(condition, dict):
+                    if isinstance(condition.get('$in'), list):
+                        ids = [_encode_id(v) for v in condition['$in']]
+                        clauses.append(f"id IN ({', '.join('?' * len(ids))})" if ids else "0")
+                        params.extend(ids)
+                else:
+                    clauses.append("id = ?")
+                    params.append(_encode_id(condition))
+                continue
+            if key not in self._fields:
+                continue
+            column = _column(key)
+            if isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+                for op, operand in condition.items():
+                    if op == '$eq':
+                        operand_value = _sql_value(operand)
+                        if operand_value is not _MISSING and operand_value is not None:
+                            clauses.append(f"{column} = ?")
+                            params.append(operand_value)
+                    elif op == '$in' and isinstance(operand, list):
+                        values = [_sql_value(v) for v in operand]
+                        if values and all(v is not _MISSING and v is not None for v in values):
+                            clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                            params.extend(values)
+                    elif op in _RANGE_OPERATORS:
+                        operand_value = _sql_value(operand)
+                        if operand_value is not _MISSING and operand_value is not None:
+                            clauses.append(f"{column} {_RANGE_OPERATORS[op]} ?")
+                            params.append(operand_value)
+            else:
+                value = _sql_value(condition)
+                if value is not _MISSING and value is not None:
+                    clauses.append(f"{column} = ?")
+                    params.append(value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def _rows(self, query: dict, sort=None, connection: Optional[sqlite3.Connection] = None):
+        where, params = self._where(query)
+        order = ''
+        sort = sort or []
+        sorted_in_sql = bool(sort) and all(field in self._fields or field == '_id' for field, _ in sort)
+        if sorted_in_sql:
+            order = ' ORDER BY ' + ', '.join(
+                f"{'id' if field == '_id' else _column(field)} {'DESC' if direction < 0 else 'ASC'}"
+                for field, direction in sort
+            )
+        cursor = (connection or self._conn).execute(f"SELECT id, doc FROM {self._table}{where}{order}", params)
+        return cursor, sorted_in_sql
+
+    def _matching(self, query: Optional[dict], sort=None, connection: Optional[sqlite3.Connection] = None):
+        """Yield (row id, document) pairs in sort order"""
+        query = query or {}
+        cursor, sorted_in_sql = self._rows(query, sort, connection)
+        if sorted_in_sql or not sort:
+            for row_id, blob in cursor:
+                doc = bson.decode(blob)
+                if matches(doc, query):
+                    yield row_id, doc
+            return
+
+        from app.storage.query import sort_documents
+        docs = [(row_id, bson.decode(blob)) for row_id, blob in cursor]
+        docs = [(row_id, doc) for row_id, doc in docs if matches(doc, query)]
+        order = {id(doc): row_id for row_id, doc in docs}
+        for doc in sort_documents([doc for _, doc in docs], sort):
+            yield order[id(doc)], doc
+
+    def _stream(self, query: dict, sort, skip: int, limit: int) -> Iterator[dict]:
+        """A cursor's documents, read lazily through a connection of its own"""
+        connection = self.database.reader()
+        rows = self._matching(query, sort, connection)
+        try:
+            returned = 0
+            for index, (_, doc) in enumerate(rows):
+                if index < skip:
+                    continue
+                yield doc
+                returned += 1
+                if limit and returned >= limit:
+                    return
+        finally:
+            # Ends the statement (and its read snapshot) before the connection is reused
+            rows.close()
+            self.database.release(connection)
+
+    def _first(self, query: Optional[dict], sort=None):
+        for row_id, doc in self._matching(query, normalize_sort(sort) if sort else None):
+            return row_id, doc
+        return None, None
+
+    # Reads
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> StorageCursor:
+        cursor = StorageCursor(self._stream, filter, projection, run=self._call)
+        if kwargs.get('sort'):
+            cursor.sort(kwargs['sort'])
+        return cursor
+
+    @_threaded
+    def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None, sort=None, **kwargs) -> Optional[dict]:
+        _, doc = self._first(filter, sort)
+        return project(doc, projection) if doc is not None else None
+
+    @_threaded
+    def count_documents(self, filter: Optional[dict] = None, **kwargs) -> int:
+        if not filter:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self._table}").fetchone()[0]
+        return sum(1 for _ in self._matching(filter))
+
+    # Writes
+
+    def _columns_for(self, doc: dict) -> Dict[str, object]:
+        values = {}
+        for field in self._fields:
+            value = _sql_value(get_path(doc, field, None))
+            values[_column(field)] = None if value is _MISSING else value
+        return values
+
+    def _duplicate(self, exc: sqlite3.IntegrityError) -> DuplicateKeyError:
+        return DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} ({exc})", 11000)
+
+    def _insert(self, document: dict):
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+        columns = self._columns_for(document)
+        names = ', '.join(['id', 'doc', *columns])
+        placeholders = ', '.join('?' * (len(columns) + 2))
+        try:
+            self._conn.execute(
+                f"INSERT INTO {self._table} ({names}) VALUES ({placeholders})",
+                [_encode_id(document['_id']), bson.encode(document), *columns.values()]
+            )
+        except sqlite3.IntegrityError as exc:
+            raise self._duplicate(exc)
+        return document['_id']
+
+    def _store(self, row_id: str, doc: dict):
+        columns = self._columns_for(doc)
+        assignments = ', '.join(['doc = ?', *[f"{column} = ?" for column in columns]])
+        try:
+            self._conn.execute(
+                f"UPDATE {self._table} SET {assignments} WHERE id = ?",
+                [bson.encode(doc), *columns.values(), row_id]
+            )
+        except sqlite3.IntegrityError as exc:
+            raise self._duplicate(exc)
+
+    @_threaded
+    def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        self._expire()
+        with self.database.transaction():
+            return InsertOneResult(self._insert(document), True)
+
+    @_threaded
+    def insert_many(self, documents, ordered: bool = True, **kwargs) -> InsertManyResult:
+        self._expire()
+        inserted = []
+        errors = []
+        with self.database.transaction():
+            for index, document in enumerate(documents):
+                try:
+                    inserted.append(self._insert(document))
+                except DuplicateKeyError as exc:
+                    errors.append({'index': index, 'code': 11000, 'errmsg': str(exc)})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': len(inserted)})
+        return InsertManyResult(inserted, True)
+
+    def _update(self, query: dict, update: dict, upsert: bool, many: bool):
+        with self.database.transaction():
+            targets = []
+            for row_id, doc in self._matching(query):
+                targets.append((row_id, doc))
+                if not many:
+                    break
+
+            modified = 0
+            for row_id, doc in targets:
+                before = bson.encode(doc)
+                apply_update(doc, update)
+                if bson.encode(doc) != before:
+                    self._store(row_id, doc)
+                    modified += 1
+
+            upserted_id = None
+            if not targets and upsert:
+                upserted_id = self._insert(apply_update(upsert_seed(query or {}), update, inserting=True))
+        return len(targets), modified, upserted_id
+
+    @_threaded
+    def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        matched, modified, upserted_id = self._update(filter, update, upsert, many=False)
+        return UpdateResult({'n': matched or int(upserted_id is not None), 'nModified': modified, 'upserted': upserted_id}, True)
+
+    @_threaded
+    def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        matched, modified, upserted_id = self._update(filter, update, upsert, many=True)
+        return UpdateResult({'n': matched or int(upserted_id is not None), 'nModified': modified, 'upserted': upserted_id}, True)
+
+    @_threaded
+    def find_one_and_update(self, filter: dict, update: dict, projection: Optional[dict] = None, sort=None,
+                            upsert: bool = False, return_document=ReturnDocument.BEFORE, **kwargs) -> Optional[dict]:
+        with self.database.transaction():
+            row_id, doc = self._first(filter, sort)
+            if doc is None:
+                if not upsert:
+                    return None
+                created = apply_update(upsert_seed(filter or {}), update, inserting=True)
+                self._insert(created)
+                return None if return_document == ReturnDocument.BEFORE else project(created, projection)
+
+            before = bson.decode(bson.encode(doc))
+            apply_update(doc, update)
+            self._store(row_id, doc)
+        return project(before if return_document == ReturnDocument.BEFORE else doc, projection)
+
+    @_threaded
+    def find_one_and_delete(self, filter: dict, projection: Optional[dict] = None, sort=None, **kwargs) -> Optional[dict]:
+        with self.database.transaction():
+            row_id, doc = self._first(filter, sort)
+            if doc is None:
+                return None
+            self._conn.execute(f"DELETE FROM {self._table} WHERE id = ?", (row_id,))
+        return project(doc, projection)
+
+    @_threaded
+    def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        with self.database.transaction():
+            row_id, doc = self._first(filter)
+            if doc is None:
+                return DeleteResult({'n': 0}, True)
+            self._conn.execute(f"DELETE FROM {self._table} WHERE id = ?", (row_id,))
+        return DeleteResult({'n': 1}, True)
+
+    @_threaded
+    def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        with self.database.transaction():
+            row_ids = [row_id for row_id, _ in self._matching(filter)]
+            self._conn.executemany(f"DELETE FROM {self._table} WHERE id = ?", [(row_id,) for row_id in row_ids])
+        return DeleteResult({'n': len(row_ids)}, True)
+
+class _Transaction:
+    """Re-entrant BEGIN IMMEDIATE ... COMMIT; serialises writers across worker processes"""
+
+    def __init__(self, database: 'SQLiteDatabase'):
+        self.database = database
+        self.depth = 0
+
+    def __enter__(self):
+        if self.depth == 0:
+            try:
+                self.database.connection.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as exc:
+                if 'locked' not in str(exc) and 'busy' not in str(exc):
+                    raise
+                raise StorageBusy(
+                    f"SQLite database {self.database.name} is locked by another writer "
+                    f"(waited {self.database.busy_timeout_ms} ms)"
+                ) from exc
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.depth -= 1
+        if self.depth == 0:
+            self.database.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+class SQLiteDatabase:
+    def __init__(self, path: str, name: str, busy_timeout_ms: int = 250):
+        self.name = name
+        self.path = path
+        # A writer waiting for another process's lock holds up this
+        # database's other operations in the worker: wait briefly, then fail
+        self.busy_timeout_ms = busy_timeout_ms
+        # Opened by the first operation, on the database's thread
+        self.connection: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"sqlite-{name}")
+        # Idle connections for cursors
+        self._readers: List[sqlite3.Connection] = []
+        self._closed = False
+        self._tx = _Transaction(self)
+        self._collections: Dict[str, SQLiteCollection] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               timeout=self.busy_timeout_ms / 1000)
+
+    def _open(self):
+        connection = self._connect()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS _columns (name TEXT PRIMARY KEY, field TEXT NOT NULL)")
+        self.connection = connection
+
+    def _on_thread(self, func, args):
+        if self.connection is None:
+            self._open()
+        return func(*args)
+
+    async def run(self, func, *args):
+        """Run a blocking sqlite3 operation on this database's thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._on_thread, func, args)
+
+    def reader(self) -> sqlite3.Connection:
+        """A connection for a cursor; release() it when done"""
+        if self.path == ':memory:':
+            return self.connection
+        return self._readers.pop() if self._readers else self._connect()
+
+    def release(self, connection: sqlite3.Connection):
+        if connection is self.connection:
+            return
+        if self._closed or len(self._readers) >= MAX_IDLE_READERS:
+            connection.close()
+        else:
+            self._readers.append(connection)
+
+    def transaction(self) -> _Transaction:
+        return self._tx
+
+    def register_column(self, column: str, field: str):
+        self.connection.execute("INSERT OR IGNORE INTO _columns (name, field) VALUES (?, ?)", (column, field))
+
+    def field_for_column(self, column: str) -> str:
+        row = self.connection.execute("SELECT field FROM _columns WHERE name = ?", (column,)).fetchone()
+        return row[0] if row else column[2:]
+
+    def __getitem__(self, name: str) -> SQLiteCollection:
+        if name not in self._collections:
+            self._collections[name] = SQLiteCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> SQLiteCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, command, **kwargs) -> dict:
+        if command == 'ping':
+            await self.run(lambda: self.connection.execute("SELECT 1").fetchone())
+            return {'ok': 1.0}
+        raise NotImplementedError(f"Command {command} is not supported by this storage backend")
+
+    def close(self):
+        # Operations already queued finish first
+        self._executor.shutdown(wait=True)
+        self._closed = True
+        for connection in self._readers:
+            connection.close()
+        self._readers = []
+        if self.connection is not None:
+            self.connection.close()
+
+class SQLiteClient:
+    """Stands in for AsyncIOMotorClient; one SQLite file per database name"""
+
+    def __init__(self, directory: str, busy_timeout_ms: int = 250):
+        self.directory = directory
+        self.busy_timeout_ms = busy_timeout_ms
+        os.makedirs(directory, exist_ok=True)
+        self._databases: Dict[str, SQLiteDatabase] = {}
+        # Only used for ping; avoids creating an admin file on disk
+        self.admin = SQLiteDatabase(':memory:', 'admin')
+
+    def __getitem__(self, name: str) -> SQLiteDatabase:
+        if name not in self._databases:
+            self._databases[name] = SQLiteDatabase(
+                os.path.join(self.directory, f"{name}.sqlite3"), name, self.busy_timeout_ms
+            )
+        return self._databases[name]
+
+    def close(self):
+        for database in self._databases.values():
+            database.close()
+        self._databases = {}
+        self.admin.close()
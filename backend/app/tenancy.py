@@ -0,0 +1,136 @@
+"""
+Per-tenant database routing.
+
+Each tenant's collections live in their own database (<DATABASE_NAME>_<tenant>)
+on the shared client, so one tenant's data, indexes and working set do not
+grow another's. TenantMiddleware resolves the tenant of every request and sets
+`current_tenant`, which get_database() routes on; requests without a tenant
+use DATABASE_NAME itself. A tenant database gets its indexes the first time
+this process serves it.
+"""
+import asyncio
+import re
+import time
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from app.config import get_settings
+from app.database import current_tenant, database_name, db, ensure_tenant_indexes
+from app.metrics import TENANT_REQUEST_LATENCY, TENANT_REQUESTS
+
+# Becomes part of a database name: lower-case, no dots or slashes, and short
+# enough to stay under MongoDB's 64-byte limit with the prefix
+TENANT_ID = re.compile(r'^[a-z0-9][a-z0-9_-]{0,31}$')
+
+DEFAULT_TENANT_LABEL = 'default'
+# Metrics label of tenants that are no longer configured (e.g. their queued jobs)
+OTHER_TENANT_LABEL = 'other'
+
+# TENANT_REQUIRED covers the data API only: probes, metrics, docs and the
+# (process-wide) admin endpoints work without a tenant
+TENANT_OPTIONAL_PREFIXES = ('/api/admin/',)
+
+def tenant_required(path: str) -> bool:
+    return get_settings().tenant_required and path.startswith('/api/') and not path.startswith(TENANT_OPTIONAL_PREFIXES)
+
+def resolve_tenant(headers: Dict[str, str], required: bool = False) -> Optional[str]:
+    """The tenant a request belongs to (None for the default tenant); raises HTTPException"""
+    settings = get_settings()
+
+    if settings.tenant_tokens:
+        authorization = headers.get('authorization', '')
+        scheme, _, token = authorization.partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            if required:
+                raise HTTPException(status_code=401, detail="Tenant token required")
+            return None
+        tenant = settings.tenant_tokens.get(token.strip())
+        if tenant is None:
+            raise HTTPException(status_code=401, detail="Unknown tenant token")
+        return tenant
+
+    tenant = headers.get(settings.tenant_header.lower())
+    if not tenant:
+        if required:
+            raise HTTPException(status_code=400, detail=f"{settings.tenant_header} header required")
+        return None
+
+    if not settings.tenant_allowlist:
+        # Otherwise any client could name (and create) any tenant's database
+        raise HTTPException(status_code=400, detail=f"{settings.tenant_header} is not accepted: no tenants are configured")
+
+    tenant = tenant.strip().lower()
+    if not TENANT_ID.match(tenant):
+        raise HTTPException(status_code=400, detail="Invalid tenant ID")
+    if tenant not in settings.tenant_allowlist:
+        raise HTTPException(status_code=403, detail="Unknown tenant")
+    return tenant
+
+# tenant -> task creating its indexes (kept once done)
+_prepared: Dict[str, asyncio.Task] = {}
+
+async def prepare_tenant(tenant: Optional[str]):
+    """Create a tenant database's indexes once per process; concurrent first requests share the work"""
+    if tenant is None:
+        # The shared database is prepared at startup
+        return
+    task = _prepared.get(tenant)
+    if task is None:
+        task = asyncio.ensure_future(ensure_tenant_indexes(db.client[database_name(tenant)]))
+        _prepared[tenant] = task
+    try:
+        await asyncio.shield(task)
+    except Exception:
+        # Let the next request retry
+        if _prepared.get(tenant) is task:
+            del _prepared[tenant]
+        raise
+
+def tenant_label(tenant: Optional[str]) -> str:
+    """Metrics label of a tenant; only configured tenants get their own series"""
+    if tenant is None:
+        return DEFAULT_TENANT_LABEL
+    settings = get_settings()
+    if tenant in settings.tenant_allowlist or tenant in settings.tenant_tokens.values():
+        return tenant
+    return OTHER_TENANT_LABEL
+
+class TenantMiddleware:
+    """ASGI middleware routing each request to its tenant's database and recording per-tenant metrics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope['headers']}
+        try:
+            tenant = resolve_tenant(headers, tenant_required(scope['path']))
+        except HTTPException as exc:
+            response = JSONResponse({'detail': exc.detail}, status_code=exc.status_code)
+            await response(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        label = tenant_label(tenant)
+        token = current_tenant.set(tenant)
+        started = time.perf_counter()
+        try:
+            await prepare_tenant(tenant)
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_tenant.reset(token)
+            TENANT_REQUEST_LATENCY.labels(label).observe(time.perf_counter() - started)
+            TENANT_REQUESTS.labels(label, f"{status_code // 100}xx").inc()
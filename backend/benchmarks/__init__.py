@@ -0,0 +1 @@
+# Micro-benchmarks for the service layer and response serialization
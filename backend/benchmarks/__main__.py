@@ -0,0 +1,54 @@
+"""
+Run the service-layer micro-benchmarks.
+
+    python -m benchmarks                                # run and print
+    python -m benchmarks --output results.json          # save results
+    python -m benchmarks --baseline baseline.json       # fail on regressions
+"""
+import argparse
+import sys
+
+from benchmarks import cases  # noqa: F401  (registers benchmarks)
+from benchmarks.runner import compare, format_ns, load, run, save
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="CycleWeave service micro-benchmarks")
+    parser.add_argument("-k", "--filter", help="only run benchmarks whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=7, help="timed samples per benchmark (default: 7)")
+    parser.add_argument("--min-time", type=float, default=0.1, help="minimum seconds per sample (default: 0.1)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against a previously saved results file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown vs baseline (default: 0.10 = 10%%)")
+    parser.add_argument("--stat", choices=["median", "min"], default="median",
+                        help="statistic compared against the baseline; min is less sensitive to noisy machines")
+    args = parser.parse_args(argv)
+
+    def progress(name, result):
+        print(f"{name:<48} {format_ns(result['median_ns']):>12}/op  (+/- {format_ns(result['stdev_ns'])}, {result['loops']} loops)")
+
+    report = run(args.filter, repeat=args.repeat, min_time=args.min_time, progress=progress)
+
+    if args.output:
+        save(report, args.output)
+        print(f"\nSaved results to {args.output}")
+
+    if not args.baseline:
+        return 0
+
+    rows = compare(report, load(args.baseline), args.threshold, stat=f"{args.stat}_ns")
+    print(f"\nComparison of {args.stat} with {args.baseline} (threshold {args.threshold:.0%}):")
+    for row in rows:
+        if row['change'] is None:
+            print(f"  {row['name']:<48} new benchmark")
+            continue
+        flag = "REGRESSION" if row['regression'] else "ok"
+        print(f"  {row['name']:<48} {format_ns(row['baseline_ns']):>12} -> {format_ns(row['current_ns']):>12}  {row['change']:+.1%}  {flag}")
+
+    regressions = [row for row in rows if row['regression']]
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
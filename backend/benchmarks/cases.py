@@ -0,0 +1,116 @@
+import json
+from typing import List
+
+from benchmarks.fixtures import make_lca_documents, make_lca_records
+from benchmarks.runner import benchmark
+
+BATCH_SIZE = 1000
+
+@benchmark("calculations.calculate_emissions")
+def bench_calculate_emissions():
+    from app.services.calculations import calculate_emissions
+    record = make_lca_records(1)[0]
+    return lambda: calculate_emissions(record)
+
+@benchmark("calculations.calculate_circularity")
+def bench_calculate_circularity():
+    from app.services.calculations import calculate_circularity
+    record = make_lca_records(1)[0]
+    return lambda: calculate_circularity(record)
+
+@benchmark(f"calculations.calculate_emissions_batch[{BATCH_SIZE}]", ops=BATCH_SIZE)
+def bench_calculate_emissions_batch():
+    from app.services.calculations import calculate_emissions_batch
+    records = make_lca_records(BATCH_SIZE)
+    return lambda: calculate_emissions_batch(records)
+
+@benchmark(f"calculations.calculate_emissions[loop {BATCH_SIZE}]", ops=BATCH_SIZE)
+def bench_calculate_emissions_loop():
+    # Baseline for the batch: the scalar function called once per record
+    from app.services.calculations import calculate_emissions
+    records = make_lca_records(BATCH_SIZE)
+    return lambda: [calculate_emissions(record) for record in records]
+
+@benchmark(f"calculations.emission_components_batch[{BATCH_SIZE}]", ops=BATCH_SIZE)
+def bench_calculate_emission_components_batch():
+    from app.services.calculations import calculate_emission_components_batch
+    records = make_lca_records(BATCH_SIZE)
+    return lambda: calculate_emission_components_batch(records)
+
+@benchmark(f"calculations.calculate_circularity_batch[{BATCH_SIZE}]", ops=BATCH_SIZE)
+def bench_calculate_circularity_batch():
+    from app.services.calculations import calculate_circularity_batch
+    records = make_lca_records(BATCH_SIZE)
+    return lambda: calculate_circularity_batch(records)
+
+@benchmark(f"models.LCARecord.from_documents[{BATCH_SIZE}]", ops=BATCH_SIZE)
+def bench_record_from_documents():
+    # Cost of the conversion at the database boundary
+    from app.models.lca import LCARecord
+    docs = make_lca_documents(BATCH_SIZE)
+    return lambda: LCARecord.from_documents(docs)
+
+@benchmark("comparison.compare_assessments[500]", ops=500)
+def bench_compare_assessments():
+    from app.services.comparison import compare_assessments
+    records = make_lca_records(500)
+    return lambda: compare_assessments(records, 0)
+
+@benchmark("doctor.analyze_lca")
+def bench_analyze_lca():
+    from app.services.doctor_service import analyze_lca
+    record = make_lca_records(1)[0]
+    return lambda: analyze_lca(record)
+
+@benchmark("doctor.analyze_lca[fleet]")
+def bench_analyze_lca_fleet():
+    from app.services.doctor_service import analyze_lca
+    from app.services.fleet_benchmarks import METRICS, FleetBenchmark, metric_values
+    from app.services.tdigest import TDigest
+    records = make_lca_records(BATCH_SIZE)
+    digests = {metric: TDigest() for metric in METRICS}
+    for record in records:
+        for metric, value in metric_values(record).items():
+            digests[metric].add(value)
+    fleet = FleetBenchmark('*/*', len(records), digests)
+    return lambda: analyze_lca(records[0], fleet)
+
+@benchmark(f"fleet_benchmarks.record[{BATCH_SIZE}]", ops=BATCH_SIZE)
+def bench_fleet_record():
+    from app.services.fleet_benchmarks import FleetBenchmarks
+    records = make_lca_records(BATCH_SIZE)
+    return lambda: FleetBenchmarks().record(records)
+
+@benchmark(f"passport.generate_passport_id[{BATCH_SIZE}]", ops=BATCH_SIZE)
+def bench_generate_passport_id():
+    from app.services.passport_service import generate_passport_id
+    return lambda: [generate_passport_id() for _ in range(BATCH_SIZE)]
+
+@benchmark("passport.generate_qr_code")
+def bench_generate_qr_code():
+    from app.services.passport_service import generate_qr_code
+    return lambda: generate_qr_code("CW-01J9ZQ4T8M3R6XKQ0V5N2B7C1D")
+
+@benchmark("passport.create_passport_data")
+def bench_create_passport_data():
+    from app.services.passport_service import create_passport_data
+    record = make_lca_records(1)[0]
+    return lambda: create_passport_data(record)
+
+@benchmark("serialize.lca_list[100]", ops=100)
+def bench_serialize_lca_list():
+    # Mirrors what FastAPI does for `response_model=List[LCADataResponse]`:
+    # validate, dump in JSON mode by alias, then render with json.dumps
+    from pydantic import TypeAdapter
+    from app.models.lca import LCADataResponse
+
+    adapter = TypeAdapter(List[LCADataResponse])
+    docs = make_lca_documents(100)
+    for doc in docs:
+        doc['_id'] = str(doc['_id'])
+
+    def serialize():
+        content = adapter.dump_python(adapter.validate_python(docs), mode='json', by_alias=True)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+    return serialize
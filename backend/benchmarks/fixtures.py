@@ -0,0 +1,68 @@
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+METAL_TYPES = ['Aluminium', 'Steel', 'Copper', 'Zinc', 'Lead']
+MINING_METHODS = ['Open Pit', 'Underground', 'Heap Leach']
+FURNACE_TYPES = ['Electric Arc', 'Blast', 'Induction']
+TRANSPORT_MODES = ['Road', 'Rail', 'Sea', 'Multi']
+SCENARIO_TYPES = ['Current', 'Optimized', 'Baseline']
+
+def make_lca_input(rng: random.Random) -> dict:
+    """Random but valid LCADataCreate payload"""
+    coal = rng.uniform(0, 60)
+    hydro = rng.uniform(0, 100 - coal)
+    solar = rng.uniform(0, 100 - coal - hydro)
+    return {
+        'metalType': rng.choice(METAL_TYPES),
+        'oreGrade': round(rng.uniform(10, 100), 1),
+        'miningMethod': rng.choice(MINING_METHODS),
+        'waterUsage': round(rng.uniform(1, 50), 1),
+        'totalEnergyConsumption': round(rng.uniform(1000, 50000)),
+        'gridMix': {
+            'coal': round(coal, 1),
+            'hydro': round(hydro, 1),
+            'solar': round(solar, 1),
+            'naturalGas': round(100 - coal - hydro - solar, 1)
+        },
+        'processHeat': round(rng.uniform(1000, 20000)),
+        'furnaceType': rng.choice(FURNACE_TYPES),
+        'temperature': round(rng.uniform(500, 2000)),
+        'fluxUsage': round(rng.uniform(10, 100)),
+        'slagRecovery': round(rng.uniform(0, 100)),
+        'transportMode': rng.choice(TRANSPORT_MODES),
+        'inboundDistance': round(rng.uniform(10, 1000)),
+        'outboundDistance': round(rng.uniform(10, 1000)),
+        'vehicleEfficiency': round(rng.uniform(0.01, 1), 2),
+        'scrapInputRate': round(rng.uniform(0, 100)),
+        'recyclingEfficiency': round(rng.uniform(50, 100)),
+        'wasteRecovery': round(rng.uniform(0, 100)),
+        'closedLoopRate': round(rng.uniform(0, 100)),
+        'scenarioType': rng.choice(SCENARIO_TYPES)
+    }
+
+def make_lca_document(rng: random.Random) -> dict:
+    """LCA document as stored in lca_assessments (with derived fields)"""
+    from app.models.lca import LCARecord
+    from app.services.calculations import calculate_emissions, calculate_circularity
+
+    doc = make_lca_input(rng)
+    created = datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 500000))
+    doc['_id'] = ObjectId()
+    record = LCARecord.from_document(doc)
+    doc['co2Emission'] = calculate_emissions(record)
+    doc['circularityScore'] = calculate_circularity(record)
+    doc['createdAt'] = created
+    doc['updatedAt'] = created
+    return doc
+
+def make_lca_documents(count: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    return [make_lca_document(rng) for _ in range(count)]
+
+def make_lca_records(count: int, seed: int = 42) -> list:
+    """The same assessments as make_lca_documents, in service-layer form"""
+    from app.models.lca import LCARecord
+
+    return LCARecord.from_documents(make_lca_documents(count, seed))
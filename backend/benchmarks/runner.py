@@ -0,0 +1,122 @@
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+class Benchmark:
+    def __init__(self, name: str, setup: Callable[[], Callable[[], object]], ops: int = 1):
+        # setup() returns the zero-argument callable that is timed; `ops`
+        # is the number of logical operations per call (e.g. batch size)
+        self.name = name
+        self.setup = setup
+        self.ops = ops
+
+_registry: List[Benchmark] = []
+
+def benchmark(name: str, ops: int = 1):
+    """Register a benchmark; the decorated function is its setup"""
+    def decorator(setup):
+        _registry.append(Benchmark(name, setup, ops))
+        return setup
+    return decorator
+
+def registered(pattern: Optional[str] = None) -> List[Benchmark]:
+    return [b for b in _registry if not pattern or pattern in b.name]
+
+def _calibrate(func: Callable, min_time: float) -> int:
+    """Smallest power-of-ten loop count whose run takes at least min_time"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - started >= min_time or loops >= 10 ** 7:
+            return loops
+        loops *= 10
+
+def measure(bench: Benchmark, repeat: int, min_time: float) -> dict:
+    """Time a benchmark; results are nanoseconds per logical operation"""
+    func = bench.setup()
+    func()  # warm caches and lazy imports
+    loops = _calibrate(func, min_time)
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter_ns()
+            for _ in range(loops):
+                func()
+            samples.append((time.perf_counter_ns() - started) / (loops * bench.ops))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    return {
+        'median_ns': statistics.median(samples),
+        'min_ns': min(samples),
+        'mean_ns': statistics.fmean(samples),
+        'stdev_ns': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'loops': loops,
+        'repeat': repeat,
+        'ops_per_call': bench.ops
+    }
+
+def run(pattern: Optional[str] = None, repeat: int = 7, min_time: float = 0.1, progress=None) -> dict:
+    results = {}
+    for bench in registered(pattern):
+        results[bench.name] = measure(bench, repeat, min_time)
+        if progress:
+            progress(bench.name, results[bench.name])
+
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'repeat': repeat,
+            'min_time': min_time
+        },
+        'results': results
+    }
+
+def compare(current: dict, baseline: dict, threshold: float, stat: str = 'median_ns') -> List[dict]:
+    """Compare a statistic against a baseline; `threshold` is the allowed slowdown ratio"""
+    rows = []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            rows.append({'name': name, 'baseline_ns': None, 'current_ns': result[stat], 'change': None, 'regression': False})
+            continue
+        change = result[stat] / base[stat] - 1
+        rows.append({
+            'name': name,
+            'baseline_ns': base[stat],
+            'current_ns': result[stat],
+            'change': change,
+            'regression': change > threshold
+        })
+    return rows
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def save(report: dict, path: str):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def format_ns(value: float) -> str:
+    for unit, scale in (('s', 1e9), ('ms', 1e6), ('us', 1e3)):
+        if value >= scale:
+            return f"{value / scale:.2f} {unit}"
+    return f"{value:.0f} ns"
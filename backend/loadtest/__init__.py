@@ -0,0 +1 @@
+# End-to-end load-test harness for the CycleWeave API
@@ -0,0 +1,78 @@
+"""
+Replay frontend-like traffic against the real app across uvicorn worker counts.
+
+    python -m loadtest                                  # in-memory backend, 1/2/4 workers
+    python -m loadtest --backend sqlite
+    python -m loadtest --backend mongo --mongodb-url mongodb://localhost:27017
+    python -m loadtest --workers 4 --users 64 --duration 60 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from loadtest.runner import format_report, generate_load, run_server, summarize
+from loadtest.seed import SeedIndex, build_seed, load_into_mongo, write_seed
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="CycleWeave end-to-end load test")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "mongo"], default="memory",
+                        help="memory: in-process stand-in seeded per worker; sqlite: embedded store shared "
+                             "by all workers; mongo: a local mongod")
+    parser.add_argument("--mongodb-url", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="cycleweave_loadtest", help="database dropped and reseeded for --backend mongo")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated uvicorn worker counts")
+    parser.add_argument("--users", type=int, default=32, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before each run")
+    parser.add_argument("--lcas", type=int, default=500, help="seeded LCA assessments")
+    parser.add_argument("--passports", type=int, default=200, help="seeded passports")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    print(f"Building seed ({args.lcas} LCAs, {args.passports} passports)...")
+    seed = build_seed(args.lcas, args.passports)
+    index = SeedIndex(seed)
+
+    # All virtual users share one address, so per-client token buckets are off;
+    # route concurrency limits stay on and their 503s count as errors
+    env = {"JOB_WORKERS": "1", "DATABASE_NAME": args.database, "ADMISSION_CLIENT_RATE": "0"}
+    seed_file = None
+    if args.backend == "mongo":
+        env.update({"STORAGE_BACKEND": "mongo", "MONGODB_URL": args.mongodb_url})
+    else:
+        seed_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        seed_file.close()
+        write_seed(seed, seed_file.name)
+        env.update({"STORAGE_BACKEND": args.backend, "STORAGE_SEED_PATH": seed_file.name})
+
+    results = {}
+    try:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            # Fresh data for every run so earlier writes do not skew later ones
+            if args.backend == "mongo":
+                load_into_mongo(seed, args.mongodb_url, args.database)
+            elif args.backend == "sqlite":
+                env["STORAGE_PATH"] = tempfile.mkdtemp(prefix="cycleweave-loadtest-")
+
+            print(f"Running {args.users} users for {args.duration}s against {workers} worker(s)...")
+            with run_server(args.port, workers, env) as base_url:
+                recorder, elapsed = asyncio.run(generate_load(base_url, index, args.users, args.duration, args.warmup))
+            results[workers] = summarize(recorder, elapsed)
+    finally:
+        if seed_file:
+            os.unlink(seed_file.name)
+
+    print(format_report(results))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"backend": args.backend, "users": args.users, "results": results}, f, indent=2)
+        print(f"\nSaved report to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
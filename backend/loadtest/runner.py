@@ -0,0 +1,115 @@
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+import httpx
+
+from loadtest.scenarios import Recorder, TRAFFIC_MIX
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@contextmanager
+def run_server(port: int, workers: int, env: dict, startup_timeout: float = 60):
+    """Start `uvicorn app.main:app` with the given worker count and wait for /ready"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env}
+    )
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Server did not become ready in time")
+            time.sleep(0.2)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def _virtual_user(client, recorder: Recorder, seed, rng: random.Random, deadline: float, mix):
+    scenarios = [scenario for scenario, _ in mix]
+    weights = [weight for _, weight in mix]
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        scenario = rng.choices(scenarios, weights)[0]
+        await scenario(client, recorder, seed, rng)
+
+async def generate_load(base_url: str, seed, users: int, duration: float, warmup: float, mix=TRAFFIC_MIX, rng_seed: int = 1) -> tuple:
+    """Run `users` concurrent virtual users; returns (recorder, measured seconds)"""
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        if warmup > 0:
+            loop = asyncio.get_running_loop()
+            warm = Recorder()
+            await asyncio.gather(*[
+                _virtual_user(client, warm, seed, random.Random(rng_seed + 1000 + i), loop.time() + warmup, mix)
+                for i in range(users)
+            ])
+
+        recorder = Recorder()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*[
+            _virtual_user(client, recorder, seed, random.Random(rng_seed + i), started + duration, mix)
+            for i in range(users)
+        ])
+        return recorder, loop.time() - started
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    total = 0
+    for route, samples in sorted(recorder.samples.items()):
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, status in samples if status == 0 or status >= 500)
+        total += len(samples)
+        routes[route] = {
+            'requests': len(samples),
+            'errors': errors,
+            'rps': round(len(samples) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2)
+        }
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'requests': total,
+        'rps': round(total / elapsed, 1),
+        'routes': routes
+    }
+
+def format_report(results: dict) -> str:
+    lines = []
+    for workers, summary in results.items():
+        lines.append(f"\n== {workers} worker(s): {summary['requests']} requests, {summary['rps']} req/s ==")
+        lines.append(f"{'route':<46} {'reqs':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for route, stats in summary['routes'].items():
+            lines.append(
+                f"{route:<46} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8} "
+                f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}"
+            )
+    return '\n'.join(lines)
@@ -0,0 +1,76 @@
+"""
+Traffic patterns modelled on the frontend. Each scenario is a coroutine that
+issues one user interaction (possibly several requests) and records every
+request under its route template.
+"""
+import asyncio
+import random
+
+class Recorder:
+    def __init__(self):
+        # route -> list of (latency seconds, status code)
+        self.samples = {}
+
+    async def request(self, client, route: str, method: str, url: str, **kwargs):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except Exception:
+            response = None
+            status = 0
+        self.samples.setdefault(route, []).append((loop.time() - started, status))
+        return response
+
+async def simulate_burst(client, recorder: Recorder, seed, rng: random.Random):
+    """Dragging a slider on the Energy/Logistics tabs: a burst of simulate calls"""
+    lca_id = rng.choice(seed.lca_ids)
+    lca = seed.lcas[lca_id]
+    coal = lca['gridMix']['coal']
+    for _ in range(rng.randint(5, 15)):
+        coal = min(100, max(0, coal + rng.uniform(-5, 5)))
+        changes = {
+            'gridMix': {**lca['gridMix'], 'coal': round(coal, 1)},
+            'inboundDistance': rng.randint(10, 1000)
+        }
+        await recorder.request(client, "POST /api/lca/{id}/simulate", "POST", f"/api/lca/{lca_id}/simulate", json=changes)
+        await asyncio.sleep(rng.uniform(0.01, 0.05))
+
+async def doctor_session(client, recorder: Recorder, seed, rng: random.Random):
+    """Run the AI Doctor, then apply one of the suggested improvements"""
+    lca_id = rng.choice(seed.lca_ids)
+    await recorder.request(client, "POST /api/doctor/analyze", "POST", "/api/doctor/analyze", json={'lcaId': lca_id})
+    # Apply against a seeded analysis so the request works with any worker
+    # (the memory backend keeps a separate copy of the data per worker)
+    analysis_id, improvement_ids = rng.choice(seed.analyses)
+    await recorder.request(
+        client, "POST /api/doctor/{id}/apply/{improvement}", "POST",
+        f"/api/doctor/{analysis_id}/apply/{rng.choice(improvement_ids)}"
+    )
+
+async def generate_passport(client, recorder: Recorder, seed, rng: random.Random):
+    lca_id = rng.choice(seed.lca_ids)
+    await recorder.request(client, "POST /api/passport/", "POST", "/api/passport/", json={'lcaId': lca_id})
+
+async def scan_passport(client, recorder: Recorder, seed, rng: random.Random):
+    """A phone scanning a printed QR code; shipments make a few passports hot"""
+    hot = seed.passport_ids[:5]
+    passport_id = rng.choice(hot) if rng.random() < 0.8 else rng.choice(seed.passport_ids)
+    await recorder.request(client, "GET /api/passport/{passportId}", "GET", f"/api/passport/{passport_id}")
+    if rng.random() < 0.3:
+        await recorder.request(client, "GET /api/passport/{passportId}/full", "GET", f"/api/passport/{passport_id}/full")
+
+async def dashboard(client, recorder: Recorder, seed, rng: random.Random):
+    """Opening the app: list assessments and load one"""
+    await recorder.request(client, "GET /api/lca/", "GET", "/api/lca/", params={'limit': 20})
+    await recorder.request(client, "GET /api/lca/{id}", "GET", f"/api/lca/{rng.choice(seed.lca_ids)}")
+
+# (scenario, relative weight)
+TRAFFIC_MIX = [
+    (simulate_burst, 40),
+    (scan_passport, 30),
+    (dashboard, 15),
+    (doctor_session, 10),
+    (generate_passport, 5)
+]
@@ -0,0 +1,70 @@
+"""
+Deterministic dataset shared by the server (as a seed file or a Mongo
+database) and the load generator (which needs to know the IDs).
+"""
+import random
+from datetime import datetime
+
+from bson import ObjectId, json_util
+
+from benchmarks.fixtures import make_lca_document
+
+def build_seed(lca_count: int = 500, passport_count: int = 200, seed: int = 7) -> dict:
+    from app.models.lca import LCARecord
+    from app.services.doctor_service import analyze_lca
+    from app.services.passport_service import create_passport_data
+
+    rng = random.Random(seed)
+    lcas = [make_lca_document(rng) for _ in range(lca_count)]
+
+    analyses = []
+    for lca in lcas:
+        analysis = analyze_lca(LCARecord.from_document(lca))
+        analysis['_id'] = ObjectId()
+        analysis['lcaId'] = str(lca['_id'])
+        analysis['createdAt'] = lca['createdAt']
+        analyses.append(analysis)
+
+    passports = []
+    for lca in rng.sample(lcas, min(passport_count, lca_count)):
+        passport = create_passport_data(LCARecord.from_document(lca))
+        passport['_id'] = ObjectId()
+        passport['lcaId'] = str(lca['_id'])
+        passport['generatedAt'] = datetime.utcnow()
+        passports.append(passport)
+
+    return {
+        'lca_assessments': lcas,
+        'doctor_analyses': analyses,
+        'passports': passports
+    }
+
+def write_seed(seed: dict, path: str):
+    with open(path, 'w') as f:
+        f.write(json_util.dumps(seed))
+
+def load_into_mongo(seed: dict, mongodb_url: str, database_name: str):
+    """Replace the load-test database contents with the seed"""
+    from pymongo import MongoClient
+
+    client = MongoClient(mongodb_url)
+    try:
+        client.drop_database(database_name)
+        database = client[database_name]
+        for name, documents in seed.items():
+            if documents:
+                database[name].insert_many(documents)
+    finally:
+        client.close()
+
+class SeedIndex:
+    """IDs the traffic scenarios pick from"""
+
+    def __init__(self, seed: dict):
+        self.lca_ids = [str(doc['_id']) for doc in seed['lca_assessments']]
+        self.lcas = {str(doc['_id']): doc for doc in seed['lca_assessments']}
+        self.analyses = [
+            (str(doc['_id']), [imp['id'] for imp in doc['improvements']])
+            for doc in seed['doctor_analyses'] if doc['improvements']
+        ]
+        self.passport_ids = [doc['passportId'] for doc in seed['passports']]
@@ -0,0 +1,39 @@
+"""
+The suite runs on the in-process memory backend, so it needs no MongoDB:
+
+    pip install pytest
+    python -m pytest
+"""
+import os
+
+# Before anything imports the (cached) settings
+os.environ['STORAGE_BACKEND'] = 'memory'
+
+import httpx
+import pytest
+
+from app import tenancy
+from app.database import db
+from app.main import app
+from app.storage.memory import MemoryClient
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.fixture(autouse=True)
+def storage():
+    """An empty memory backend for every test"""
+    previous = db.client
+    db.client = MemoryClient()
+    tenancy._prepared.clear()
+    yield db.client
+    tenancy._prepared.clear()
+    db.client = previous
+
+@pytest.fixture
+async def client():
+    """HTTP client for the app, without a server"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, Request
+
+from app import admission
+from app.admission import AdmissionController, admit, client_key
+from app.config import get_settings
+
+pytestmark = pytest.mark.anyio
+
+ROUTE = "test.blocking"
+
+app = FastAPI()
+
+@app.get("/blocking", dependencies=[Depends(admit(ROUTE))])
+async def blocking(request: Request):
+    await request.app.state.release.wait()
+    return {'ok': True}
+
+@pytest.fixture
+def controller(monkeypatch):
+    """One slot, one queue place, a short queue timeout and no per-client rate limit"""
+    monkeypatch.setattr(get_settings(), 'admission_enabled', True)
+    app.state.release = asyncio.Event()
+    controller = AdmissionController(ROUTE, concurrency=1, queue=1, queue_timeout=0.2, rate=0, burst=1)
+    monkeypatch.setitem(admission._controllers, ROUTE, controller)
+    return controller
+
+async def wait_until(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("Condition not reached")
+
+async def test_full_queue_and_queue_timeout_answer_503_with_retry_after(controller):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        holder = asyncio.ensure_future(client.get("/blocking"))
+        await wait_until(lambda: controller.limiter.active == 1)
+
+        queued = asyncio.ensure_future(client.get("/blocking"))
+        await wait_until(lambda: controller.limiter.waiting == 1)
+
+        rejected = await client.get("/blocking")
+        assert rejected.status_code == 503
+        assert rejected.json()['detail'] == "Server busy (queue full); retry later"
+        assert int(rejected.headers['Retry-After']) >= 1
+
+        timed_out = await queued
+        assert timed_out.status_code == 503
+        assert timed_out.json()['detail'] == "Server busy (queue timeout); retry later"
+        assert int(timed_out.headers['Retry-After']) >= 1
+
+        app.state.release.set()
+        assert (await holder).status_code == 200
+
+    assert controller.limiter.shed == {'queue_full': 1, 'queue_timeout': 1}
+    assert controller.limiter.active == 0 and controller.limiter.waiting == 0
+
+async def test_released_slot_goes_to_the_oldest_waiter(controller):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        holder = asyncio.ensure_future(client.get("/blocking"))
+        await wait_until(lambda: controller.limiter.active == 1)
+        queued = asyncio.ensure_future(client.get("/blocking"))
+        await wait_until(lambda: controller.limiter.waiting == 1)
+
+        app.state.release.set()
+        assert (await holder).status_code == 200
+        assert (await queued).status_code == 200
+
+    assert controller.limiter.admitted == 2
+
+def request_from(peer: str, *forwarded: str) -> Request:
+    headers = [(b'x-forwarded-for', value.encode()) for value in forwarded]
+    return Request({'type': 'http', 'headers': headers, 'client': (peer, 1234)})
+
+def test_client_key_ignores_client_supplied_forwarded_entries(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'admission_client_header', 'X-Forwarded-For')
+    monkeypatch.setattr(get_settings(), 'admission_trusted_proxies', 1)
+
+    # The proxy appended 203.0.113.7; the entries before it are forged
+    assert client_key(request_from("10.0.0.2", "1.2.3.4, 5.6.7.8, 203.0.113.7")) == "203.0.113.7"
+    assert client_key(request_from("10.0.0.2", "9.9.9.9, 203.0.113.7")) == "203.0.113.7"
+    # Repeated headers count as one list
+    assert client_key(request_from("10.0.0.2", "1.2.3.4", "203.0.113.7")) == "203.0.113.7"
+    assert client_key(request_from("10.0.0.2")) == "10.0.0.2"
+
+def test_client_key_counts_trusted_hops_from_the_right(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'admission_client_header', 'X-Forwarded-For')
+    monkeypatch.setattr(get_settings(), 'admission_trusted_proxies', 2)
+
+    # CDN appended the client, the load balancer appended the CDN
+    assert client_key(request_from("10.0.0.2", "1.2.3.4, 203.0.113.7, 198.51.100.1")) == "203.0.113.7"
+    # Fewer entries than trusted hops: the request did not come through them
+    assert client_key(request_from("10.0.0.2", "203.0.113.7")) == "10.0.0.2"
+
+def test_client_key_without_a_header_is_the_peer(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'admission_client_header', None)
+
+    assert client_key(request_from("10.0.0.2", "1.2.3.4")) == "10.0.0.2"
+
+async def test_forged_forwarded_entries_share_one_rate_limit_bucket(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'admission_enabled', True)
+    monkeypatch.setattr(get_settings(), 'admission_client_header', 'X-Forwarded-For')
+    monkeypatch.setattr(get_settings(), 'admission_trusted_proxies', 1)
+    limited = AdmissionController("test.limited", concurrency=4, queue=4, queue_timeout=1, rate=0.001, burst=2)
+    monkeypatch.setitem(admission._controllers, "test.limited", limited)
+
+    limited_app = FastAPI()
+
+    @limited_app.get("/limited", dependencies=[Depends(admit("test.limited"))])
+    async def limited_route():
+        return {'ok': True}
+
+    transport = httpx.ASGITransport(app=limited_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [
+            (await client.get("/limited", headers={'X-Forwarded-For': f"10.1.0.{index}, 203.0.113.7"})).status_code
+            for index in range(4)
+        ]
+
+    assert statuses == [200, 200, 429, 429]
+    assert limited.clients.tracked == 1
@@ -0,0 +1,24 @@
+import pytest
+
+from benchmarks.fixtures import make_lca_records
+
+from app.services.calculations import (
+    calculate_emission_components_batch, calculate_emissions, calculate_emissions_batch, emission_components
+)
+
+def test_batch_and_components_match_the_scalar_calculation():
+    records = make_lca_records(2000)
+    scalar = [calculate_emissions(record) for record in records]
+
+    assert calculate_emissions_batch(records) == scalar
+    components = calculate_emission_components_batch(records)
+    assert components['total'] == scalar
+
+    for index, record in enumerate(records[:50]):
+        energy, transport, process, net = emission_components(record)
+        gross = components['energy'][index] + components['transport'][index] + components['process'][index]
+        assert (energy, transport, process) == (
+            components['energy'][index], components['transport'][index], components['process'][index]
+        )
+        assert gross + components['recycledCredit'][index] == pytest.approx(net)
+        assert components['recycledCredit'][index] <= 0
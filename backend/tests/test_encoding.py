@@ -0,0 +1,90 @@
+import gzip
+import json
+
+import brotli
+import msgpack
+import pytest
+
+from benchmarks.fixtures import make_lca_documents
+
+from app.compression import choose_encoding
+from app.database import get_database
+
+pytestmark = pytest.mark.anyio
+
+COUNT = 40
+
+@pytest.fixture
+async def assessments():
+    await get_database().lca_assessments.insert_many(make_lca_documents(COUNT))
+
+async def list_json(client) -> list:
+    response = await client.get("/api/lca/", headers={'Accept-Encoding': 'identity'})
+    assert 'content-encoding' not in response.headers
+    return response.json()
+
+async def test_msgpack_rows_match_the_json_rows(client, assessments):
+    response = await client.get("/api/lca/", headers={'Accept': 'application/msgpack'})
+
+    assert response.headers['content-type'] == 'application/msgpack'
+    assert 'Accept' in response.headers['vary']
+    assert msgpack.unpackb(response.content) == await list_json(client)
+
+async def test_columnar_layout_holds_the_same_values(client, assessments):
+    rows = await list_json(client)
+    response = await client.get("/api/lca/", params={'layout': 'columnar'}, headers={'Accept': 'application/msgpack'})
+
+    columnar = msgpack.unpackb(response.content)
+    assert columnar['count'] == COUNT
+    columns = columnar['columns']
+    assert columns['_id'] == [row['_id'] for row in rows]
+    assert columns['gridMix.coal'] == [row['gridMix']['coal'] for row in rows]
+    assert columns['co2Emission'] == [row['co2Emission'] for row in rows]
+
+@pytest.mark.parametrize('accept', ['application/json', 'application/json, application/msgpack;q=0.5', 'application/msgpack;q=0'])
+async def test_json_is_kept_unless_msgpack_ranks_at_least_as_high(client, assessments, accept):
+    response = await client.get("/api/lca/", headers={'Accept': accept})
+    assert response.headers['content-type'] == 'application/json'
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('*', 'br'),
+    ('*, br;q=0', 'gzip'),
+    ('identity', None),
+    ('gzip;q=0', None)
+])
+def test_choose_encoding_honours_q_values(accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+@pytest.mark.parametrize('encoding, decompress', [('gzip', gzip.decompress), ('br', brotli.decompress)])
+async def test_large_responses_are_compressed(client, assessments, encoding, decompress):
+    expected = await list_json(client)
+
+    async with client.stream("GET", "/api/lca/", headers={'Accept-Encoding': encoding}) as response:
+        raw = b''.join([chunk async for chunk in response.aiter_raw()])
+
+    assert response.headers['content-encoding'] == encoding
+    assert 'Accept-Encoding' in response.headers['vary']
+    assert int(response.headers['content-length']) == len(raw)
+    assert json.loads(decompress(raw)) == expected
+
+async def test_small_responses_and_304s_are_not_compressed(client, assessments):
+    lca = (await list_json(client))[0]
+    url = f"/api/lca/{lca['_id']}"
+
+    small = await client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in small.headers
+    not_modified = await client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': small.headers['etag']})
+    assert not_modified.status_code == 304
+    assert 'content-encoding' not in not_modified.headers
+
+async def test_exports_are_compressed_as_they_stream_except_parquet(client, assessments):
+    async with client.stream("GET", "/api/lca/export", params={'format': 'ndjson', 'batch_size': 100}, headers={'Accept-Encoding': 'gzip'}) as response:
+        raw = b''.join([chunk async for chunk in response.aiter_raw()])
+    assert response.headers['content-encoding'] == 'gzip'
+    assert len(gzip.decompress(raw).splitlines()) == COUNT
+
+    parquet = await client.get("/api/lca/export", params={'format': 'parquet'}, headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in parquet.headers
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+
+from app.database import get_database, tenant_scope
+from app.models.lca import LCARecord
+from app.services.fleet_benchmarks import FleetBenchmarks
+
+pytestmark = pytest.mark.anyio
+
+def records(count: int, metal_type: str = 'Copper') -> list:
+    return [
+        LCARecord.from_document({
+            'metalType': metal_type,
+            'furnaceType': 'Flash',
+            'totalEnergyConsumption': 1000 + 10 * index,
+            'scrapInputRate': index % 50,
+            'gridMix': {'coal': 50, 'hydro': 30, 'solar': 10, 'naturalGas': 10},
+            'createdAt': datetime(2024, 1, 1)
+        })
+        for index in range(count)
+    ]
+
+async def stored_counts() -> dict:
+    return {
+        doc['_id']: doc['count']
+        async for doc in get_database().fleet_benchmarks.find({"_id": {"$ne": "_rebuild"}})
+    }
+
+async def test_failed_flush_keeps_the_samples_for_the_next_one(monkeypatch):
+    fleet = FleetBenchmarks()
+    fleet.record(records(3))
+    with tenant_scope("acme"):
+        fleet.record(records(2, 'Zinc'))
+
+    merge_group = fleet._merge_group
+    calls = 0
+
+    async def flaky(key, samples, control):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise ConnectionError("database unreachable")
+        return await merge_group(key, samples, control)
+
+    monkeypatch.setattr(fleet, '_merge_group', flaky)
+    with pytest.raises(ConnectionError):
+        await fleet.flush()
+    assert await stored_counts() == {'Copper/Flash': 3}
+
+    # Recorded while the database was down
+    fleet.record(records(1))
+    await fleet.flush()
+
+    assert await stored_counts() == {'Copper/Flash': 4, 'Copper/*': 4, '*/*': 4}
+    with tenant_scope("acme"):
+        assert await stored_counts() == {'Zinc/Flash': 2, 'Zinc/*': 2, '*/*': 2}
+    assert fleet._pending == {}
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import get_database
+from app.http_cache import http_date
+from tests.test_passports import ASSESSMENT, create_passport
+
+pytestmark = pytest.mark.anyio
+
+async def create_assessment(client) -> dict:
+    response = await client.post("/api/lca/", json=ASSESSMENT)
+    assert response.status_code == 201
+    return response.json()
+
+async def test_matching_etag_answers_304_until_the_assessment_changes(client):
+    lca = await create_assessment(client)
+    url = f"/api/lca/{lca['_id']}"
+
+    first = await client.get(url)
+    etag = first.headers['etag']
+    assert first.status_code == 200
+    assert first.headers['cache-control'] == 'no-cache'
+
+    cached = await client.get(url, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.content == b''
+    assert cached.headers['etag'] == etag
+
+    assert (await client.put(url, json={'oreGrade': 50})).status_code == 200
+    changed = await client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+    assert changed.json()['oreGrade'] == 50
+
+@pytest.mark.parametrize('header', ['"{opaque}"', 'W/"other", W/"{opaque}"', '*'])
+async def test_if_none_match_uses_weak_comparison_and_lists(client, header):
+    lca = await create_assessment(client)
+    url = f"/api/lca/{lca['_id']}"
+    opaque = (await client.get(url)).headers['etag'].removeprefix('W/').strip('"')
+
+    response = await client.get(url, headers={'If-None-Match': header.format(opaque=opaque)})
+    assert response.status_code == 304
+
+async def test_if_modified_since_answers_304_for_unchanged_assessments(client):
+    lca = await create_assessment(client)
+    url = f"/api/lca/{lca['_id']}"
+    last_modified = (await client.get(url)).headers['last-modified']
+
+    assert (await client.get(url, headers={'If-Modified-Since': last_modified})).status_code == 304
+    earlier = http_date(datetime.utcnow() - timedelta(days=1))
+    assert (await client.get(url, headers={'If-Modified-Since': earlier})).status_code == 200
+
+async def test_if_none_match_takes_precedence_over_if_modified_since(client):
+    lca = await create_assessment(client)
+    url = f"/api/lca/{lca['_id']}"
+    last_modified = (await client.get(url)).headers['last-modified']
+
+    response = await client.get(url, headers={'If-None-Match': 'W/"stale"', 'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+
+async def test_passports_are_immutable_unless_the_lca_is_embedded(client):
+    passport = await create_passport(client)
+    url = f"/api/passport/{passport['passportId']}"
+
+    plain = await client.get(url)
+    assert plain.headers['cache-control'].endswith('immutable')
+    assert (await client.get(url, headers={'If-None-Match': plain.headers['etag']})).status_code == 304
+
+    expanded = await client.get(url, params={'expand': 'lca'})
+    assert expanded.headers['cache-control'] == 'no-cache'
+    etag = expanded.headers['etag']
+    assert etag != plain.headers['etag']
+    assert (await client.get(url, params={'expand': 'lca'}, headers={'If-None-Match': etag})).status_code == 304
+
+    # Changing the embedded LCA changes the expanded passport's ETag only
+    assert (await client.put(f"/api/lca/{passport['lcaId']}", json={'oreGrade': 50})).status_code == 200
+    assert (await client.get(url, params={'expand': 'lca'}, headers={'If-None-Match': etag})).status_code == 200
+    assert (await client.get(url, headers={'If-None-Match': plain.headers['etag']})).status_code == 304
+
+async def test_missing_documents_are_404_even_with_validators(client):
+    await get_database().lca_assessments.delete_many({})
+    response = await client.get("/api/lca/0123456789abcdef01234567", headers={'If-None-Match': '*'})
+    assert response.status_code == 404
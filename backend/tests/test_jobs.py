@@ -0,0 +1,205 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.database import get_shared_database
+from app.services.job_service import (
+    JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobWorkerPool, claim_job, enqueue_job, register_job_handler, requeue_expired_leases
+)
+from tests.test_passports import create_passport
+
+pytestmark = pytest.mark.anyio
+
+async def noop(payload: dict) -> dict:
+    return {}
+
+register_job_handler("test.noop", noop)
+
+async def expire_lease(job_id):
+    await get_shared_database().jobs.update_one(
+        {"_id": ObjectId(job_id)},
+        {"$set": {"leaseExpiresAt": datetime.utcnow() - timedelta(seconds=1)}}
+    )
+
+async def test_live_lease_is_left_alone():
+    await enqueue_job("test.noop", {})
+    assert await claim_job("worker-a", lease_seconds=30) is not None
+
+    assert await requeue_expired_leases() == 0
+    assert await claim_job("worker-b", lease_seconds=30) is None
+
+async def test_expired_lease_is_requeued_and_reclaimed():
+    job_id = await enqueue_job("test.noop", {})
+    first = await claim_job("worker-a", lease_seconds=30)
+    assert str(first['_id']) == job_id
+    assert first['status'] == JOB_RUNNING and first['workerId'] == "worker-a" and first['attempts'] == 1
+
+    await expire_lease(job_id)
+    assert await requeue_expired_leases() == 1
+
+    requeued = await get_shared_database().jobs.find_one({"_id": first['_id']})
+    assert requeued['status'] == JOB_QUEUED and requeued['workerId'] is None
+
+    second = await claim_job("worker-b", lease_seconds=30)
+    assert second['_id'] == first['_id']
+    assert second['workerId'] == "worker-b" and second['attempts'] == 2
+
+async def test_worker_abandons_a_job_whose_lease_was_lost():
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def slow(payload: dict) -> dict:
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return {}
+
+    register_job_handler("test.slow", slow)
+    job_id = await enqueue_job("test.slow", {})
+
+    pool = JobWorkerPool(concurrency=1, lease_seconds=0.3, poll_interval=0.05)
+    await pool.start()
+    try:
+        await asyncio.wait_for(started.wait(), 2)
+        # The reaper handed the job to another worker
+        await get_shared_database().jobs.update_one({"_id": ObjectId(job_id)}, {"$set": {"workerId": "worker-b"}})
+        await asyncio.wait_for(cancelled.wait(), 2)
+    finally:
+        await pool.stop()
+
+    job = await get_shared_database().jobs.find_one({"_id": ObjectId(job_id)})
+    assert job['status'] == JOB_RUNNING and job['workerId'] == "worker-b"
+
+async def test_sibling_worker_reclaims_an_expired_lease():
+    calls, first_cancelled = [], asyncio.Event()
+
+    async def stuck_once(payload: dict) -> dict:
+        calls.append(payload)
+        if len(calls) > 1:
+            return {'attempt': len(calls)}
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            first_cancelled.set()
+            raise
+
+    register_job_handler("test.stuck_once", stuck_once)
+    job_id = await enqueue_job("test.stuck_once", {})
+    jobs = get_shared_database().jobs
+
+    pool = JobWorkerPool(concurrency=2, lease_seconds=0.3, poll_interval=0.05)
+    await pool.start()
+    try:
+        first = None
+        for _ in range(100):
+            first = await jobs.find_one({"_id": ObjectId(job_id), "status": JOB_RUNNING})
+            if first is not None and calls:
+                break
+            await asyncio.sleep(0.01)
+
+        # The first worker stalls past its lease; the reaper hands the job out again
+        await expire_lease(job_id)
+        assert await requeue_expired_leases() == 1
+
+        await asyncio.wait_for(first_cancelled.wait(), 2)
+        for _ in range(100):
+            job = await jobs.find_one({"_id": ObjectId(job_id)})
+            if job['status'] == JOB_SUCCEEDED:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await pool.stop()
+
+    assert job['status'] == JOB_SUCCEEDED and job['result'] == {'attempt': 2} and job['attempts'] == 2
+    assert job['workerId'] != first['workerId']
+    assert {job['workerId'], first['workerId']} == {f"{pool.worker_id}-0", f"{pool.worker_id}-1"}
+
+async def wait_for_job(job_id: str, condition) -> dict:
+    for _ in range(200):
+        job = await get_shared_database().jobs.find_one({"_id": ObjectId(job_id)})
+        if condition(job):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} stayed {job['status']}")
+
+async def test_jobs_are_claimed_by_priority_then_age():
+    low = await enqueue_job("test.noop", {}, priority=0)
+    high = await enqueue_job("test.noop", {}, priority=5)
+    later = await enqueue_job("test.noop", {}, priority=5)
+    scheduled = await enqueue_job("test.noop", {}, priority=9)
+    await get_shared_database().jobs.update_one(
+        {"_id": ObjectId(scheduled)}, {"$set": {"runAt": datetime.utcnow() + timedelta(minutes=5)}}
+    )
+
+    claimed = [str((await claim_job("worker-a", lease_seconds=30))['_id']) for _ in range(3)]
+    assert claimed == [high, later, low]
+    # Not due yet
+    assert await claim_job("worker-a", lease_seconds=30) is None
+
+async def test_failures_are_retried_with_backoff_unless_they_are_client_errors():
+    async def flaky(payload: dict) -> dict:
+        raise RuntimeError("database unavailable")
+
+    async def missing(payload: dict) -> dict:
+        raise HTTPException(status_code=404, detail="LCA assessment not found")
+
+    register_job_handler("test.flaky", flaky)
+    register_job_handler("test.missing", missing)
+    flaky_id = await enqueue_job("test.flaky", {})
+    missing_id = await enqueue_job("test.missing", {})
+
+    pool = JobWorkerPool(concurrency=1, lease_seconds=30, poll_interval=0.05)
+    await pool.start()
+    try:
+        retried = await wait_for_job(flaky_id, lambda job: job['status'] == JOB_QUEUED and job['attempts'] == 1)
+        failed = await wait_for_job(missing_id, lambda job: job['status'] == JOB_FAILED)
+    finally:
+        await pool.stop()
+
+    assert retried['error'] == "RuntimeError: database unavailable"
+    assert retried['runAt'] > datetime.utcnow() and retried['workerId'] is None
+    assert failed['attempts'] == 1 and failed['error'] == "LCA assessment not found"
+
+async def test_job_that_kept_losing_its_lease_fails_after_max_attempts():
+    job_id = await enqueue_job("test.noop", {}, max_attempts=2)
+    for _ in range(2):
+        await claim_job("worker-a", lease_seconds=30)
+        await expire_lease(job_id)
+        await requeue_expired_leases()
+
+    pool = JobWorkerPool(concurrency=1, lease_seconds=30, poll_interval=0.05)
+    await pool.start()
+    try:
+        job = await wait_for_job(job_id, lambda job: job['status'] in (JOB_FAILED, JOB_SUCCEEDED))
+    finally:
+        await pool.stop()
+
+    assert job['status'] == JOB_FAILED and job['attempts'] == 3
+    assert job['error'] == "Exceeded maximum attempts"
+
+async def test_background_passport_is_served_from_the_job_result(client):
+    lca = await create_passport(client)
+    response = await client.post("/api/passport/", params={'background': 'true'}, json={'lcaId': lca['lcaId']})
+    assert response.status_code == 202
+    job_id = response.json()['jobId']
+
+    pending = await client.get(f"/api/jobs/{job_id}/result")
+    assert pending.status_code == 202 and pending.headers['location'] == f"/api/jobs/{job_id}"
+
+    pool = JobWorkerPool(concurrency=1, lease_seconds=30, poll_interval=0.05)
+    await pool.start()
+    try:
+        await wait_for_job(job_id, lambda job: job['status'] == JOB_SUCCEEDED)
+    finally:
+        await pool.stop()
+
+    status = (await client.get(f"/api/jobs/{job_id}")).json()
+    assert status['status'] == JOB_SUCCEEDED and status['resultUrl'] == f"/api/jobs/{job_id}/result"
+    passport = (await client.get(f"/api/jobs/{job_id}/result")).json()
+    assert passport['lcaId'] == lca['lcaId'] and passport['passportId'] != lca['passportId']
+    assert (await client.get(f"/api/passport/{passport['passportId']}")).status_code == 200
@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.fixtures import make_lca_documents
+
+from app.database import get_database
+from app.services.lca_io import DERIVED_COLUMNS, EXPORT_COLUMNS, flatten_assessment
+
+pytestmark = pytest.mark.anyio
+
+# More than two export batches of the minimum size
+COUNT = 250
+BATCH_SIZE = 100
+
+@pytest.fixture
+async def assessments():
+    docs = make_lca_documents(COUNT)
+    await get_database().lca_assessments.insert_many([dict(doc) for doc in docs])
+    return sorted(docs, key=lambda doc: doc['createdAt'])
+
+def expected_rows(docs: list, columns: list = EXPORT_COLUMNS) -> list:
+    return [flatten_assessment(doc, columns) for doc in docs]
+
+async def export(client, **params) -> bytes:
+    response = await client.get("/api/lca/export", params={'batch_size': BATCH_SIZE, **params})
+    assert response.status_code == 200
+    return response.content
+
+async def test_csv_export_round_trips(client, assessments):
+    reader = csv.reader(io.StringIO((await export(client, format='csv')).decode()))
+    assert next(reader) == EXPORT_COLUMNS
+    rows = list(reader)
+
+    assert len(rows) == COUNT
+    for row, expected in zip(rows, expected_rows(assessments)):
+        for column, value, original in zip(EXPORT_COLUMNS, row, expected):
+            if column in ('createdAt', 'updatedAt'):
+                assert value == original.isoformat()
+            elif isinstance(original, str):
+                assert value == original
+            else:
+                assert float(value) == original
+
+async def test_ndjson_export_round_trips(client, assessments):
+    lines = (await export(client, format='ndjson')).decode().splitlines()
+
+    assert len(lines) == COUNT
+    for line, doc in zip(lines, assessments):
+        exported = json.loads(line)
+        assert list(exported) == EXPORT_COLUMNS
+        assert exported['_id'] == str(doc['_id'])
+        assert exported['gridMix.coal'] == doc['gridMix']['coal']
+        assert exported['co2Emission'] == doc['co2Emission']
+        assert exported['createdAt'] == doc['createdAt'].isoformat()
+
+async def test_parquet_export_round_trips_with_one_row_group_per_batch(client, assessments):
+    parquet = pq.ParquetFile(io.BytesIO(await export(client, format='parquet')))
+
+    assert parquet.metadata.num_rows == COUNT
+    assert parquet.metadata.num_row_groups == -(-COUNT // BATCH_SIZE)
+    table = parquet.read().to_pylist()
+    assert [list(row.values()) for row in table] == expected_rows(assessments)
+
+async def test_export_applies_column_selection_and_filters(client, assessments):
+    columns = ['metalType', 'gridMix.solar', 'co2Emission']
+    lines = (await export(client, format='ndjson', columns=','.join(columns), metalType='Copper')).decode().splitlines()
+
+    copper = [doc for doc in assessments if doc['metalType'] == 'Copper']
+    assert [list(json.loads(line).values()) for line in lines] == expected_rows(copper, columns)
+
+async def test_export_rejects_unknown_columns(client):
+    response = await client.get("/api/lca/export", params={'columns': 'metalType,password'})
+    assert response.status_code == 400
+
+def input_fields(doc: dict) -> tuple:
+    return tuple(doc[column] for column in EXPORT_COLUMNS if column in doc and column not in DERIVED_COLUMNS) + (
+        tuple(sorted(doc['gridMix'].items())),
+        doc['co2Emission'],
+        doc['circularityScore']
+    )
+
+async def chunked(data: bytes, size: int = 97):
+    # Chunk boundaries fall inside rows, fields and escaped quotes
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+@pytest.mark.parametrize('fmt, content_type', [('csv', 'text/csv'), ('ndjson', 'application/x-ndjson')])
+async def test_export_imports_back_unchanged(client, assessments, fmt, content_type):
+    exported = await export(client, format=fmt)
+    await get_database().lca_assessments.delete_many({})
+
+    response = await client.post(
+        "/api/lca/import",
+        params={'chunk_size': 64},
+        content=chunked(exported),
+        headers={'Content-Type': content_type}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {'received': COUNT, 'inserted': COUNT, 'failed': 0, 'errors': [], 'errorsTruncated': False}
+    imported = await get_database().lca_assessments.find().to_list(None)
+    assert sorted(map(input_fields, imported)) == sorted(map(input_fields, assessments))
+
+async def test_import_reports_invalid_rows_and_keeps_the_rest(client):
+    valid = flatten_assessment(make_lca_documents(1)[0], EXPORT_COLUMNS)
+    quoted = list(valid)
+    # A quoted field spanning lines (here the ignored _id) is still one row
+    quoted[0] = 'imported\n"elsewhere"'
+    invalid = list(valid)
+    invalid[EXPORT_COLUMNS.index('oreGrade')] = 'rich'
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in (valid, quoted, invalid, valid[:3]):
+        writer.writerow(row)
+
+    response = await client.post("/api/lca/import", content=chunked(buffer.getvalue().encode(), 7), headers={'Content-Type': 'text/csv'})
+
+    result = response.json()
+    assert (result['received'], result['inserted'], result['failed']) == (4, 2, 2)
+    assert [error['row'] for error in result['errors']] == [3, 4]
+    assert result['errors'][0]['errors'][0].startswith('oreGrade:')
+    assert result['errors'][1]['errors'] == [f"Expected {len(EXPORT_COLUMNS)} columns, got 3"]
+    assert await get_database().lca_assessments.count_documents({}) == 2
+
+async def test_import_needs_a_known_format(client):
+    response = await client.post("/api/lca/import", content=b'<xml/>', headers={'Content-Type': 'application/xml'})
+    assert response.status_code == 415
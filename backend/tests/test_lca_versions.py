@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+from app.config import get_settings
+from app.database import get_database
+from app.services.lca_versions import get_version, is_snapshot_version, update_versioned
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(autouse=True)
+def snapshot_interval(monkeypatch):
+    # Snapshots at versions 1, 4 and 7
+    monkeypatch.setattr(get_settings(), 'lca_snapshot_interval', 3)
+
+async def create_assessment() -> dict:
+    doc = {
+        'metalType': 'Aluminium',
+        'furnaceType': 'Electric Arc',
+        'totalEnergyConsumption': 1200,
+        'scrapInputRate': 10,
+        'gridMix': {'coal': 40, 'hydro': 30, 'solar': 10, 'naturalGas': 20},
+        'createdAt': datetime(2024, 1, 1),
+        'updatedAt': datetime(2024, 1, 1)
+    }
+    result = await get_database().lca_assessments.insert_one(doc)
+    return await get_database().lca_assessments.find_one({"_id": result.inserted_id})
+
+async def apply_updates(lca: dict, count: int) -> list:
+    """Update the assessment `count` times; returns its state at every version"""
+    states = [lca]
+    for step in range(count):
+        changes = {'scrapInputRate': 20 + step}
+        if step % 2:
+            changes['gridMix'] = {'coal': 40 - step, 'hydro': 30 + step, 'solar': 10, 'naturalGas': 20}
+        states.append(await update_versioned(str(lca['_id']), lambda current: changes))
+    return states
+
+async def test_get_version_replays_deltas_across_snapshots():
+    lca = await create_assessment()
+    states = await apply_updates(lca, 7)
+    current = states[-1]
+    assert current['version'] == 8
+
+    for version, expected in enumerate(states, start=1):
+        replayed = await get_version(current, version)
+        assert replayed == {**expected, 'version': version}
+
+    kinds = {
+        entry['version']: entry['kind']
+        async for entry in get_database().lca_versions.find({"lcaId": str(lca['_id'])})
+    }
+    assert kinds == {version: 'snapshot' if is_snapshot_version(version) else 'delta' for version in range(1, 9)}
+    assert [version for version, kind in sorted(kinds.items()) if kind == 'snapshot'] == [1, 4, 7]
+
+async def test_get_version_outside_the_history_is_none():
+    lca = await create_assessment()
+    current = (await apply_updates(lca, 2))[-1]
+
+    assert await get_version(current, 0) is None
+    assert await get_version(current, current['version'] + 1) is None
+
+async def test_get_version_refuses_to_skip_a_missing_delta():
+    lca = await create_assessment()
+    current = (await apply_updates(lca, 7))[-1]
+    await get_database().lca_versions.delete_one({"lcaId": str(lca['_id']), "version": 5})
+
+    assert (await get_version(current, 4))['version'] == 4
+    with pytest.raises(RuntimeError, match="Version 5"):
+        await get_version(current, 6)
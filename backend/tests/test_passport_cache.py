@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+
+from app.config import get_settings
+from app.services import passport_lookup
+from app.services.passport_lookup import PassportCache, passport_cache
+from tests.test_passports import create_passport
+
+pytestmark = pytest.mark.anyio
+
+KEY = PassportCache.key('CW-HOT', [])
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'passport_cache_ttl_seconds', 10.0)
+    monkeypatch.setattr(get_settings(), 'passport_cache_max_entries', 3)
+    return PassportCache()
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(passport_lookup.time, 'monotonic', lambda: now[0])
+    return now
+
+class Loader:
+    """A passport read that can be held open, counting its calls"""
+
+    def __init__(self, passport_id: str = 'CW-HOT', lca_id: str = 'lca-1'):
+        self.passport = {'_id': passport_id, 'passportId': passport_id, 'lcaId': lca_id}
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return dict(self.passport)
+
+async def started(tasks):
+    # Let every task reach its await
+    for _ in range(3):
+        await asyncio.sleep(0)
+    return tasks
+
+async def test_concurrent_misses_share_one_read(cache):
+    loader = Loader()
+    loader.release.clear()
+
+    tasks = await started([asyncio.ensure_future(cache.load(KEY, loader)) for _ in range(20)])
+    loader.release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert loader.calls == 1
+    assert all(result == loader.passport for result in results)
+    # Each caller gets its own copy
+    results[0]['passportId'] = 'changed'
+    assert results[1]['passportId'] == 'CW-HOT'
+    stats = cache.stats()
+    assert (stats['misses'], stats['coalesced'], stats['entries']) == (1, 19, 1)
+
+async def test_hits_are_private_copies_until_the_ttl(cache, clock):
+    loader = Loader()
+    await cache.load(KEY, loader)
+
+    hit = cache.get(KEY)
+    hit['lcaId'] = 'changed'
+    assert cache.get(KEY)['lcaId'] == 'lca-1'
+    assert cache.stats()['hits'] == 2
+
+    clock[0] += 10
+    assert cache.get(KEY) is None
+    assert cache.stats()['entries'] == 0
+
+async def test_zero_ttl_coalesces_without_caching(cache, monkeypatch):
+    monkeypatch.setattr(get_settings(), 'passport_cache_ttl_seconds', 0)
+    loader = Loader()
+    loader.release.clear()
+
+    tasks = await started([asyncio.ensure_future(cache.load(KEY, loader)) for _ in range(5)])
+    loader.release.set()
+    await asyncio.gather(*tasks)
+
+    assert loader.calls == 1
+    assert cache.get(KEY) is None
+
+async def test_cancelled_caller_does_not_cancel_the_shared_read(cache):
+    loader = Loader()
+    loader.release.clear()
+    first, second = await started([asyncio.ensure_future(cache.load(KEY, loader)) for _ in range(2)])
+
+    first.cancel()
+    await started([])
+    loader.release.set()
+
+    assert await second == loader.passport
+    assert first.cancelled()
+    assert cache.get(KEY) == loader.passport
+
+async def test_failed_reads_reach_every_caller_and_are_not_cached(cache):
+    async def failing():
+        await asyncio.sleep(0)
+        raise RuntimeError("database unavailable")
+
+    results = await asyncio.gather(*(cache.load(KEY, failing) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get(KEY) is None
+    assert cache.stats()['inflight'] == 0
+
+async def test_invalidation_during_a_read_is_not_undone_by_it(cache):
+    stale = Loader()
+    stale.release.clear()
+    [pending] = await started([asyncio.ensure_future(cache.load(KEY, stale))])
+
+    cache.invalidate_lca('lca-1')
+    fresh = Loader()
+    fresh.passport['grade'] = 'B'
+    assert await cache.load(KEY, fresh) == fresh.passport
+    stale.release.set()
+    await pending
+
+    assert (stale.calls, fresh.calls) == (1, 1)
+    # Only the read that started after the change was cached
+    assert cache.get(KEY) == fresh.passport
+
+async def test_invalidation_drops_the_linked_passports(cache):
+    for passport_id, lca_id in (('CW-A', 'lca-1'), ('CW-B', 'lca-1'), ('CW-C', 'lca-2')):
+        await cache.load(cache.key(passport_id, []), Loader(passport_id, lca_id))
+
+    cache.invalidate_lca('lca-1')
+    assert [cache.get(cache.key(passport_id, [])) is not None for passport_id in ('CW-A', 'CW-B', 'CW-C')] == [False, False, True]
+
+    cache.invalidate({'_id': 'CW-C'})
+    assert cache.stats()['entries'] == 0
+
+async def test_least_recently_used_passport_is_evicted(cache):
+    keys = [cache.key(passport_id, []) for passport_id in ('CW-A', 'CW-B', 'CW-C', 'CW-D')]
+    for key in keys[:3]:
+        await cache.load(key, Loader(key[0]))
+    cache.get(keys[0])
+
+    await cache.load(keys[3], Loader('CW-D'))
+
+    assert [cache.get(key) is not None for key in keys] == [True, False, True, True]
+
+async def test_deleted_passports_are_not_served_from_the_cache(client):
+    passport = await create_passport(client)
+    url = f"/api/passport/{passport['passportId']}"
+
+    hits = passport_cache.stats()['hits']
+    assert (await client.get(url)).status_code == 200
+    assert (await client.get(url)).status_code == 200
+    assert passport_cache.stats()['hits'] == hits + 1
+
+    assert (await client.delete(url)).status_code == 204
+    assert (await client.get(url)).status_code == 404
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.database import get_database
+from app.http_cache import VALIDATOR_FIELDS
+from app.services.passport_lookup import expansion_pipeline, find_passports
+from tests.test_passports import create_passport
+
+pytestmark = pytest.mark.anyio
+
+async def insert_passports() -> dict:
+    """Passports with resolvable, dangling and malformed references"""
+    db = get_database()
+    now = datetime(2024, 1, 1)
+    lca = await db.lca_assessments.insert_one({'metalType': 'Zinc', 'createdAt': now, 'updatedAt': now})
+    analysis = await db.doctor_analyses.insert_one({'lcaId': str(lca.inserted_id), 'createdAt': now})
+    passports = {
+        'linked': {'lcaId': str(lca.inserted_id), 'doctorAnalysisId': str(analysis.inserted_id)},
+        'dangling': {'lcaId': str(ObjectId())},
+        'malformed': {'lcaId': 'not-an-id', 'doctorAnalysisId': None}
+    }
+    for offset, (name, passport) in enumerate(passports.items()):
+        passport.update(passportId=name, generatedAt=now + timedelta(minutes=offset))
+    await db.passports.insert_many(list(passports.values()))
+    return {'lca': lca.inserted_id, 'analysis': analysis.inserted_id}
+
+async def test_expansions_embed_the_referenced_documents(client):
+    ids = await insert_passports()
+
+    response = await client.get("/api/passport/", params={'expand': 'lca,doctor'})
+
+    assert response.status_code == 200
+    passports = {passport['passportId']: passport for passport in response.json()}
+    assert list(passports) == ['malformed', 'dangling', 'linked']
+    assert passports['linked']['lcaData'] == {
+        '_id': str(ids['lca']), 'metalType': 'Zinc', 'createdAt': '2024-01-01T00:00:00', 'updatedAt': '2024-01-01T00:00:00'
+    }
+    assert passports['linked']['doctorAnalysis']['_id'] == str(ids['analysis'])
+    for name in ('dangling', 'malformed'):
+        assert 'lcaData' not in passports[name] and 'doctorAnalysis' not in passports[name]
+
+async def test_expansions_are_joined_after_paging(client):
+    await insert_passports()
+
+    response = await client.get("/api/passport/", params={'expand': 'lca', 'skip': 2, 'limit': 1})
+
+    [passport] = response.json()
+    assert passport['passportId'] == 'linked'
+    assert passport['lcaData']['metalType'] == 'Zinc'
+
+async def test_full_passport_equals_the_expanded_passport(client):
+    passport = await create_passport(client)
+    url = f"/api/passport/{passport['passportId']}"
+
+    full = await client.get(f"{url}/full")
+    expanded = await client.get(url, params={'expand': 'doctor,lca'})
+
+    assert full.json() == expanded.json()
+    assert full.json()['lcaData']['_id'] == passport['lcaId']
+    assert full.headers['etag'] == expanded.headers['etag']
+
+async def test_unknown_expansions_are_rejected(client):
+    response = await client.get("/api/passport/", params={'expand': 'lca,owner'})
+    assert response.status_code == 400
+
+async def test_validator_projection_keeps_the_references_the_join_needs():
+    await insert_passports()
+
+    [passport] = await find_passports(get_database(), {'passportId': 'linked'}, ['lca'], limit=1, projection=VALIDATOR_FIELDS)
+
+    assert set(passport['lcaData']) == {'_id', 'createdAt', 'updatedAt'}
+
+def test_pipeline_pages_before_joining():
+    pipeline = expansion_pipeline({'metalType': 'Zinc'}, ['lca', 'doctor'], sort=[('generatedAt', -1)], skip=20, limit=10)
+
+    stages = [next(iter(stage)) for stage in pipeline]
+    assert stages == ['$match', '$sort', '$skip', '$limit', '$addFields', '$lookup', '$unwind', '$lookup', '$unwind', '$project']
+    assert pipeline[5]['$lookup'] == {'from': 'lca_assessments', 'localField': '_lcaRef', 'foreignField': '_id', 'as': 'lcaData'}
+    # Passports without the referenced document are kept
+    assert pipeline[6]['$unwind']['preserveNullAndEmptyArrays']
+    assert pipeline[-1] == {'$project': {'_lcaRef': 0, '_doctorRef': 0}}
+
+def test_pipeline_projection_covers_the_embedded_documents():
+    pipeline = expansion_pipeline({}, ['lca'], limit=1, projection={'updatedAt': 1})
+
+    assert pipeline[-1] == {'$project': {'updatedAt': 1, 'lcaData._id': 1, 'lcaData.updatedAt': 1}}
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from app.database import ensure_tenant_indexes, get_database
+from app.services import passport_service
+from app.services.passport_service import CROCKFORD_ALPHABET, RANDOM_BITS, RANDOM_LIMIT, PassportIdAllocator
+from tests.test_passports import create_passport
+
+pytestmark = pytest.mark.anyio
+
+NOW_MS = 1_700_000_000_000
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A controllable millisecond clock for the allocator"""
+    now = [NOW_MS]
+    monkeypatch.setattr(passport_service.time, 'time_ns', lambda: now[0] * 1_000_000)
+    return now
+
+def decode(passport_id: str) -> int:
+    value = 0
+    for char in passport_id.removeprefix('CW-'):
+        value = value * 32 + CROCKFORD_ALPHABET.index(char)
+    return value
+
+def test_ids_encode_the_timestamp_in_sortable_crockford_base32(clock):
+    passport_id = PassportIdAllocator().next_id()
+
+    assert passport_id.startswith('CW-') and len(passport_id) == 29
+    assert set(passport_id[3:]) <= set(CROCKFORD_ALPHABET)
+    assert decode(passport_id) >> RANDOM_BITS == NOW_MS
+
+def test_ids_within_one_millisecond_increase_by_one(clock):
+    allocator = PassportIdAllocator()
+    ids = [allocator.next_id() for _ in range(1000)]
+
+    values = [decode(passport_id) for passport_id in ids]
+    assert values == list(range(values[0], values[0] + 1000))
+    assert ids == sorted(ids)
+
+def test_ids_keep_increasing_when_the_clock_steps_back(clock):
+    allocator = PassportIdAllocator()
+    before = allocator.next_id()
+    clock[0] -= 5000
+    after = allocator.next_id()
+
+    assert after > before
+    assert decode(after) >> RANDOM_BITS == NOW_MS
+
+def test_random_overflow_moves_to_the_next_millisecond(clock):
+    allocator = PassportIdAllocator()
+    first = allocator.next_id()
+    allocator._random = RANDOM_LIMIT - 1
+
+    following = allocator.next_id()
+    assert following > first
+    assert decode(following) >> RANDOM_BITS == NOW_MS + 1
+
+def test_concurrent_allocation_never_repeats():
+    allocator = PassportIdAllocator()
+    ids = []
+
+    def allocate():
+        ids.extend(allocator.next_id() for _ in range(5000))
+
+    threads = [threading.Thread(target=allocate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == len(ids) == 40000
+
+async def test_generation_retries_a_conflicting_passport_id(client, monkeypatch):
+    # Created at startup, which the test client skips
+    await ensure_tenant_indexes(get_database())
+    existing = await create_passport(client)
+    fresh = passport_service.generate_passport_id()
+    drawn = iter([existing['passportId'], fresh])
+    monkeypatch.setattr(passport_service, 'generate_passport_id', lambda: next(drawn))
+
+    passport = await create_passport(client)
+    assert passport['passportId'] == fresh
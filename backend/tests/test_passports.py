@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+
+from app.database import get_database
+from app.services.provenance_service import verify_chain
+
+pytestmark = pytest.mark.anyio
+
+ASSESSMENT = {
+    'metalType': 'Aluminium',
+    'oreGrade': 45,
+    'miningMethod': 'Open Pit',
+    'waterUsage': 12,
+    'totalEnergyConsumption': 14500,
+    'gridMix': {'coal': 40, 'hydro': 30, 'solar': 10, 'naturalGas': 20},
+    'processHeat': 3200,
+    'furnaceType': 'Electric Arc',
+    'temperature': 950,
+    'fluxUsage': 25,
+    'slagRecovery': 60,
+    'transportMode': 'Rail',
+    'inboundDistance': 500,
+    'outboundDistance': 300,
+    'vehicleEfficiency': 0.12,
+    'scrapInputRate': 35,
+    'recyclingEfficiency': 75,
+    'wasteRecovery': 60,
+    'closedLoopRate': 40,
+    'scenarioType': 'Current'
+}
+
+async def create_passport(client) -> dict:
+    now = datetime.utcnow()
+    result = await get_database().lca_assessments.insert_one({**ASSESSMENT, 'createdAt': now, 'updatedAt': now})
+    response = await client.post("/api/passport/", json={'lcaId': str(result.inserted_id)})
+    assert response.status_code == 201
+    return response.json()
+
+async def test_deleting_a_passport_keeps_its_chain_for_audit(client):
+    passport = await create_passport(client)
+    passport_id = passport['passportId']
+
+    assert (await client.delete(f"/api/passport/{passport_id}")).status_code == 204
+    assert (await client.get(f"/api/passport/{passport_id}")).status_code == 404
+    assert (await client.get(f"/api/passport/{passport_id}/provenance")).status_code == 404
+
+    events = await get_database().provenance_events.find({"passportId": passport_id}).sort("seq", 1).to_list(None)
+    assert [event['event'] for event in events] == ['Passport Generated', 'Passport Deleted']
+    assert events[-1]['details'] == {'lcaId': passport['lcaId']}
+    assert (await verify_chain(passport_id))['valid']
@@ -0,0 +1,29 @@
+import threading
+import time
+
+from app.profiling import SamplingProfiler
+
+
+def test_stop_returns_without_waiting_for_the_sampler():
+    # A long interval: a joining stop() would wait for the sampler to wake up
+    profiler = SamplingProfiler(threading.get_ident(), 0.5)
+    profiler.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    profiler.stop()
+    assert time.perf_counter() - started < 0.1
+    profiler.join()
+    assert profiler.ended_at >= profiler.started_at
+
+
+def test_samples_are_readable_after_join():
+    profiler = SamplingProfiler(threading.get_ident(), 0.001)
+    profiler.start()
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    profiler.stop()
+    profiler.join()
+    profile = profiler.speedscope('GET /test')
+    assert profiler.sample_count > 0
+    assert len(profile['profiles'][0]['samples']) == profiler.sample_count
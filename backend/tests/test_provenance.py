@@ -0,0 +1,68 @@
+import pytest
+
+from app.database import get_database
+from app.services.provenance_service import append_event, get_checkpoint, verify_chain
+
+pytestmark = pytest.mark.anyio
+
+PASSPORT_ID = "CW-TEST-0001"
+
+async def append_events(count: int):
+    for index in range(count):
+        await append_event(PASSPORT_ID, f"Event {index}", "Plant A", details={'index': index})
+
+async def tamper(seq: int, **fields):
+    await get_database().provenance_events.update_one({"passportId": PASSPORT_ID, "seq": seq}, {"$set": fields})
+
+async def test_intact_chain_verifies_and_advances_the_checkpoint():
+    await append_events(3)
+
+    result = await verify_chain(PASSPORT_ID)
+    assert result['valid'] and result['verifiedThrough'] == 2 and result['eventsChecked'] == 3
+    assert (await get_checkpoint(PASSPORT_ID))['verifiedSeq'] == 2
+
+    # Only events past the checkpoint are checked again
+    await append_events(1)
+    result = await verify_chain(PASSPORT_ID)
+    assert result['valid'] and result['verifiedThrough'] == 3 and result['eventsChecked'] == 1
+
+async def test_edited_event_breaks_the_chain():
+    await append_events(4)
+    await tamper(2, location="Plant B")
+
+    result = await verify_chain(PASSPORT_ID)
+    assert not result['valid']
+    assert result['brokenAt'] == 2 and result['verifiedThrough'] == 1
+    assert result['reason'] == "Event content does not match its hash"
+    # Progress up to the break is kept
+    assert (await get_checkpoint(PASSPORT_ID))['verifiedSeq'] == 1
+
+async def test_relinked_event_breaks_the_chain():
+    await append_events(3)
+    await tamper(1, prevHash="f" * 64)
+
+    result = await verify_chain(PASSPORT_ID)
+    assert not result['valid'] and result['brokenAt'] == 1
+    assert result['reason'] == "prevHash does not match the previous event"
+
+async def test_deleted_event_breaks_the_chain():
+    await append_events(3)
+    await get_database().provenance_events.delete_one({"passportId": PASSPORT_ID, "seq": 1})
+
+    result = await verify_chain(PASSPORT_ID)
+    assert not result['valid'] and result['brokenAt'] == 1
+    assert result['reason'] == "Event missing from the chain"
+
+async def test_full_verification_finds_tampering_behind_the_checkpoint():
+    await append_events(3)
+    assert (await verify_chain(PASSPORT_ID))['valid']
+    await tamper(0, details={'index': 99})
+
+    # The incremental check starts after the checkpoint
+    assert (await verify_chain(PASSPORT_ID))['valid']
+
+    result = await verify_chain(PASSPORT_ID, full=True)
+    assert not result['valid'] and result['brokenAt'] == 0 and result['verifiedThrough'] == -1
+    # The checkpoint is rewound so later incremental checks do not vouch for the chain
+    assert (await get_checkpoint(PASSPORT_ID))['verifiedSeq'] == -1
+    assert not (await verify_chain(PASSPORT_ID))['valid']
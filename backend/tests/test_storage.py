@@ -0,0 +1,115 @@
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo import ASCENDING
+
+from app.storage import memory, sqlite
+from app.storage.memory import MemoryClient
+from app.storage.sqlite import SQLiteClient, StorageBusy
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def client(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryClient()
+        return
+    client = SQLiteClient(str(tmp_path), busy_timeout_ms=100)
+    yield client
+    client.close()
+
+async def insert_numbered(collection, count: int):
+    await collection.insert_many([{'n': index, 'createdAt': datetime(2024, 1, 1)} for index in range(count)])
+
+async def test_cursor_pulls_documents_in_batches(client, monkeypatch):
+    collection = client['test'].items
+    await insert_numbered(collection, 25)
+
+    pulled = []
+    cursor = collection.find({}, {'n': 1, '_id': 0}).sort('n', ASCENDING).batch_size(10)
+    pull = cursor._pull
+    monkeypatch.setattr(cursor, '_pull', lambda count: pulled.append(count) or pull(count))
+
+    seen = []
+    async for doc in cursor:
+        seen.append(doc['n'])
+        if len(seen) == 5:
+            # Only the first batch has been read
+            assert pulled == [10]
+
+    assert seen == list(range(25))
+    assert pulled == [10, 10, 10, 10]
+
+async def test_writes_proceed_while_a_cursor_is_open(client):
+    collection = client['test'].items
+    await insert_numbered(collection, 30)
+
+    seen = 0
+    async for _ in collection.find({}).batch_size(10):
+        seen += 1
+        if seen % 10 == 0:
+            await collection.insert_one({'n': -seen, 'createdAt': datetime(2024, 1, 1)})
+            await collection.update_one({'n': 0}, {'$inc': {'touched': 1}})
+
+    assert seen >= 30
+    assert await collection.count_documents({}) == 33
+    assert (await collection.find_one({'n': 0}))['touched'] == 3
+
+async def test_to_list_honours_length_skip_and_limit(client):
+    collection = client['test'].items
+    await insert_numbered(collection, 40)
+
+    cursor = collection.find({}).sort('n', ASCENDING).skip(5).limit(20).batch_size(7)
+    assert [doc['n'] for doc in await cursor.to_list(length=12)] == list(range(5, 17))
+    # The rest of the same cursor
+    assert [doc['n'] for doc in await cursor.to_list(length=None)] == list(range(17, 25))
+
+async def test_ttl_index_removes_expired_documents(client, monkeypatch):
+    monkeypatch.setattr(memory, 'TTL_MONITOR_SECONDS', 0)
+    monkeypatch.setattr(sqlite, 'TTL_MONITOR_SECONDS', 0)
+    profiles = client['test'].request_profiles
+    await profiles.create_index("createdAt", expireAfterSeconds=3600)
+
+    now = datetime.utcnow()
+    await profiles.insert_one({'name': 'old', 'createdAt': now - timedelta(hours=2)})
+    await profiles.insert_one({'name': 'undated', 'createdAt': 'yesterday'})
+    await profiles.insert_one({'name': 'new', 'createdAt': now})
+
+    names = sorted([doc['name'] async for doc in profiles.find({})])
+    assert names == ['new', 'undated']
+
+async def test_sqlite_calls_run_off_the_event_loop(tmp_path):
+    client = SQLiteClient(str(tmp_path), busy_timeout_ms=300)
+    try:
+        collection = client['test'].items
+        await collection.insert_one({'n': 1})
+
+        # Another process holds the write lock
+        other = sqlite3.connect(str(tmp_path / "test.sqlite3"), isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        try:
+            with pytest.raises(StorageBusy):
+                await collection.insert_one({'n': 2})
+        finally:
+            task.cancel()
+            other.execute("ROLLBACK")
+            other.close()
+
+        # The loop kept running while the insert waited for the lock
+        assert ticks >= 10
+        thread_names = await client['test'].run(lambda: threading.current_thread().name)
+        assert thread_names.startswith('sqlite-test')
+    finally:
+        client.close()
@@ -0,0 +1,81 @@
+import random
+from bisect import bisect_left
+
+import pytest
+
+from app.services.tdigest import TDigest
+
+COUNT = 50000
+QUANTILES = [0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999]
+
+DISTRIBUTIONS = {
+    'uniform': lambda rng: rng.uniform(0, 100),
+    'normal': lambda rng: rng.gauss(0, 1),
+    # Skewed, like per-tonne emissions
+    'lognormal': lambda rng: rng.lognormvariate(0, 1.5)
+}
+
+@pytest.fixture(params=list(DISTRIBUTIONS))
+def values(request):
+    rng = random.Random(7)
+    return [DISTRIBUTIONS[request.param](rng) for _ in range(COUNT)]
+
+def digest_of(values, compression: int = 100) -> TDigest:
+    digest = TDigest(compression)
+    for value in values:
+        digest.add(value)
+    return digest
+
+def rank_error(exact: list, estimate: float, q: float) -> float:
+    """How far the estimate's true rank is from q"""
+    return abs(bisect_left(exact, estimate) / len(exact) - q)
+
+def tolerance(q: float) -> float:
+    # The k1 scale function keeps centroids smaller the further out in the tails
+    tail = min(q, 1 - q)
+    if tail <= 0.001:
+        return 0.001
+    if tail <= 0.01:
+        return 0.002
+    return 0.005
+
+def test_quantiles_match_the_exact_quantiles(values):
+    exact = sorted(values)
+    digest = digest_of(values)
+
+    for q in QUANTILES:
+        assert rank_error(exact, digest.quantile(q), q) <= tolerance(q), q
+    assert digest.quantile(0) == exact[0]
+    assert digest.quantile(1) == exact[-1]
+    assert len(digest.means) <= digest.compression
+
+def test_merged_digests_are_as_accurate_as_one(values):
+    exact = sorted(values)
+    merged = TDigest(100)
+    for part in range(10):
+        merged.merge(digest_of(values[part::10]))
+
+    assert merged.count == COUNT
+    for q in QUANTILES:
+        assert rank_error(exact, merged.quantile(q), q) <= tolerance(q), q
+
+def test_cdf_inverts_quantile(values):
+    digest = digest_of(values)
+
+    for q in QUANTILES:
+        assert digest.cdf(digest.quantile(q)) == pytest.approx(q, abs=tolerance(q))
+    assert digest.cdf(min(values) - 1) == 0.0
+    assert digest.cdf(max(values)) == 1.0
+
+def test_stored_digest_gives_the_same_quantiles(values):
+    digest = digest_of(values)
+    restored = TDigest.from_dict(digest.to_dict())
+
+    assert [restored.quantile(q) for q in QUANTILES] == [digest.quantile(q) for q in QUANTILES]
+
+def test_empty_digest_has_no_quantiles():
+    digest = TDigest()
+
+    assert digest.quantile(0.5) is None
+    assert digest.cdf(1.0) is None
+    assert TDigest.from_dict(digest.to_dict()).count == 0
@@ -0,0 +1,124 @@
+import pytest
+from fastapi import HTTPException
+
+from app.config import get_settings
+from app.database import database_name, get_database, get_shared_database, tenant_scope
+from app.services.passport_lookup import PassportCache
+from app.tenancy import resolve_tenant, tenant_label
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'passport_cache_ttl_seconds', 60.0)
+    monkeypatch.setattr(get_settings(), 'passport_cache_max_entries', 4)
+    return PassportCache()
+
+def loader(passport_id: str, tenant: str):
+    async def load():
+        return {'_id': passport_id, 'passportId': passport_id, 'tenant': tenant}
+    return load
+
+async def fill(cache: PassportCache, tenant: str, *passport_ids: str):
+    with tenant_scope(tenant):
+        for passport_id in passport_ids:
+            await cache.load(cache.key(passport_id, []), loader(passport_id, tenant))
+
+def cached(cache: PassportCache, tenant: str, passport_id: str):
+    with tenant_scope(tenant):
+        return cache.get(cache.key(passport_id, []))
+
+def test_each_tenant_has_its_own_database():
+    assert get_database().name == get_shared_database().name == database_name()
+    with tenant_scope("acme"):
+        assert get_database().name == database_name("acme") != database_name()
+        # The job queue stays in the shared database
+        assert get_shared_database().name == database_name()
+    assert get_database().name == database_name()
+
+async def test_tenant_data_is_isolated():
+    with tenant_scope("acme"):
+        await get_database().lca_assessments.insert_one({'metalType': 'Copper'})
+    with tenant_scope("globex"):
+        assert await get_database().lca_assessments.count_documents({}) == 0
+    assert await get_database().lca_assessments.count_documents({}) == 0
+    with tenant_scope("acme"):
+        assert await get_database().lca_assessments.count_documents({}) == 1
+
+async def test_passport_cache_does_not_leak_between_tenants(cache):
+    await fill(cache, "acme", "P1")
+
+    assert cached(cache, "acme", "P1")['tenant'] == "acme"
+    assert cached(cache, "globex", "P1") is None
+    assert cached(cache, None, "P1") is None
+
+    # The same passport ID loads separately for another tenant
+    await fill(cache, "globex", "P1")
+    assert cached(cache, "globex", "P1")['tenant'] == "globex"
+    assert cached(cache, "acme", "P1")['tenant'] == "acme"
+
+async def test_invalidation_is_scoped_to_the_tenant(cache):
+    await fill(cache, "acme", "P1")
+    await fill(cache, "globex", "P1")
+
+    with tenant_scope("acme"):
+        cache.invalidate({'_id': "P1"})
+
+    assert cached(cache, "acme", "P1") is None
+    assert cached(cache, "globex", "P1") is not None
+
+async def test_shared_budget_evicts_from_the_largest_tenant(cache):
+    await fill(cache, "acme", "A1")
+    await fill(cache, "globex", "G1", "G2", "G3", "G4", "G5")
+
+    stats = cache.stats()
+    assert stats['entries'] == 4
+    assert stats['tenants']['acme']['entries'] == 1
+    assert stats['tenants']['globex']['entries'] == 3
+    # The tenant filling the cache gave up its own oldest entries
+    assert cached(cache, "acme", "A1") is not None
+    assert cached(cache, "globex", "G1") is None and cached(cache, "globex", "G2") is None
+    assert cached(cache, "globex", "G5") is not None
+
+def rejected(headers: dict, required: bool = False) -> int:
+    with pytest.raises(HTTPException) as exc:
+        resolve_tenant(headers, required)
+    return exc.value.status_code
+
+def test_tenant_header_is_rejected_without_an_allowlist(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'tenant_allowlist', [])
+    monkeypatch.setattr(get_settings(), 'tenant_tokens', {})
+
+    assert resolve_tenant({}) is None
+    assert rejected({'x-tenant-id': 'acme'}) == 400
+
+def test_tenant_header_only_names_listed_tenants(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'tenant_allowlist', ['acme'])
+    monkeypatch.setattr(get_settings(), 'tenant_tokens', {})
+
+    assert resolve_tenant({'x-tenant-id': ' Acme '}) == 'acme'
+    assert rejected({'x-tenant-id': 'globex'}) == 403
+    assert rejected({'x-tenant-id': '../admin'}) == 400
+    assert rejected({}, required=True) == 400
+
+def test_tenant_tokens_take_precedence_over_the_header(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'tenant_allowlist', [])
+    monkeypatch.setattr(get_settings(), 'tenant_tokens', {'secret': 'acme'})
+
+    assert resolve_tenant({'authorization': 'Bearer secret', 'x-tenant-id': 'globex'}) == 'acme'
+    assert resolve_tenant({'x-tenant-id': 'globex'}) is None
+    assert rejected({'authorization': 'Bearer guess'}) == 401
+
+def test_metrics_labels_are_bounded_by_the_configured_tenants(monkeypatch):
+    monkeypatch.setattr(get_settings(), 'tenant_allowlist', ['acme'])
+    monkeypatch.setattr(get_settings(), 'tenant_tokens', {'secret': 'globex'})
+
+    assert tenant_label(None) == 'default'
+    assert tenant_label('acme') == 'acme' and tenant_label('globex') == 'globex'
+    assert tenant_label('removed') == 'other'
+
+async def test_unlisted_tenants_share_a_label_but_not_a_cache_namespace(cache):
+    await fill(cache, "removed-a", "P1")
+
+    assert cached(cache, "removed-b", "P1") is None
+    assert cache.stats()['tenants']['removed-a']['entries'] == 1